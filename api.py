@@ -1,22 +1,106 @@
-api.py
+# api.py
 from __future__ import annotations
 
+import asyncio
+import json
+import logging
+import time
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import asynccontextmanager
 from datetime import date, datetime, timezone
-from typing import Any, Dict, List, Literal, Optional
+from typing import Any, Dict, Iterator, List, Literal, Optional
 
 from bson import ObjectId
 from fastapi import Depends, FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from fastapi.security import OAuth2PasswordBearer
 from motor.motor_asyncio import AsyncIOMotorDatabase
-from pydantic import BaseModel, EmailStr, Field
+from pydantic import BaseModel, EmailStr, Field, ValidationError
 from starlette.concurrency import run_in_threadpool
 
-from mongo import get_db
-from security import create_access_token, decode_access_token, hash_password, verify_password
+import capture
+import metrics
+import procpool
+import sessions
+import usercache
+from users import EmailAlreadyRegistered, UsersRepository
+from database import catalogue_stats, get_catalogue_store
+from logic import get_knowledge_base
+from mongo import close_client, get_db, get_settings
+from pool import PoolTimeout
+from security import (
+    HasherBusy,
+    configure_password_hasher,
+    create_access_token,
+    decode_access_token,
+    get_password_hasher,
+    needs_rehash,
+    shutdown_password_hasher,
+)
+from service import batch_decider
+from service import configure as configure_decide
 from service import decide as decide_rules
-
-app = FastAPI(title="AJA Backend", version="1.0.0")
+from service import decide_profiled
+from service import engine_stats
+
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Compile la base de connaissances une seule fois, avant la première requête /decide
+    await run_in_threadpool(get_knowledge_base)
+
+    s = get_settings()
+    await run_in_threadpool(
+        configure_decide,
+        engine=s.DECIDE_ENGINE,
+        pool_size=s.ENGINE_POOL_SIZE,
+        pool_timeout=s.ENGINE_POOL_TIMEOUT_SECONDS,
+        pool_max_age=s.ENGINE_POOL_MAX_AGE_SECONDS,
+        pool_max_uses=s.ENGINE_POOL_MAX_USES,
+        cache_size=s.DECIDE_CACHE_SIZE,
+        cache_ttl=s.DECIDE_CACHE_TTL_SECONDS,
+    )
+
+    # Workers de /decide démarrés par forkserver (jamais par fork de ce processus, qui a
+    # déjà des threads), avec la configuration de `service`; prêts avant la première requête
+    if s.DECIDE_EXECUTOR == "process":
+        await run_in_threadpool(
+            procpool.configure,
+            s.DECIDE_PROCESS_WORKERS,
+            s.DECIDE_PROCESS_MAX_PENDING,
+            s.DECIDE_PROCESS_RECYCLE_AFTER,
+        )
+
+    store = get_catalogue_store()
+    if s.CATALOGUE_WATCH_INTERVAL_SECONDS:
+        store.start_watching(s.CATALOGUE_WATCH_INTERVAL_SECONDS)
+    capture.configure(s.DECIDE_CAPTURE_PATH, s.DECIDE_CAPTURE_SAMPLE_RATE)
+    metrics.configure(s.METRICS_ENABLED)
+    configure_password_hasher(s.PASSWORD_HASH_WORKERS, s.PASSWORD_HASH_MAX_PENDING)
+    usercache.configure(s.USER_CACHE_BACKEND, s.USER_CACHE_SIZE, s.USER_CACHE_TTL_SECONDS)
+    sessions.configure(
+        s.DECISION_SESSION_MAX,
+        s.DECISION_SESSION_MAX_PER_USER,
+        s.DECISION_SESSION_IDLE_SECONDS,
+        s.DECISION_SESSION_MAX_ITEMS,
+        s.DECISION_SESSION_MEMORY_MB,
+    )
+
+    # Index unique sur users.email (même base que les routes, y compris si elle est remplacée en test)
+    db_dependency = app.dependency_overrides.get(get_db, get_db)
+    await UsersRepository(db_dependency()).ensure_indexes()
+    yield
+    shutdown_password_hasher()
+    procpool.shutdown()
+    capture.close()
+    store.stop_watching()
+    await close_client()
+
+
+app = FastAPI(title="AJA Backend", version="1.0.0", lifespan=lifespan)
 
 # ✅ CORS (important for Expo Web)
 origins = [
@@ -29,6 +113,9 @@ origins = [
     "http://127.0.0.1:3000",
 ]
 
+# Capture des corps /decide, inactive tant que DECIDE_CAPTURE_PATH n'est pas défini
+app.add_middleware(capture.DecideCaptureMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,          # en dev tu peux mettre ["*"]
@@ -106,6 +193,22 @@ class DecideRequest(BaseModel):
     conditions_medicales: Optional[List[str]] = None
 
 
+class DecisionSessionDelta(BaseModel):
+    add_symptomes: List[str] = []
+    remove_symptomes: List[str] = []
+    add_conditions: List[str] = []
+    remove_conditions: List[str] = []
+
+
+class DecideBatchRequest(BaseModel):
+    # Validés un par un pendant le streaming: un élément invalide ne fait pas échouer le lot
+    items: List[Any]
+
+
+# Nombre de lignes NDJSON regroupées par écriture (limite les allers-retours threadpool)
+_NDJSON_LINES_PER_CHUNK = 64
+
+
 def _now_utc() -> datetime:
     return datetime.now(timezone.utc)
 
@@ -142,10 +245,14 @@ def user_public(u: Dict[str, Any], include_personal: bool = True) -> Dict[str, A
     }
 
 
+def get_users(db: AsyncIOMotorDatabase = Depends(get_db)) -> UsersRepository:
+    return UsersRepository(db)
+
+
 # ✅✅✅ FIX PRINCIPAL: payload JWT -> user_id = payload["sub"]
 async def get_current_user(
     token: str = Depends(oauth2_scheme),
-    db: AsyncIOMotorDatabase = Depends(get_db),
+    users: UsersRepository = Depends(get_users),
 ) -> Dict[str, Any]:
     try:
         payload = decode_access_token(token)   # dict
@@ -153,9 +260,15 @@ async def get_current_user(
         if not user_id:
             raise HTTPException(status_code=401, detail="Invalid authentication")
 
-        user = await db.users.find_one({"_id": ObjectId(user_id)})
-        if not user:
-            raise HTTPException(status_code=401, detail="Invalid authentication")
+        cache = usercache.get_user_cache()
+        user = await cache.get(user_id) if cache is not None else None
+        if user is None:
+            # L'empreinte du mot de passe n'est utile qu'à /auth/login: ni lue ici, ni mise en cache
+            user = await users.get(ObjectId(user_id))
+            if not user:
+                raise HTTPException(status_code=401, detail="Invalid authentication")
+            if cache is not None:
+                await cache.set(user_id, user)
         return user
     except HTTPException:
         raise
@@ -169,29 +282,20 @@ async def health():
 
 
 @app.post("/auth/signup", response_model=TokenResponse)
-async def signup(req: SignupRequest, db: AsyncIOMotorDatabase = Depends(get_db)):
-    existing = await db.users.find_one({"email": req.email})
-    if existing:
-        raise HTTPException(status_code=400, detail="Email already registered")
+async def signup(req: SignupRequest, users: UsersRepository = Depends(get_users)):
+    # bcrypt hors de la boucle d'événements (pool borné, voir security.PasswordHasher)
+    try:
+        password_hash = await get_password_hasher().hash(req.password)
+    except HasherBusy:
+        raise HTTPException(status_code=503, detail="Authentication busy, retry later")
 
-    now = _now_utc()
-    user_doc = {
-        "email": req.email,
-        "password_hash": hash_password(req.password),
-        "role": "user",
-        "profile": {
-            "personal": {},
-            "medical": {},
-            "activity_level": None,
-            "goals": [],
-        },
-        "created_at": now,
-        "updated_at": now,
-    }
+    # L'index unique sur email tranche: pas de vérification préalable
+    try:
+        created = await users.create(req.email, password_hash, _now_utc())
+    except EmailAlreadyRegistered:
+        raise HTTPException(status_code=400, detail="Email already registered")
 
-    result = await db.users.insert_one(user_doc)
-    token = create_access_token(str(result.inserted_id))
-    created = await db.users.find_one({"_id": result.inserted_id})
+    token = create_access_token(str(created["_id"]))
 
     return {
         "access_token": token,
@@ -201,11 +305,31 @@ async def signup(req: SignupRequest, db: AsyncIOMotorDatabase = Depends(get_db))
 
 
 @app.post("/auth/login", response_model=TokenResponse)
-async def login(req: LoginRequest, db: AsyncIOMotorDatabase = Depends(get_db)):
-    user = await db.users.find_one({"email": req.email})
-    if not user or not verify_password(req.password, user.get("password_hash", "")):
+async def login(req: LoginRequest, users: UsersRepository = Depends(get_users)):
+    user = await users.find_for_login(req.email)
+    if not user:
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+
+    hasher = get_password_hasher()
+    stored_hash = user.get("password_hash", "")
+    try:
+        valid = await hasher.verify(req.password, stored_hash)
+    except HasherBusy:
+        raise HTTPException(status_code=503, detail="Authentication busy, retry later")
+    if not valid:
         raise HTTPException(status_code=401, detail="Invalid credentials")
 
+    # Coût BCRYPT_ROUNDS modifié: nouvelle empreinte, seulement si personne ne l'a changée
+    # entre-temps. Si le pool est saturé, ce sera pour la prochaine connexion.
+    if needs_rehash(stored_hash):
+        try:
+            new_hash = await hasher.hash(req.password)
+        except HasherBusy:
+            new_hash = None
+        if new_hash is not None:
+            await users.replace_password_hash(user["_id"], stored_hash, new_hash)
+
+    user.pop("password_hash", None)
     token = create_access_token(str(user["_id"]))
     return {
         "access_token": token,
@@ -225,7 +349,7 @@ async def me(
 @app.put("/users/me/profile", response_model=UserResponse)
 async def update_profile(
     payload: ProfileUpdate,
-    db: AsyncIOMotorDatabase = Depends(get_db),
+    users: UsersRepository = Depends(get_users),
     user: Dict[str, Any] = Depends(get_current_user),
 ):
     data = payload.model_dump(exclude_none=True)
@@ -246,11 +370,194 @@ async def update_profile(
     set_fields = _flatten("profile", data)
     set_fields["updated_at"] = _now_utc()
 
-    await db.users.update_one({"_id": user["_id"]}, {"$set": set_fields})
-    user2 = await db.users.find_one({"_id": user["_id"]})
+    # Un seul aller-retour: l'écriture renvoie le document à jour
+    user2 = await users.update_fields(user["_id"], set_fields)
+
+    # Écriture immédiate dans le cache: les lectures suivantes voient le nouveau profil
+    cache = usercache.get_user_cache()
+    if user2 is None:
+        # Compte supprimé entre l'authentification et l'écriture
+        if cache is not None:
+            await cache.delete(str(user["_id"]))
+        raise HTTPException(status_code=401, detail="Invalid authentication")
+    if cache is not None:
+        await cache.set(str(user2["_id"]), user2)
     return user_public(user2)
 
 
+def _decide_dequeued(submitted: float, symptomes: List[str], conditions: Optional[List[str]]) -> Dict[str, Any]:
+    # Temps passé à attendre un thread libre de run_in_threadpool
+    if submitted:
+        metrics.observe_stage("queue", time.perf_counter() - submitted)
+    return decide_rules(symptomes, conditions)
+
+
+async def _decide_in_process(pool: procpool.DecideProcessPool, symptomes: List[str], conditions: Optional[List[str]]):
+    # ProcessPoolBusy (file pleine) hérite de PoolTimeout: 503 comme un pool de moteurs saturé
+    try:
+        decision, records = await asyncio.wrap_future(
+            pool.submit(procpool.decide_in_worker, metrics.ENABLED, symptomes, conditions)
+        )
+    except BrokenProcessPool:
+        pool.mark_broken()
+        raise procpool.ProcessPoolBusy("Decide worker died")
+    # Mesures des étapes faites dans le worker: enregistrées dans le registre de ce processus
+    metrics.replay(records)
+    return decision
+
+
 @app.post("/decide")
-async def decide(req: DecideRequest):
-    return await run_in_threadpool(decide_rules, req.symptomes, req.conditions_medicales)
\ No newline at end of file
+async def decide(req: DecideRequest, profile: bool = False):
+    if profile:
+        # Réservé au débogage: moteur Experta instrumenté, sans cache ni pool
+        if not get_settings().DECIDE_PROFILING_ENABLED:
+            raise HTTPException(status_code=403, detail="Profiling disabled")
+        return await run_in_threadpool(decide_profiled, req.symptomes, req.conditions_medicales)
+
+    submitted = time.perf_counter() if metrics.ENABLED else 0.0
+    try:
+        pool = procpool.get_decide_pool()
+        if pool is None:
+            return await run_in_threadpool(_decide_dequeued, submitted, req.symptomes, req.conditions_medicales)
+        return await _decide_in_process(pool, req.symptomes, req.conditions_medicales)
+    except PoolTimeout:
+        raise HTTPException(status_code=503, detail="Decision engine busy")
+    finally:
+        if submitted:
+            metrics.DECIDE_REQUEST_SECONDS.observe(time.perf_counter() - submitted)
+
+
+def _decide_batch_lines(items: List[Any]) -> Iterator[str]:
+    buffer: List[str] = []
+    with batch_decider() as decide_one:
+        for i, raw in enumerate(items):
+            try:
+                item = DecideRequest.model_validate(raw)
+                line = {"index": i, "result": decide_one(item.symptomes, item.conditions_medicales)}
+            except ValidationError as e:
+                line = {"index": i, "error": "invalid_item", "detail": e.errors(include_url=False, include_context=False)}
+            except PoolTimeout:
+                line = {"index": i, "error": "engine_busy"}
+            except Exception:
+                # Détail dans les logs seulement, comme pour /decide
+                logger.exception("Erreur interne sur l'élément %d de /decide/batch", i)
+                line = {"index": i, "error": "internal_error"}
+
+            buffer.append(json.dumps(line, ensure_ascii=False, default=str))
+            if len(buffer) >= _NDJSON_LINES_PER_CHUNK:
+                yield "\n".join(buffer) + "\n"
+                buffer = []
+
+    if buffer:
+        yield "\n".join(buffer) + "\n"
+
+
+@app.post("/decide/batch")
+async def decide_batch(req: DecideBatchRequest):
+    max_items = get_settings().DECIDE_BATCH_MAX_ITEMS
+    if len(req.items) > max_items:
+        raise HTTPException(status_code=413, detail=f"Too many items (max {max_items})")
+
+    # Une ligne JSON par élément, dans l'ordre: {"index", "result"} ou {"index", "error"}
+    return StreamingResponse(_decide_batch_lines(req.items), media_type="application/x-ndjson")
+
+
+# --- Sessions de décision incrémentales (voir sessions.py) ---
+
+def _session_response(session: sessions.DecisionSession, decision: Dict[str, Any]) -> Dict[str, Any]:
+    return {"session_id": session.id, "decision": decision}
+
+
+def _get_session(session_id: str, user: Dict[str, Any]) -> sessions.DecisionSession:
+    session = sessions.get_session_store().get(session_id, str(user["_id"]))
+    if session is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    return session
+
+
+async def _apply_delta(session: sessions.DecisionSession, **delta: List[str]) -> Dict[str, Any]:
+    try:
+        decision = await run_in_threadpool(session.apply, **delta)
+    except sessions.TooManyItems as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    return _session_response(session, decision)
+
+
+@app.post("/decide/sessions")
+async def create_decision_session(
+    req: Optional[DecideRequest] = None,
+    user: Dict[str, Any] = Depends(get_current_user),
+):
+    # Delta initial appliqué avant l'enregistrement: refusé (413), il ne ferme aucune
+    # session. Sinon, au-delà de la limite par utilisateur, sa plus ancienne est fermée
+    store = sessions.get_session_store()
+    session = store.new_session(str(user["_id"]))
+    response = await _apply_delta(
+        session,
+        add_symptomes=req.symptomes if req else [],
+        add_conditions=(req.conditions_medicales or []) if req else [],
+    )
+    store.add(session)
+    return response
+
+
+@app.get("/decide/sessions/{session_id}")
+async def get_decision_session(session_id: str, user: Dict[str, Any] = Depends(get_current_user)):
+    session = _get_session(session_id, user)
+    return _session_response(session, await run_in_threadpool(session.decision))
+
+
+@app.patch("/decide/sessions/{session_id}")
+async def update_decision_session(
+    session_id: str,
+    delta: DecisionSessionDelta,
+    user: Dict[str, Any] = Depends(get_current_user),
+):
+    session = _get_session(session_id, user)
+    return await _apply_delta(session, **delta.model_dump())
+
+
+@app.delete("/decide/sessions/{session_id}", status_code=204)
+async def delete_decision_session(session_id: str, user: Dict[str, Any] = Depends(get_current_user)):
+    if not sessions.get_session_store().delete(session_id, str(user["_id"])):
+        raise HTTPException(status_code=404, detail="Session not found")
+
+
+@app.get("/decide/stats")
+async def decide_stats():
+    return {
+        **engine_stats(),
+        "process_pool": procpool.process_pool_stats(),
+        "sessions": sessions.session_stats(),
+    }
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    if not metrics.ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics disabled")
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@app.get("/catalogue/stats")
+async def catalogue_status():
+    # Version servie, durée du dernier rechargement, échecs...
+    return catalogue_stats()
+
+
+@app.post("/admin/catalogue/reload")
+async def reload_catalogue(
+    force: bool = False,
+    user: Dict[str, Any] = Depends(get_current_user),
+):
+    if user.get("role") != "admin":
+        raise HTTPException(status_code=403, detail="Admin only")
+
+    # Reconstruit hors de la boucle d'événements; les /decide en cours finissent sur l'ancien catalogue
+    try:
+        reloaded = await run_in_threadpool(get_catalogue_store().reload, force)
+    except Exception:
+        # Détail dans les logs (et dans /catalogue/stats: last_error), pas dans la réponse
+        logger.exception("Échec du rechargement du catalogue")
+        raise HTTPException(status_code=500, detail="Catalogue reload failed")
+    return {"reloaded": reloaded, **catalogue_stats()}
\ No newline at end of file
@@ -0,0 +1,140 @@
+"""batch.py
+
+Forme matricielle du catalogue pour scorer beaucoup de patients d'un coup.
+
+- colonnes: produits
+- lignes: symptômes normalisés (`targets`) et conditions (`forbids`)
+
+Un lot de N requêtes devient deux matrices booléennes (N × symptômes,
+N × conditions). La couverture des symptômes et le masque des produits
+interdits s'obtiennent alors en deux produits matriciels, au lieu de N
+appels à `service.decide`.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+import service
+from database import CatalogueSnapshot, current_catalogue
+from fastpath import DecisionIndex, get_decision_index
+from logic import get_vocabulary
+
+
+class CatalogueMatrix:
+    """Matrices booléennes symptôme × produit et condition × produit."""
+
+    def __init__(self, index: DecisionIndex):
+        products: Set[str] = set()
+        for ps in index.products_by_symptom.values():
+            products |= ps
+        for ps in index.forbidden_by_condition.values():
+            products |= ps
+
+        self.products: List[str] = sorted(products)
+        self.symptoms: List[str] = sorted(index.products_by_symptom)
+        self.conditions: List[str] = sorted(index.forbidden_by_condition)
+
+        self.product_ids: Dict[str, int] = {p: i for i, p in enumerate(self.products)}
+        self.symptom_ids: Dict[str, int] = {s: i for i, s in enumerate(self.symptoms)}
+        self.condition_ids: Dict[str, int] = {c: i for i, c in enumerate(self.conditions)}
+
+        self.targets = np.zeros((len(self.symptoms), len(self.products)), dtype=bool)
+        for s, ps in index.products_by_symptom.items():
+            self.targets[self.symptom_ids[s], [self.product_ids[p] for p in ps]] = True
+
+        self.forbids = np.zeros((len(self.conditions), len(self.products)), dtype=bool)
+        for c, ps in index.forbidden_by_condition.items():
+            self.forbids[self.condition_ids[c], [self.product_ids[p] for p in ps]] = True
+
+        # Copies entières pour les produits matriciels (évite une conversion par lot)
+        self._targets_i = self.targets.astype(np.int32)
+        self._forbids_i = self.forbids.astype(np.int32)
+
+    @staticmethod
+    def _encode(rows: Sequence[Sequence[str]], ids: Dict[str, int]) -> np.ndarray:
+        out = np.zeros((len(rows), len(ids)), dtype=bool)
+        for r, values in enumerate(rows):
+            cols = [ids[v] for v in values if v in ids]
+            if cols:
+                out[r, cols] = True
+        return out
+
+    def score(
+        self,
+        symptomes_batch: Sequence[Sequence[str]],
+        conditions_batch: Sequence[Sequence[str]],
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Score un lot de requêtes déjà normalisées.
+
+        Retourne `(coverage, forbidden)`, deux matrices N × produits:
+        - `coverage[i, p]`: nombre de symptômes distincts de la requête i traités par p
+        - `forbidden[i, p]`: p est contre-indiqué pour une condition de la requête i
+
+        Le score d'une recommandation est `coverage` là où `forbidden` est faux.
+        """
+        requested = self._encode(symptomes_batch, self.symptom_ids)
+        declared = self._encode(conditions_batch, self.condition_ids)
+        coverage = requested.astype(np.int32) @ self._targets_i
+        forbidden = (declared.astype(np.int32) @ self._forbids_i) > 0
+        return coverage, forbidden
+
+    def infer_batch(
+        self,
+        symptomes_batch: Sequence[Sequence[str]],
+        conditions_batch: Sequence[Sequence[str]],
+    ) -> List[Tuple[Set[str], Set[Tuple[str, str]]]]:
+        """Même contrat que `DecisionIndex.infer`, pour tout un lot."""
+        requested = self._encode(symptomes_batch, self.symptom_ids)
+        declared = self._encode(conditions_batch, self.condition_ids)
+        forbidden = (declared.astype(np.int32) @ self._forbids_i) > 0
+
+        # (requête, symptôme, produit) retenus: symptôme demandé, traité par le produit, produit non interdit
+        pairs = requested[:, :, None] & self.targets[None, :, :] & ~forbidden[:, None, :]
+
+        results: List[Tuple[Set[str], Set[Tuple[str, str]]]] = [(set(), set()) for _ in range(len(requested))]
+        for r, p in zip(*np.nonzero(forbidden)):
+            results[r][0].add(self.products[p])
+        for r, s, p in zip(*np.nonzero(pairs)):
+            results[r][1].add((self.products[p], self.symptoms[s]))
+        return results
+
+
+def get_catalogue_matrix(snapshot: Optional[CatalogueSnapshot] = None) -> CatalogueMatrix:
+    """Matrices du snapshot (par défaut le catalogue courant), construites au premier usage."""
+    return (snapshot or current_catalogue()).derived(
+        "catalogue_matrix",
+        lambda s: CatalogueMatrix(get_decision_index(s)),
+    )
+
+
+def decide_batch(
+    requests: Iterable[Tuple[List[str], Optional[List[str]]]],
+    chunk_size: int = 512,
+) -> List[Dict[str, Any]]:
+    """
+    Équivalent de `[service.decide(s, c) for s, c in requests]` en passes matricielles.
+
+    Les requêtes sont traitées par paquets de `chunk_size` pour borner la
+    taille des matrices intermédiaires (paquet × symptômes × produits).
+    """
+    # Tout le lot est traité sur le même snapshot, même si le catalogue est rechargé entre-temps
+    snapshot = current_catalogue()
+    matrix = get_catalogue_matrix(snapshot)
+    vocabulary = get_vocabulary(snapshot)
+
+    prepared = [service._prepare(s, c, vocabulary) for s, c in requests]
+
+    out: List[Dict[str, Any]] = []
+    for start in range(0, len(prepared), chunk_size):
+        chunk = prepared[start:start + chunk_size]
+        inferred = matrix.infer_batch(
+            [p["symptomes_utilises"] for p in chunk],
+            [p["conditions_utilisees"] for p in chunk],
+        )
+        for p, (forbidden, matches) in zip(chunk, inferred):
+            out.append(service._format_decision(p, forbidden, matches))
+    return out
@@ -0,0 +1,308 @@
+"""benchmark.py
+
+Mesures de performance du moteur, sur le catalogue réel et sur des catalogues
+synthétiques plus gros (chaque fiche de `data/` dupliquée N fois).
+
+Mesuré pour chaque taille de catalogue (un processus Python neuf par mesure
+d'import, pour ne pas profiter des modules déjà chargés):
+- import de `database`: depuis les JSON et depuis l'artefact compilé
+- `MoteurRecommandation().reset()` et `new_engine()` (clone du moteur compilé)
+- `service.decide`: 1/3/10 symptômes, sans et avec conditions, par moteur
+- `match_symptoms_with_products`: 1/3/10 symptômes
+- jointures Rete: moteur cloné + faits client + `run()`, avec les jointures
+  d'origine d'Experta (`rete.plain`) et les jointures indexées de
+  `hashjoin.py` (`rete.indexed`), pour suivre leur croissance avec le catalogue
+- profil des règles (`service.decide_profiled`, 10 symptômes et 2 conditions):
+  activations et temps par règle, pic de l'agenda, faits en mémoire de travail
+- mémoire: pic tracemalloc au chargement du catalogue, RSS maximal
+
+Usage:
+    python benchmark.py                              # catalogue réel, résultats JSON sur stdout
+    python benchmark.py --scales 1 10 100 -o bench.json
+    python benchmark.py --baseline bench.json        # compare, code de sortie 1 si régression
+
+Toutes les métriques sont "plus petit = meilleur"; une régression est une
+hausse de plus de `--threshold` (25 % par défaut) par rapport à la référence.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+
+_ROOT = Path(__file__).resolve().parent
+_DATA_DIR = _ROOT / "data"
+
+SYMPTOM_COUNTS = (1, 3, 10)
+CONDITION_COUNTS = (0, 2)
+DECIDE_ENGINES = ("experta", "index")
+
+
+# --- Catalogues synthétiques ---
+
+def build_synthetic_catalogue(scale: int, target: Path) -> Path:
+    """Copie `data/` dans `target` en dupliquant chaque fiche produit `scale` fois.
+
+Les copies ne diffèrent que par leur nom (`Produit #k`): mêmes cibles et mêmes
+contre-indications, donc un réseau Rete et des index `scale` fois plus gros.
+"""
+    for folder in ("categories", "conditions"):
+        if (_DATA_DIR / folder).is_dir():
+            shutil.copytree(_DATA_DIR / folder, target / folder)
+
+    for folder in ("supplements", "other", "diets"):
+        src = _DATA_DIR / folder
+        if not src.is_dir():
+            continue
+        (target / folder).mkdir(parents=True)
+        for path in sorted(src.glob("*.json")):
+            sheet = json.loads(path.read_text(encoding="utf-8"))
+            for k in range(scale):
+                copy = dict(sheet)
+                if k:
+                    copy["name"] = f"{sheet.get('name', path.stem)} #{k}"
+                    copy["slug"] = f"{sheet.get('slug', path.stem)}-{k}"
+                out = target / folder / f"{path.stem}-{k:04d}.json"
+                out.write_text(json.dumps(copy, ensure_ascii=False), encoding="utf-8")
+    return target
+
+
+# --- Mesures ---
+
+def _summary(samples: List[float]) -> Dict[str, float]:
+    ordered = sorted(samples)
+    return {
+        "p50_ms": round(statistics.median(ordered) * 1000, 4),
+        "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 4),
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 4),
+    }
+
+
+def _time(fn: Callable[[], Any], repeat: int) -> Dict[str, float]:
+    samples: List[float] = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return _summary(samples)
+
+
+def _flatten(prefix: str, values: Dict[str, float], out: Dict[str, float]) -> None:
+    for key, value in values.items():
+        out[f"{prefix}.{key}"] = value
+
+
+def _probe_import() -> Dict[str, float]:
+    started = time.perf_counter()
+    import database  # noqa: F401
+
+    return {"seconds": time.perf_counter() - started}
+
+
+def _probe_memory() -> Dict[str, float]:
+    import tracemalloc
+
+    tracemalloc.start()
+    import database  # noqa: F401
+
+    catalogue_peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {"catalogue_peak_kib": round(catalogue_peak / 1024, 1)}
+
+
+def _probe_engine(repeat: int) -> Dict[str, float]:
+    """Mesures dans le processus courant (catalogue déjà compilé en artefact)."""
+    import resource
+
+    import service
+    from hashjoin import ReteMatcher
+    from logic import MoteurRecommandation, get_knowledge_base, match_symptoms_with_products, new_engine
+
+    metrics: Dict[str, float] = {}
+
+    started = time.perf_counter()
+    get_knowledge_base()
+    metrics["engine.compile_s"] = round(time.perf_counter() - started, 6)
+
+    # reset() rejoue tout le catalogue dans le réseau Rete: peu de répétitions
+    _flatten("engine.reset", _time(lambda: MoteurRecommandation().reset(), max(3, repeat // 20)), metrics)
+    _flatten("engine.clone", _time(new_engine, repeat), metrics)
+
+    rng = random.Random(42)
+    symptomes = sorted(service._known_symptomes())
+    conditions = sorted(service._known_conditions())
+    requests = {
+        (n_s, n_c): [
+            (rng.sample(symptomes, min(n_s, len(symptomes))), rng.sample(conditions, min(n_c, len(conditions))))
+            for _ in range(repeat)
+        ]
+        for n_s in SYMPTOM_COUNTS
+        for n_c in CONDITION_COUNTS
+    }
+
+    for engine in DECIDE_ENGINES:
+        service.configure(engine=engine, cache_size=0)
+        for (n_s, n_c), batch in requests.items():
+            it = iter(batch)
+            _flatten(f"decide.{engine}.s{n_s}_c{n_c}", _time(lambda: service.decide(*next(it)), len(batch)), metrics)
+
+    for n_s in SYMPTOM_COUNTS:
+        batch = iter([s for s, _ in requests[(n_s, 0)]])
+        _flatten(f"match.s{n_s}", _time(lambda: match_symptoms_with_products(next(batch)), repeat), metrics)
+
+    # Même base compilée, jointures d'origine d'Experta (parcours complet des mémoires)
+    class PlainRete(MoteurRecommandation):
+        __matcher__ = ReteMatcher
+
+    plain = PlainRete()
+    plain.reset()
+
+    def infer(template, symptomes_use, conditions_use):
+        engine = template.clone()
+        for s in symptomes_use:
+            engine.declare_need(s)
+        for c in conditions_use:
+            engine.declare_condition(c)
+        engine.run()
+
+    for name, template in (("plain", plain), ("indexed", get_knowledge_base())):
+        for n_c in CONDITION_COUNTS:
+            it = iter(requests[(max(SYMPTOM_COUNTS), n_c)])
+            _flatten(f"rete.{name}.s{max(SYMPTOM_COUNTS)}_c{n_c}", _time(lambda: infer(template, *next(it)), repeat), metrics)
+
+    # Croissance du coût des règles avec la taille du catalogue: une requête type
+    profile = service.decide_profiled(*requests[(max(SYMPTOM_COUNTS), max(CONDITION_COUNTS))][0])["profile"]
+    metrics["profile.agenda_peak"] = profile["agenda_peak"]
+    metrics["profile.fired"] = profile["fired"]
+    metrics["profile.facts"] = profile["working_memory"]["facts"]
+    metrics["profile.match_ms"] = round(profile["match_seconds"] * 1000, 4)
+    for rule, stats in profile["rules"].items():
+        metrics[f"profile.{rule}.activations"] = stats["activations"]
+        metrics[f"profile.{rule}.ms"] = round(stats["seconds"] * 1000, 4)
+
+    # ru_maxrss: Kio sous Linux, octets sous macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    metrics["memory.max_rss_kib"] = round(rss / 1024 if sys.platform == "darwin" else rss, 1)
+    return metrics
+
+
+def _run_probe(probe: str, env: Dict[str, str], repeat: int = 0) -> Dict[str, float]:
+    cmd = [sys.executable, str(Path(__file__).resolve()), "--probe", probe, "--repeat", str(repeat)]
+    out = subprocess.run(cmd, env=env, cwd=_ROOT, check=True, capture_output=True, text=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def bench_scale(scale: int, repeat: int, import_repeat: int, workdir: Path) -> Dict[str, float]:
+    data_dir = _DATA_DIR if scale == 1 else build_synthetic_catalogue(scale, workdir / f"data-x{scale}")
+    cache_path = workdir / f"catalogue-x{scale}.pickle"
+    env = dict(os.environ, CATALOGUE_DATA_DIR=str(data_dir), CATALOGUE_CACHE_PATH=str(cache_path))
+
+    metrics: Dict[str, float] = {}
+
+    cold = [_run_probe("import", dict(env, CATALOGUE_CACHE="0"))["seconds"] for _ in range(import_repeat)]
+    _flatten("import.json", _summary(cold), metrics)
+
+    _run_probe("import", env)  # écrit l'artefact
+    warm = [_run_probe("import", env)["seconds"] for _ in range(import_repeat)]
+    _flatten("import.artifact", _summary(warm), metrics)
+
+    metrics.update({f"memory.{k}": v for k, v in _run_probe("memory", dict(env, CATALOGUE_CACHE="0")).items()})
+    metrics.update(_run_probe("engine", env, repeat))
+    return metrics
+
+
+# --- Comparaison avec une référence ---
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[Dict[str, Any]]:
+    """Métriques en hausse de plus de `threshold` (ratio) par rapport à `baseline`."""
+    regressions: List[Dict[str, Any]] = []
+    for scale, metrics in current["results"].items():
+        reference = baseline.get("results", {}).get(scale, {})
+        for name, value in metrics.items():
+            before = reference.get(name)
+            if not before or before <= 0:
+                continue
+            ratio = value / before
+            if ratio > 1 + threshold:
+                regressions.append({"scale": scale, "metric": name, "baseline": before, "current": value, "ratio": round(ratio, 3)})
+    return regressions
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=_ROOT, capture_output=True, text=True, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return out.stdout.strip() or None
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark du moteur de recommandations.")
+    parser.add_argument("--scales", type=int, nargs="+", default=[1], help="tailles du catalogue (1 = data/ réel, 10 = 10x...)")
+    parser.add_argument("--repeat", type=int, default=200, help="répétitions par mesure de latence")
+    parser.add_argument("--import-repeat", type=int, default=5, help="répétitions des mesures d'import (un processus chacune)")
+    parser.add_argument("-o", "--output", type=Path, default=None, help="fichier JSON de résultats (défaut: stdout)")
+    parser.add_argument("--baseline", type=Path, default=None, help="résultats de référence à comparer")
+    parser.add_argument("--threshold", type=float, default=0.25, help="hausse tolérée avant de signaler une régression")
+    parser.add_argument("--probe", choices=("import", "memory", "engine"), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.probe:
+        probes = {"import": _probe_import, "memory": _probe_memory, "engine": lambda: _probe_engine(args.repeat)}
+        print(json.dumps(probes[args.probe]()))
+        return 0
+
+    workdir = Path(tempfile.mkdtemp(prefix="experta-bench-"))
+    try:
+        results = {
+            f"x{scale}": bench_scale(scale, args.repeat, args.import_repeat, workdir)
+            for scale in args.scales
+        }
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report: Dict[str, Any] = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+
+    exit_code = 0
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+        report["regressions"] = compare(report, baseline, args.threshold)
+        for r in report["regressions"]:
+            print(
+                f"REGRESSION {r['scale']} {r['metric']}: {r['baseline']} -> {r['current']} (x{r['ratio']})",
+                file=sys.stderr,
+            )
+        exit_code = 1 if report["regressions"] else 0
+
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        args.output.write_text(text + "\n", encoding="utf-8")
+    else:
+        print(text)
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,198 @@
+"""capture.py
+
+Capture des requêtes /decide (opt-in) pour les rejouer avec `replay.py`.
+
+- `DecideCaptureMiddleware`: middleware ASGI qui recopie le corps des requêtes
+  POST capturées, sans modifier le traitement ni la réponse
+- `CaptureWriter`: écrit les enregistrements en JSONL depuis un thread dédié
+  (aucune écriture disque dans la boucle d'événements; file bornée, les
+  enregistrements en trop sont comptés puis abandonnés)
+
+Anonymisation: seuls `symptomes` et `conditions_medicales` sont gardés, sous
+leur forme normalisée s'ils appartiennent au catalogue, sinon remplacés par
+`UNKNOWN_TERM` (un texte libre peut contenir n'importe quoi). Ni en-têtes, ni
+jeton, ni adresse IP, ni date absolue: `t` est le délai depuis le début de la
+capture, suffisant pour reproduire la forme de la charge.
+"""
+
+from __future__ import annotations
+
+import json
+import queue
+import random
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from logic import get_vocabulary
+from service import _norm, _norm_symptome
+
+UNKNOWN_TERM = "<inconnu>"
+
+
+def anonymize_decide_payload(payload: Any) -> Optional[Dict[str, Any]]:
+    """Corps /decide réduit aux termes connus du catalogue (None si le corps n'est pas exploitable)."""
+    if not isinstance(payload, dict) or not isinstance(payload.get("symptomes"), list):
+        return None
+
+    vocabulary = get_vocabulary()
+
+    symptomes = []
+    for s in payload["symptomes"]:
+        if isinstance(s, str) and _norm(s):
+            normalized = _norm_symptome(s, vocabulary)
+            symptomes.append(normalized if normalized in vocabulary.known_symptoms else UNKNOWN_TERM)
+
+    conditions = []
+    for c in payload.get("conditions_medicales") or []:
+        if isinstance(c, str) and _norm(c):
+            normalized = _norm(c)
+            conditions.append(normalized if normalized in vocabulary.known_conditions else UNKNOWN_TERM)
+
+    return {"symptomes": symptomes, "conditions_medicales": conditions}
+
+
+class CaptureWriter:
+    """Ajoute les requêtes capturées à un fichier JSONL (thread d'écriture dédié).
+
+- `sample_rate`: part des requêtes capturées (1.0 = toutes)
+- `max_pending`: enregistrements en attente d'écriture au-delà desquels on abandonne
+"""
+
+    def __init__(self, path: Path, sample_rate: float = 1.0, max_pending: int = 10_000):
+        if not 0.0 <= sample_rate <= 1.0:
+            raise ValueError("sample_rate doit être entre 0 et 1")
+
+        self.path = Path(path)
+        self.sample_rate = sample_rate
+        self._started = time.monotonic()
+        self._queue: "queue.Queue[Optional[Tuple[float, str, bytes, int, float]]]" = queue.Queue(max_pending)
+
+        self._written = 0
+        self._dropped = 0
+        self._skipped = 0
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name="decide-capture", daemon=True)
+        self._thread.start()
+
+    def sampled(self) -> bool:
+        return self.sample_rate >= 1.0 or random.random() < self.sample_rate
+
+    def submit(self, path: str, body: bytes, status: int, duration: float) -> None:
+        try:
+            self._queue.put_nowait((time.monotonic() - self._started, path, body, status, duration))
+        except queue.Full:
+            self._dropped += 1
+
+    def _record(self, t: float, path: str, body: bytes, status: int, duration: float) -> Optional[Dict[str, Any]]:
+        try:
+            payload = anonymize_decide_payload(json.loads(body))
+        except (ValueError, TypeError):
+            # Corps illisible (la réponse a été une 422): rien d'utile à rejouer
+            payload = None
+        if payload is None:
+            return None
+        return {
+            "t": round(t, 6),
+            "method": "POST",
+            "path": path,
+            "status": status,
+            "duration_ms": round(duration * 1000, 3),
+            "body": payload,
+        }
+
+    def _run(self) -> None:
+        with self.path.open("a", encoding="utf-8") as f:
+            while True:
+                item = self._queue.get()
+                if item is None:
+                    return
+                record = self._record(*item)
+                if record is None:
+                    self._skipped += 1
+                    continue
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                self._written += 1
+                if self._queue.empty():
+                    f.flush()
+
+    def close(self) -> None:
+        """Écrit les enregistrements en attente puis arrête le thread."""
+        self._queue.put(None)
+        self._thread.join()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "path": str(self.path),
+            "sample_rate": self.sample_rate,
+            "written": self._written,
+            "pending": self._queue.qsize(),
+            "dropped": self._dropped,
+            "skipped": self._skipped,
+        }
+
+
+_WRITER: Optional[CaptureWriter] = None
+
+
+def configure(path: Optional[str], sample_rate: float = 1.0) -> Optional[CaptureWriter]:
+    """Active la capture vers `path` (None = désactivée). Remplace la capture en cours."""
+    global _WRITER
+    close()
+    _WRITER = CaptureWriter(Path(path), sample_rate) if path else None
+    return _WRITER
+
+
+def close() -> None:
+    global _WRITER
+    writer, _WRITER = _WRITER, None
+    if writer is not None:
+        writer.close()
+
+
+def capture_stats() -> Optional[Dict[str, Any]]:
+    writer = _WRITER
+    return writer.stats() if writer is not None else None
+
+
+class DecideCaptureMiddleware:
+    """Middleware ASGI: recopie le corps des POST sur `paths` vers la capture active."""
+
+    def __init__(self, app, paths: Tuple[str, ...] = ("/decide",)):
+        self.app = app
+        self.paths = paths
+
+    async def __call__(self, scope, receive, send):
+        writer = _WRITER
+        if (
+            writer is None
+            or scope["type"] != "http"
+            or scope["method"] != "POST"
+            or scope["path"] not in self.paths
+            or not writer.sampled()
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        chunks = []
+        status = 0
+
+        async def receive_and_copy():
+            message = await receive()
+            if message["type"] == "http.request":
+                chunks.append(message.get("body", b""))
+            return message
+
+        async def send_and_observe(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive_and_copy, send_and_observe)
+        finally:
+            writer.submit(scope["path"], b"".join(chunks), status, time.perf_counter() - started)
@@ -0,0 +1,57 @@
+"""compile_catalogue.py
+
+Construit à l'avance l'artefact compilé du catalogue (voir `database.py`):
+catalogue projeté, règles extraites et index du moteur, plus le segment
+partagé de l'index de décision (voir `sharedcat.py`).
+
+Usage (ex: étape de build de l'image Docker):
+    python compile_catalogue.py [--output chemin/catalogue.pickle]
+
+    # durées de lecture des JSON (fichiers lents ou trop gros)
+    python compile_catalogue.py --timings 10 [--workers 0]
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+from pathlib import Path
+
+import database
+import sharedcat
+from fastpath import build_decision_index
+from logic import get_product_condition_index, get_vocabulary
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compile le catalogue data/ en artefact binaire.")
+    parser.add_argument("--output", type=Path, default=None, help="chemin de l'artefact (défaut: CATALOGUE_CACHE_PATH)")
+    parser.add_argument("--timings", type=int, default=0, metavar="N", help="relit les JSON et affiche les N fichiers les plus lents")
+    parser.add_argument("--workers", type=int, default=None, help="workers de lecture (défaut: CATALOGUE_LOAD_WORKERS, 0 = un par CPU)")
+    args = parser.parse_args()
+
+    if args.timings:
+        started = time.perf_counter()
+        compiled = database._compile_from_json(database._DATA_DIR, args.workers)
+        print(f"{len(compiled['file_timings'])} fichiers lus en {time.perf_counter() - started:.3f}s")
+        for t in database.slowest_files(compiled["file_timings"], args.timings):
+            print(f"  {t['seconds'] * 1000:8.1f} ms  {t['bytes'] / 1024:8.0f} KiB  {t['rules']:5d} règles  {t['file']}")
+
+    started = time.perf_counter()
+    indexes = {
+        "vocabulary": get_vocabulary(),
+        "product_condition_index": get_product_condition_index(),
+    }
+    segment = sharedcat.write_decision_index() if sharedcat.ENABLED else None
+    if segment is None:
+        # Sans segment partagé, l'index en dicts voyage dans l'artefact (une copie par worker)
+        indexes["decision_index"] = build_decision_index()
+    path = database.write_compiled_catalogue(indexes=indexes, path=args.output)
+
+    print(f"Artefact écrit: {path} (version {database.CATALOGUE_VERSION}, {time.perf_counter() - started:.3f}s)")
+    if segment is not None:
+        print(f"Index de décision partagé: {segment} ({segment.stat().st_size / 1024:.0f} KiB)")
+
+
+if __name__ == "__main__":
+    main()
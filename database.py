@@ -12,17 +12,43 @@ Le moteur Experta (`logic.py`) itère sur `CATALOGUE_COMPLET` et lit:
 - `sheet['safety']` (pregnancy_lactation, interactions, precautions)
 
 Les JSON de `data/` (supplements/other/diets) suivent déjà ce schéma.
+
+Mémoire: seules ces sections (plus `description`/`dosage` pour la console)
+restent en mémoire. Les fiches de `CATALOGUE_COMPLET` sont des `CatalogueSheet`
+(Mapping en lecture seule): les sections lourdes (`references`, `faq`,
+`overview`, `database_references`, résultats d'études) sont relues depuis le
+JSON au premier accès, avec un cache LRU borné (`CATALOGUE_DETAILS_CACHE_SIZE`).
+Au chargement, chaque fiche est décodée en entier (`json.load`) puis projetée;
+CATALOGUE_JSON_PARSER=selective utilise `jsonscan.py` à la place.
+
+Rechargement: le catalogue courant est un `CatalogueSnapshot` publié par un
+`CatalogueStore`. `reload_catalogue()` (ou la scrutation de `data/`) en
+construit un nouveau sans redémarrer le processus; `current_catalogue()`
+retourne le snapshot à utiliser pour un traitement.
 """
 
 from __future__ import annotations
 
+import hashlib
 import json
+import multiprocessing
+import os
+import pickle
+import threading
+import time
+from collections.abc import Mapping
+from contextlib import suppress
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache
 from pathlib import Path
-from typing import Any, Dict, Iterable, List, Tuple
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from jsonscan import compile_paths, load_selected
 
 
 _ROOT = Path(__file__).resolve().parent
-_DATA_DIR = _ROOT / "data"
+# CATALOGUE_DATA_DIR: autre dossier de données (ex: catalogues synthétiques de benchmark.py)
+_DATA_DIR = Path(os.environ.get("CATALOGUE_DATA_DIR", str(_ROOT / "data")))
 
 
 def _read_json(path: Path) -> Dict[str, Any]:
@@ -30,41 +56,107 @@ def _read_json(path: Path) -> Dict[str, Any]:
         return json.load(f)
 
 
-def _load_folder_json(folder: Path) -> List[Dict[str, Any]]:
-    if not folder.exists() or not folder.is_dir():
-        return []
+# Sections gardées telles quelles en mémoire (moteur + affichage console)
+_SLIM_FIELDS = ("slug", "name", "name_en", "description", "dosage", "safety")
 
-    items: List[Dict[str, Any]] = []
-    for p in sorted(folder.glob("*.json"), key=lambda x: x.name.lower()):
-        try:
-            items.append(_read_json(p))
-        except json.JSONDecodeError as e:
-            raise ValueError(f"JSON invalide: {p}") from e
-    return items
+# Chemins gardés au chargement d'une fiche (projection). CATALOGUE_JSON_PARSER:
+# - "full" (défaut): `json.load` complet suivi de la projection
+# - "selective": jsonscan.py, qui ne garde que ces chemins. Le fichier est lu en
+#   entier dans les deux cas: même pic mémoire mesuré (3,2 Mo sur fish-oil.json,
+#   dominé par la chaîne du fichier), et lecture un peu plus lente (7,6 ms contre 6,9 ms)
+_SHEET_SPEC = compile_paths([*_SLIM_FIELDS, "database[*].health_condition_or_goal"])
+_JSON_PARSER = os.environ.get("CATALOGUE_JSON_PARSER", "full")
 
+# Nombre de fiches complètes gardées en cache après un accès aux sections lourdes
+_DETAILS_CACHE_SIZE = int(os.environ.get("CATALOGUE_DETAILS_CACHE_SIZE", "8"))
 
-def _build_catalogue_from_data(data_dir: Path) -> Dict[str, List[Dict[str, Any]]]:
-    """Construit un catalogue compatible avec le code existant.
 
-Mapping (garde l'idée des catégories actuelles):
-- data/supplements -> complement_alimentaire
-- data/other       -> sport_et_pratique
-- data/diets       -> regime_alimentaire
+@lru_cache(maxsize=_DETAILS_CACHE_SIZE)
+def load_sheet_details(path: Path, mtime_ns: int) -> Dict[str, Any]:
+    """Fiche JSON complète (toutes sections). Partagée via le cache: ne pas la modifier.
 
-Note: `data/conditions` et `data/categories` sont chargés séparément (voir plus bas),
-car ce ne sont pas des "produits" au sens du moteur de recommandations.
+`mtime_ns` (date de modification du fichier) fait partie de la clé: un JSON
+modifié sur disque (rechargement à chaud ou non) n'est jamais servi depuis
+une entrée lue avant la modification.
 """
+    return _read_json(path)
 
-    mapping: List[Tuple[str, str]] = [
-        ("supplements", "complement_alimentaire"),
-        ("other", "sport_et_pratique"),
-        ("diets", "regime_alimentaire"),
-    ]
 
-    catalogue: Dict[str, List[Dict[str, Any]]] = {}
-    for folder_name, category_key in mapping:
-        catalogue[category_key] = _load_folder_json(data_dir / folder_name)
-    return catalogue
+def _project_sheet(sheet: Dict[str, Any]) -> Dict[str, Any]:
+    slim = {k: sheet[k] for k in _SLIM_FIELDS if k in sheet}
+    if "database" in sheet:
+        # Seule la cible de chaque entrée sert aux règles; les résultats d'études restent sur disque
+        slim["database"] = [
+            {"health_condition_or_goal": entry.get("health_condition_or_goal", "")}
+            for entry in sheet.get("database") or []
+        ]
+    return slim
+
+
+class CatalogueSheet(Mapping):
+    """Fiche produit en lecture seule: projection compacte + sections lourdes à la demande.
+
+`sheet['database']` renvoie la projection (cibles uniquement); la fiche complète,
+études comprises, est disponible via `sheet.details()`.
+"""
+
+    __slots__ = ("path", "_slim", "_keys")
+
+    def __init__(self, path: Path, sheet: Dict[str, Any]):
+        self.path = path
+        self._slim = _project_sheet(sheet)
+        self._keys = tuple(sheet)
+
+    @classmethod
+    def from_projection(cls, path: Path, keys: Tuple[str, ...], slim: Dict[str, Any]) -> "CatalogueSheet":
+        """Crée une fiche depuis sa projection déjà calculée (artefact compilé, lecture sélective)."""
+        sheet = cls.__new__(cls)
+        sheet.path = path
+        sheet._slim = slim
+        sheet._keys = tuple(keys)
+        return sheet
+
+    def __getitem__(self, key: str) -> Any:
+        if key in self._slim:
+            return self._slim[key]
+        if key in self._keys:
+            return self.details()[key]
+        raise KeyError(key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._keys)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __repr__(self) -> str:
+        return f"CatalogueSheet({self.path.name!r}, name={self._slim.get('name')!r})"
+
+    def details(self) -> Dict[str, Any]:
+        return load_sheet_details(self.path, self.path.stat().st_mtime_ns)
+
+
+def _read_sheet(path: Path) -> CatalogueSheet:
+    if _JSON_PARSER == "full":
+        return CatalogueSheet(path, _read_json(path))
+    selected, keys = load_selected(path, _SHEET_SPEC)
+    return CatalogueSheet.from_projection(path, keys, _project_sheet(selected))
+
+
+# Dossiers de produits -> catégories du catalogue (garde l'idée des catégories actuelles).
+# `data/conditions` et `data/categories` sont chargés séparément, car ce ne sont
+# pas des "produits" au sens du moteur de recommandations.
+_CATEGORY_FOLDERS: List[Tuple[str, str]] = [
+    ("supplements", "complement_alimentaire"),
+    ("other", "sport_et_pratique"),
+    ("diets", "regime_alimentaire"),
+]
+
+
+def _sorted_json_files(folder: Path) -> List[Path]:
+    if not folder.exists() or not folder.is_dir():
+        return []
+    return sorted(folder.glob("*.json"), key=lambda x: x.name.lower())
 
 
 def _is_risky_pregnancy_text(text: str) -> bool:
@@ -73,7 +165,7 @@ def _is_risky_pregnancy_text(text: str) -> bool:
     return any(k in t for k in risky_keywords)
 
 
-def _extract_rules(catalogue: Dict[str, List[Dict[str, Any]]]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+def _extract_rules(catalogue: Dict[str, List[Mapping]]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
     """Construit des listes "plates" pour le service layer.
 
 CATALOGUE_PRODUITS: [{produit, cible}]
@@ -85,57 +177,550 @@ CONTRE_INDICATIONS: [{produit, condition}]
 
     for _category, sheets in catalogue.items():
         for sheet in sheets:
-            product_name = (sheet.get("name") or "").strip()
-            if not product_name:
-                continue
-
-            # A) Indications (symptômes/cibles)
-            for entry in sheet.get("database", []) or []:
-                target = (entry.get("health_condition_or_goal") or "").strip().lower()
-                if target:
-                    produits.append({"produit": product_name, "cible": target})
-
-            # B) Sécurité (contre-indications)
-            safety = sheet.get("safety") or {}
-
-            # grossesse / allaitement
-            for pl in safety.get("pregnancy_lactation", []) or []:
-                condition_text = (pl.get("condition") or "").strip()
-                safety_info = (pl.get("safety_information") or "").strip()
-                combined = f"{condition_text} {safety_info}"
-                combined_l = combined.lower()
-
-                if "grossesse" in combined_l and _is_risky_pregnancy_text(combined):
-                    contres.append({"produit": product_name, "condition": "grossesse"})
-                if "allait" in combined_l and _is_risky_pregnancy_text(combined):
-                    contres.append({"produit": product_name, "condition": "allaitement"})
-
-            # interactions médicamenteuses
-            for inter in safety.get("interactions", []) or []:
-                agent = (inter.get("agent") or "").strip().lower()
-                if agent:
-                    contres.append({"produit": product_name, "condition": agent})
-
-            # précautions
-            for prec in safety.get("precautions", []) or []:
-                pop = (prec.get("population_condition") or "").strip().lower()
-                if pop:
-                    contres.append({"produit": product_name, "condition": pop})
+            p, c = _extract_sheet_rules(sheet)
+            produits.extend(p)
+            contres.extend(c)
 
     return produits, contres
 
 
+def _extract_sheet_rules(sheet: Mapping) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """Règles d'une fiche: (indications, contre-indications), voir `_extract_rules`."""
+    produits: List[Dict[str, Any]] = []
+    contres: List[Dict[str, Any]] = []
+
+    product_name = (sheet.get("name") or "").strip()
+    if not product_name:
+        return produits, contres
+
+    # A) Indications (symptômes/cibles)
+    for entry in sheet.get("database", []) or []:
+        target = (entry.get("health_condition_or_goal") or "").strip().lower()
+        if target:
+            produits.append({"produit": product_name, "cible": target})
+
+    # B) Sécurité (contre-indications)
+    safety = sheet.get("safety") or {}
+
+    # grossesse / allaitement
+    for pl in safety.get("pregnancy_lactation", []) or []:
+        condition_text = (pl.get("condition") or "").strip()
+        safety_info = (pl.get("safety_information") or "").strip()
+        combined = f"{condition_text} {safety_info}"
+        combined_l = combined.lower()
+
+        if "grossesse" in combined_l and _is_risky_pregnancy_text(combined):
+            contres.append({"produit": product_name, "condition": "grossesse"})
+        if "allait" in combined_l and _is_risky_pregnancy_text(combined):
+            contres.append({"produit": product_name, "condition": "allaitement"})
+
+    # interactions médicamenteuses
+    for inter in safety.get("interactions", []) or []:
+        agent = (inter.get("agent") or "").strip().lower()
+        if agent:
+            contres.append({"produit": product_name, "condition": agent})
+
+    # précautions
+    for prec in safety.get("precautions", []) or []:
+        pop = (prec.get("population_condition") or "").strip().lower()
+        if pop:
+            contres.append({"produit": product_name, "condition": pop})
+
+    return produits, contres
+
+
+# --- Chargement fichier par fichier (parallélisable) ---
+#
+# CATALOGUE_LOAD_WORKERS: 1 = séquentiel (défaut), 0 = un worker par CPU, N = N workers
+# CATALOGUE_LOAD_EXECUTOR: "thread" (défaut) ou "process" (vrai parallélisme du
+# décodage). Les processus sont créés par fork: réservé au chargement à l'import
+# et à compile_catalogue.py. Un rechargement tourne dans un serveur qui a déjà
+# des threads (scrutation, threadpool...): un fork y hériterait de verrous tenus.
+
+_LOAD_WORKERS = int(os.environ.get("CATALOGUE_LOAD_WORKERS", "1"))
+_LOAD_EXECUTOR = os.environ.get("CATALOGUE_LOAD_EXECUTOR", "thread")
+
+
+def _load_sheet_file(path: Path) -> Tuple[CatalogueSheet, List[Dict[str, Any]], List[Dict[str, Any]], float]:
+    """Fiche produit + ses règles + durée de traitement (exécuté par un worker)."""
+    started = time.perf_counter()
+    try:
+        sheet = _read_sheet(path)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"JSON invalide: {path}") from e
+    produits, contres = _extract_sheet_rules(sheet)
+    return sheet, produits, contres, time.perf_counter() - started
+
+
+def _load_meta_file(path: Path) -> Tuple[Dict[str, Any], float]:
+    started = time.perf_counter()
+    try:
+        item = _read_json(path)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"JSON invalide: {path}") from e
+    return item, time.perf_counter() - started
+
+
+def _file_timing(data_dir: Path, path: Path, seconds: float, rules: int) -> Dict[str, Any]:
+    return {
+        "file": path.relative_to(data_dir).as_posix(),
+        "bytes": path.stat().st_size,
+        "seconds": round(seconds, 6),
+        "rules": rules,
+    }
+
+
+def _load_workers(workers: Optional[int] = None) -> int:
+    workers = _LOAD_WORKERS if workers is None else workers
+    return workers if workers > 0 else (os.cpu_count() or 1)
+
+
+def _map_files(
+    fn: Callable[[Path], Any], paths: List[Path], workers: Optional[int] = None, executor: Optional[str] = None,
+) -> List[Any]:
+    """`[fn(p) for p in paths]`, réparti sur un pool de workers; l'ordre des résultats est conservé."""
+    workers = min(_load_workers(workers), len(paths))
+    if workers <= 1:
+        return [fn(p) for p in paths]
+
+    # Les processus sont créés par fork: un démarrage "spawn" réimporterait ce
+    # module (et rechargerait le catalogue) dans chaque worker.
+    executor = executor or _LOAD_EXECUTOR
+    if executor == "process" and "fork" in multiprocessing.get_all_start_methods():
+        pool = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("fork"))
+        chunksize = max(1, len(paths) // (workers * 4))
+    else:
+        pool = ThreadPoolExecutor(workers, thread_name_prefix="catalogue-load")
+        chunksize = 1
+
+    with pool:
+        return list(pool.map(fn, paths, chunksize=chunksize))
+
+
+def _catalogue_version(data_dir: Path) -> str:
+    """Empreinte du contenu de `data/`: change dès qu'un JSON est ajouté, retiré ou modifié."""
+    h = hashlib.sha1()
+    for p in sorted(data_dir.rglob("*.json")):
+        h.update(p.relative_to(data_dir).as_posix().encode("utf-8"))
+        h.update(b"\0")
+        h.update(p.read_bytes())
+    return h.hexdigest()[:16]
+
+
+# --- Artefact compilé (démarrage à froid) ---
+#
+# Le catalogue projeté, les règles extraites et la version sont sérialisés dans
+# un fichier pickle. Au démarrage, l'artefact est réutilisé s'il correspond aux
+# fichiers de `data/` (tailles + mtimes, puis empreinte du contenu en secours),
+# sinon il est reconstruit depuis les JSON et réécrit. `python compile_catalogue.py`
+# le construit à l'avance (image Docker) en y ajoutant les index du moteur.
+
+_CACHE_ENABLED = os.environ.get("CATALOGUE_CACHE", "1") != "0"
+_CACHE_PATH = Path(os.environ.get("CATALOGUE_CACHE_PATH", str(_ROOT / ".cache" / "catalogue.pickle")))
+_ARTIFACT_FORMAT = 1
+
+
+def _fingerprint(data_dir: Path) -> List[Tuple[str, int, int]]:
+    out: List[Tuple[str, int, int]] = []
+    for p in sorted(data_dir.rglob("*.json")):
+        st = p.stat()
+        out.append((p.relative_to(data_dir).as_posix(), st.st_size, st.st_mtime_ns))
+    return out
+
+
+def _compile_from_json(data_dir: Path, workers: Optional[int] = None, executor: Optional[str] = None) -> Dict[str, Any]:
+    """Lit `data/` et extrait les règles, fichier par fichier (en parallèle si `workers` > 1).
+
+`executor`: "thread" ou "process" (défaut: CATALOGUE_LOAD_EXECUTOR).
+Le résultat est fusionné dans l'ordre trié habituel: il ne dépend pas du nombre de workers.
+"""
+    sheet_files = [
+        (category_key, path)
+        for folder_name, category_key in _CATEGORY_FOLDERS
+        for path in _sorted_json_files(data_dir / folder_name)
+    ]
+    meta_files = {key: _sorted_json_files(data_dir / key) for key in ("categories", "conditions")}
+    meta_paths = [path for paths in meta_files.values() for path in paths]
+
+    sheet_results = _map_files(_load_sheet_file, [path for _, path in sheet_files], workers, executor)
+    meta_results = iter(_map_files(_load_meta_file, meta_paths, workers, executor))
+
+    catalogue: Dict[str, List[CatalogueSheet]] = {category_key: [] for _, category_key in _CATEGORY_FOLDERS}
+    produits: List[Dict[str, Any]] = []
+    contres: List[Dict[str, Any]] = []
+    timings: List[Dict[str, Any]] = []
+
+    for (category_key, path), (sheet, p, c, seconds) in zip(sheet_files, sheet_results):
+        catalogue[category_key].append(sheet)
+        produits.extend(p)
+        contres.extend(c)
+        timings.append(_file_timing(data_dir, path, seconds, len(p) + len(c)))
+
+    meta: Dict[str, List[Dict[str, Any]]] = {}
+    for key, paths in meta_files.items():
+        meta[key] = []
+        for path in paths:
+            item, seconds = next(meta_results)
+            meta[key].append(item)
+            timings.append(_file_timing(data_dir, path, seconds, 0))
+
+    return {
+        "version": _catalogue_version(data_dir),
+        "catalogue": catalogue,
+        "categories": meta["categories"],
+        "conditions": meta["conditions"],
+        "produits": produits,
+        "contres": contres,
+        "indexes": None,
+        "file_timings": timings,
+    }
+
+
+def _to_artifact(compiled: Dict[str, Any], data_dir: Path, fingerprint: List[Tuple[str, int, int]]) -> Dict[str, Any]:
+    # Les durées de chargement décrivent une lecture des JSON, pas l'artefact
+    artifact = {k: v for k, v in compiled.items() if k != "file_timings"}
+    artifact["format"] = _ARTIFACT_FORMAT
+    artifact["fingerprint"] = fingerprint
+    # Chemins relatifs: l'artefact reste valide si le dossier du projet est déplacé
+    artifact["catalogue"] = {
+        category: [(sheet.path.relative_to(data_dir).as_posix(), sheet._keys, sheet._slim) for sheet in sheets]
+        for category, sheets in compiled["catalogue"].items()
+    }
+    return artifact
+
+
+def _from_artifact(artifact: Dict[str, Any], data_dir: Path) -> Dict[str, Any]:
+    compiled = {k: v for k, v in artifact.items() if k not in ("format", "fingerprint")}
+    compiled["catalogue"] = {
+        category: [CatalogueSheet.from_projection(data_dir / rel, keys, slim) for rel, keys, slim in sheets]
+        for category, sheets in artifact["catalogue"].items()
+    }
+    return compiled
+
+
+def _read_artifact(path: Path) -> Any:
+    try:
+        with path.open("rb") as f:
+            artifact = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError, ValueError):
+        return None
+    if not isinstance(artifact, dict) or artifact.get("format") != _ARTIFACT_FORMAT:
+        return None
+    return artifact
+
+
+def _write_artifact(path: Path, artifact: Dict[str, Any]) -> bool:
+    # Écriture atomique; un système de fichiers en lecture seule ou un objet non
+    # sérialisable n'empêche pas le démarrage (l'artefact n'est qu'un cache)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with tmp.open("wb") as f:
+            pickle.dump(artifact, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+        return True
+    except (OSError, pickle.PicklingError, TypeError, AttributeError):
+        return False
+    finally:
+        # Fichier temporaire laissé par une écriture interrompue
+        with suppress(OSError):
+            tmp.unlink()
+
+
+def _load_compiled(
+    data_dir: Path, cache_path: Optional[Path] = None, executor: Optional[str] = None,
+) -> Tuple[Dict[str, Any], str]:
+    """Retourne (catalogue compilé, source) avec source = "artifact" ou "json"."""
+    if not _CACHE_ENABLED:
+        return _compile_from_json(data_dir, executor=executor), "json"
+
+    cache_path = cache_path or _CACHE_PATH
+    fingerprint = _fingerprint(data_dir)
+    artifact = _read_artifact(cache_path)
+
+    if artifact is not None and artifact["fingerprint"] == fingerprint:
+        return _from_artifact(artifact, data_dir), "artifact"
+
+    if artifact is not None and artifact["version"] == _catalogue_version(data_dir):
+        # Seules les dates ont changé (checkout git, COPY Docker...): contenu identique
+        artifact["fingerprint"] = fingerprint
+        _write_artifact(cache_path, artifact)
+        return _from_artifact(artifact, data_dir), "artifact"
+
+    compiled = _compile_from_json(data_dir, executor=executor)
+    _write_artifact(cache_path, _to_artifact(compiled, data_dir, fingerprint))
+    return compiled, "json"
+
+
+# --- Catalogue rechargeable (snapshots immuables) ---
+#
+# Le catalogue et tout ce qui en est dérivé (vocabulaire, index, base de
+# connaissances Experta...) forment un `CatalogueSnapshot`. Un rechargement
+# construit un nouveau snapshot complet puis le publie d'une seule affectation:
+# une requête qui a déjà pris le snapshot courant termine dessus, la suivante
+# voit le nouveau.
+
+_MISSING = object()
+
+
+class CatalogueSnapshot:
+    """Catalogue compilé d'une version de `data/`, en lecture seule.
+
+- `version`: empreinte du contenu (voir `_catalogue_version`)
+- `generation`: numéro croissant du snapshot dans le processus (1 = chargement initial)
+- `derived(name, builder)`: valeur construite une fois pour ce snapshot
+"""
+
+    def __init__(self, compiled: Dict[str, Any], generation: int = 1, source: str = "json", load_duration: float = 0.0):
+        self.version: str = compiled["version"]
+        self.generation = generation
+        self.source = source
+        self.loaded_at = time.time()
+        self.load_duration = load_duration
+
+        self.catalogue: Dict[str, List[CatalogueSheet]] = compiled["catalogue"]
+        self.categories: List[Dict[str, Any]] = compiled["categories"]
+        self.conditions: List[Dict[str, Any]] = compiled["conditions"]
+        self.produits: List[Dict[str, Any]] = compiled["produits"]
+        self.contres: List[Dict[str, Any]] = compiled["contres"]
+        # Durée de lecture de chaque JSON (vide si le snapshot vient de l'artefact)
+        self.file_timings: List[Dict[str, Any]] = compiled.get("file_timings") or []
+
+        self._indexes_blob: Optional[bytes] = compiled.get("indexes")
+        self._compiled_indexes: Optional[Dict[str, Any]] = None
+        self._derived: Dict[str, Any] = {}
+        self._lock = threading.RLock()
+
+    def __repr__(self) -> str:
+        return f"CatalogueSnapshot(version={self.version!r}, generation={self.generation})"
+
+    def compiled_index(self, name: str) -> Any:
+        """Index précalculé `name` de l'artefact (None s'il n'y en a pas).
+
+Les index sont sérialisés à part et désérialisés à la demande, car ils
+référencent des classes de modules qui importent `database`.
+"""
+        with self._lock:
+            if self._compiled_indexes is None:
+                blob = self._indexes_blob
+                self._compiled_indexes = pickle.loads(blob) if blob else {}
+            return self._compiled_indexes.get(name)
+
+    def derived(self, name: str, builder: Callable[["CatalogueSnapshot"], Any]) -> Any:
+        """Valeur `name` de ce snapshot, construite au premier appel par `builder(snapshot)`.
+
+Un index précalculé de même nom dans l'artefact est réutilisé s'il porte la même version.
+"""
+        value = self._derived.get(name, _MISSING)
+        if value is not _MISSING:
+            return value
+        with self._lock:
+            value = self._derived.get(name, _MISSING)
+            if value is _MISSING:
+                value = self.compiled_index(name)
+                if value is None or getattr(value, "version", None) != self.version:
+                    value = builder(self)
+                self._derived[name] = value
+            return value
+
+
+class CatalogueStore:
+    """Détient le snapshot courant et le remplace lors d'un rechargement.
+
+- `reload()`: reconstruit le catalogue depuis `data/` (artefact compris) et le publie
+- `start_watching(interval)`: recharge automatiquement quand un JSON change (scrutation)
+- `add_warmup(fn)`: `fn(snapshot)` est appelé avant publication (ex: compiler les index);
+  une exception annule le rechargement et l'ancien snapshot reste en place
+- `subscribe(fn)`: `fn(snapshot)` est appelé après publication
+"""
+
+    def __init__(self, data_dir: Path, cache_path: Optional[Path] = None):
+        self.data_dir = data_dir
+        self.cache_path = cache_path
+
+        started = time.perf_counter()
+        compiled, source = _load_compiled(data_dir, cache_path)
+        self._snapshot = CatalogueSnapshot(compiled, 1, source, time.perf_counter() - started)
+        self._fingerprint = _fingerprint(data_dir)
+
+        self._reload_lock = threading.Lock()
+        self._warmups: List[Callable[[CatalogueSnapshot], Any]] = []
+        self._subscribers: List[Callable[[CatalogueSnapshot], Any]] = []
+
+        self._reloads = 0
+        self._reload_failures = 0
+        self._last_reload_duration: Optional[float] = None
+        self._last_reload_at: Optional[float] = None
+        self._last_error: Optional[str] = None
+
+        self._watch_interval: Optional[float] = None
+        self._watch_stop: Optional[threading.Event] = None
+        self._watcher: Optional[threading.Thread] = None
+
+    def current(self) -> CatalogueSnapshot:
+        return self._snapshot
+
+    def add_warmup(self, fn: Callable[[CatalogueSnapshot], Any]) -> None:
+        self._warmups.append(fn)
+
+    def subscribe(self, fn: Callable[[CatalogueSnapshot], Any]) -> None:
+        self._subscribers.append(fn)
+
+    def changed(self) -> bool:
+        """Vrai si un JSON de `data/` a été ajouté, retiré ou modifié depuis le dernier chargement."""
+        return _fingerprint(self.data_dir) != self._fingerprint
+
+    def reload(self, force: bool = False) -> bool:
+        """Recharge `data/` si nécessaire (ou toujours avec `force`). Retourne vrai si un snapshot a été publié.
+
+Les rechargements concurrents sont sérialisés; une erreur est levée à l'appelant
+après avoir été comptée dans `stats()`.
+"""
+        with self._reload_lock:
+            fingerprint = _fingerprint(self.data_dir)
+            if not force and fingerprint == self._fingerprint:
+                return False
+
+            started = time.perf_counter()
+            try:
+                # Jamais de fork ici (voir CATALOGUE_LOAD_EXECUTOR)
+                compiled, source = _load_compiled(self.data_dir, self.cache_path, executor="thread")
+                snapshot = CatalogueSnapshot(compiled, self._snapshot.generation + 1, source)
+                for warmup in self._warmups:
+                    warmup(snapshot)
+            except Exception as e:
+                self._reload_failures += 1
+                self._last_error = f"{type(e).__name__}: {e}"
+                raise
+
+            duration = time.perf_counter() - started
+            snapshot.load_duration = duration
+
+            # Publication: une seule affectation, atomique pour les lecteurs
+            self._snapshot = snapshot
+            self._fingerprint = fingerprint
+            load_sheet_details.cache_clear()
+
+            self._reloads += 1
+            self._last_reload_duration = duration
+            self._last_reload_at = time.time()
+            self._last_error = None
+
+            for subscriber in self._subscribers:
+                subscriber(snapshot)
+            return True
+
+    def _watch(self, interval: float, stop: threading.Event) -> None:
+        while not stop.wait(interval):
+            try:
+                self.reload()
+            except Exception:
+                # Déjà compté dans stats(); on réessaie au prochain changement de fichier
+                self._fingerprint = _fingerprint(self.data_dir)
+
+    def start_watching(self, interval: float = 5.0) -> None:
+        """Démarre la scrutation de `data/` toutes les `interval` secondes (thread démon)."""
+        if interval <= 0:
+            raise ValueError("interval doit être > 0")
+        self.stop_watching()
+        stop = threading.Event()
+        thread = threading.Thread(target=self._watch, args=(interval, stop), name="catalogue-watcher", daemon=True)
+        self._watch_interval = interval
+        self._watch_stop = stop
+        self._watcher = thread
+        thread.start()
+
+    def stop_watching(self) -> None:
+        if self._watch_stop is not None:
+            self._watch_stop.set()
+        if self._watcher is not None and self._watcher is not threading.current_thread():
+            self._watcher.join()
+        self._watch_interval = None
+        self._watch_stop = None
+        self._watcher = None
+
+    def stats(self) -> Dict[str, Any]:
+        snapshot = self._snapshot
+        return {
+            "version": snapshot.version,
+            "generation": snapshot.generation,
+            "source": snapshot.source,
+            "loaded_at": snapshot.loaded_at,
+            "load_duration_s": round(snapshot.load_duration, 6),
+            "reloads": self._reloads,
+            "reload_failures": self._reload_failures,
+            "last_reload_duration_s": round(self._last_reload_duration, 6) if self._last_reload_duration is not None else None,
+            "last_reload_at": self._last_reload_at,
+            "last_error": self._last_error,
+            "watch_interval_s": self._watch_interval,
+            "slowest_files": slowest_files(snapshot.file_timings),
+        }
+
+
+def slowest_files(timings: List[Dict[str, Any]], n: int = 5) -> List[Dict[str, Any]]:
+    """Les `n` fichiers les plus longs à charger (voir `CatalogueSnapshot.file_timings`)."""
+    return sorted(timings, key=lambda t: t["seconds"], reverse=True)[:n]
+
+
+def write_compiled_catalogue(indexes: Optional[Dict[str, Any]] = None, path: Optional[Path] = None) -> Path:
+    """Écrit l'artefact du catalogue courant, avec des index précalculés optionnels."""
+    path = path or _CACHE_PATH
+    snapshot = current_catalogue()
+    compiled = {
+        "version": snapshot.version,
+        "catalogue": snapshot.catalogue,
+        "categories": snapshot.categories,
+        "conditions": snapshot.conditions,
+        "produits": snapshot.produits,
+        "contres": snapshot.contres,
+        "indexes": pickle.dumps(indexes, protocol=pickle.HIGHEST_PROTOCOL) if indexes else None,
+    }
+    if not _write_artifact(path, _to_artifact(compiled, _STORE.data_dir, _fingerprint(_STORE.data_dir))):
+        raise OSError(f"Impossible d'écrire l'artefact: {path}")
+    return path
+
+
 # --- Chargement principal (utilisé par logic.py / app.py) ---
 
-CATALOGUE_COMPLET: Dict[str, List[Dict[str, Any]]] = _build_catalogue_from_data(_DATA_DIR)
+_STORE = CatalogueStore(_DATA_DIR)
+
+CATALOGUE_SOURCE = _STORE.current().source
+
+
+def current_catalogue() -> CatalogueSnapshot:
+    """Snapshot courant. Le garder pour toute la durée d'un traitement (cohérence)."""
+    return _STORE.current()
+
+
+def reload_catalogue(force: bool = False) -> bool:
+    """Recharge `data/` si un JSON a changé (voir `CatalogueStore.reload`)."""
+    return _STORE.reload(force=force)
+
+
+def catalogue_stats() -> Dict[str, Any]:
+    return _STORE.stats()
 
 
-# --- Données "meta" (optionnel) ---
+def get_catalogue_store() -> CatalogueStore:
+    return _STORE
 
-CATEGORIES: List[Dict[str, Any]] = _load_folder_json(_DATA_DIR / "categories")
-CONDITIONS: List[Dict[str, Any]] = _load_folder_json(_DATA_DIR / "conditions")
 
+# `CATALOGUE_COMPLET`, `CATEGORIES`, `CONDITIONS`, `CATALOGUE_PRODUITS`,
+# `CONTRE_INDICATIONS` et `CATALOGUE_VERSION` restent disponibles pour le code
+# existant et suivent les rechargements (`database.X`); un `from database import X`
+# fige en revanche la valeur au moment de l'import.
+_SNAPSHOT_ATTRIBUTES = {
+    "CATALOGUE_VERSION": "version",
+    "CATALOGUE_COMPLET": "catalogue",
+    "CATEGORIES": "categories",
+    "CONDITIONS": "conditions",
+    "CATALOGUE_PRODUITS": "produits",
+    "CONTRE_INDICATIONS": "contres",
+}
 
-# --- Compatibilité service.py ---
 
-CATALOGUE_PRODUITS, CONTRE_INDICATIONS = _extract_rules(CATALOGUE_COMPLET)
+def __getattr__(name: str) -> Any:
+    attribute = _SNAPSHOT_ATTRIBUTES.get(name)
+    if attribute is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(_STORE.current(), attribute)
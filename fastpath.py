@@ -0,0 +1,86 @@
+"""fastpath.py
+
+Moteur de décision par index, équivalent aux deux règles Experta:
+
+- `detect_danger` est une jointure ContreIndication ⋈ ConditionClient
+  -> union des produits interdits pour chaque condition déclarée
+- `generate_recommendation` est une jointure BesoinClient ⋈ Produit suivie
+  d'une anti-jointure sur ProduitInterdit
+  -> produits de chaque symptôme, moins les produits interdits
+
+Les index sont construits à partir des mêmes extractions que les DefFacts de
+`MoteurRecommandation` (voir `logic.extract_product_targets` /
+`logic.extract_contraindications`), pour garantir des décisions identiques.
+Experta reste le moteur de référence.
+
+Par défaut, l'index est lu dans un segment projeté en mémoire partagé par les
+workers (`sharedcat.SharedDecisionIndex`, même contrat); `DecisionIndex` en
+mémoire du processus sert de repli (CATALOGUE_SHARED_INDEX=0, disque en
+lecture seule).
+"""
+
+from __future__ import annotations
+
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+import sharedcat
+from database import CatalogueSnapshot, current_catalogue
+from logic import extract_contraindications, extract_product_targets
+
+
+class DecisionIndex:
+    """Index symptôme -> produits et condition -> produits interdits."""
+
+    def __init__(
+        self,
+        product_targets: Iterable[Tuple[str, str]],
+        contraindications: Iterable[Tuple[str, str]],
+        version: str = "",
+    ):
+        self.version = version
+
+        products_by_symptom: Dict[str, Set[str]] = {}
+        for produit, cible in product_targets:
+            products_by_symptom.setdefault(cible, set()).add(produit)
+
+        forbidden_by_condition: Dict[str, Set[str]] = {}
+        for produit, condition in contraindications:
+            forbidden_by_condition.setdefault(condition, set()).add(produit)
+
+        self.products_by_symptom: Dict[str, FrozenSet[str]] = {
+            k: frozenset(v) for k, v in products_by_symptom.items()
+        }
+        self.forbidden_by_condition: Dict[str, FrozenSet[str]] = {
+            k: frozenset(v) for k, v in forbidden_by_condition.items()
+        }
+
+    def infer(
+        self, symptomes_use: List[str], conditions_use: List[str]
+    ) -> Tuple[Set[str], Set[Tuple[str, str]]]:
+        """Même contrat que `service._infer`: (produits interdits, paires (produit, symptôme) recommandées)."""
+        forbidden: Set[str] = set()
+        for c in conditions_use:
+            forbidden |= self.forbidden_by_condition.get(c, frozenset())
+
+        matches: Set[Tuple[str, str]] = set()
+        for s in symptomes_use:
+            for p in self.products_by_symptom.get(s, ()):
+                if p not in forbidden:
+                    matches.add((p, s))
+
+        return forbidden, matches
+
+
+def build_decision_index(snapshot: Optional[CatalogueSnapshot] = None) -> DecisionIndex:
+    snapshot = snapshot or current_catalogue()
+    return DecisionIndex(extract_product_targets(snapshot), extract_contraindications(snapshot), snapshot.version)
+
+
+def get_decision_index(snapshot: Optional[CatalogueSnapshot] = None) -> DecisionIndex:
+    """Index du snapshot (par défaut le catalogue courant), construit au premier usage."""
+    snapshot = snapshot or current_catalogue()
+    if sharedcat.ENABLED:
+        index = snapshot.derived("shared_decision_index", sharedcat.open_decision_index)
+        if index is not None:
+            return index
+    return snapshot.derived("decision_index", build_decision_index)
@@ -0,0 +1,275 @@
+"""hashjoin.py
+
+Jointures du réseau Rete par table de hachage, pour `MoteurRecommandation`.
+
+Dans Experta, un nœud de jointure (`OrdinaryMatchNode`, `NotNode`) compare
+chaque jeton entrant à *toute* la mémoire de l'autre côté. Un
+`ConditionClient(condition=c)` est donc comparé à chaque `ContreIndication`
+du catalogue, un `BesoinClient(symptome=s)` à chaque `Produit`: le coût d'une
+requête croît avec le catalogue.
+
+`IndexedReteMatcher` construit le même réseau, puis range les mémoires de ces
+nœuds par valeur des variables liées des deux côtés (`c` pour `detect_danger`,
+`s` puis `p` pour `generate_recommendation`). Un jeton n'est comparé qu'aux
+jetons de même clé: coût proportionnel aux faits qui correspondent.
+
+Le test d'Experta (`SameContextCheck`) reste appliqué à chaque candidat: les
+jetons produits sont exactement les mêmes. Un jeton auquel manque une variable
+de la clé (ou de valeur non hachable) est rangé à part et comparé à tout,
+comme avant.
+"""
+
+from __future__ import annotations
+
+import collections
+import collections.abc
+from contextlib import suppress
+from typing import Any, Dict, FrozenSet, Hashable, Iterator, Optional, Tuple
+
+# Même correctif que logic.py (Experta sous Python 3.10+), si ce module est importé en premier
+if not hasattr(collections, "Mapping"):
+    collections.Mapping = collections.abc.Mapping
+
+from experta.fieldconstraint import ANDFC, L, P, W
+from experta.matchers import ReteMatcher
+from experta.matchers.rete.check import FeatureCheck, SameContextCheck
+from experta.matchers.rete.nodes import (
+    BusNode,
+    FeatureTesterNode,
+    NotNode,
+    OrdinaryMatchNode,
+    WhereNode,
+)
+from experta.matchers.rete.token import Token, TokenInfo
+
+
+class JoinMemory:
+    """Mémoire d'un côté d'une jointure: jetons (`TokenInfo` -> contexte) rangés par clé."""
+
+    __slots__ = ("keys", "buckets", "unkeyed")
+
+    def __init__(self, keys: Tuple[str, ...]):
+        self.keys = keys
+        self.buckets: Dict[Hashable, Dict[TokenInfo, Dict[Any, Any]]] = {}
+        # Jetons sans clé complète: candidats pour tous les autres
+        self.unkeyed: Dict[TokenInfo, Dict[Any, Any]] = {}
+
+    def key_of(self, context: Dict[Any, Any]) -> Optional[Hashable]:
+        try:
+            key = tuple(context[k] for k in self.keys)
+            hash(key)
+        except (KeyError, TypeError):
+            return None
+        return key
+
+    def add(self, info: TokenInfo, key: Optional[Hashable]) -> None:
+        bucket = self.unkeyed if key is None else self.buckets.setdefault(key, {})
+        bucket[info] = dict(info.context)
+
+    def remove(self, info: TokenInfo, key: Optional[Hashable]) -> None:
+        bucket = self.unkeyed if key is None else self.buckets.get(key)
+        if bucket is not None:
+            with suppress(KeyError):
+                del bucket[info]
+            if key is not None and not bucket:
+                del self.buckets[key]
+
+    def candidates(self, key: Optional[Hashable]) -> Iterator[Tuple[TokenInfo, Dict[Any, Any]]]:
+        """Jetons pouvant correspondre à un jeton de clé `key` (tous si `key` est None)."""
+        if key is None:
+            for bucket in self.buckets.values():
+                yield from bucket.items()
+        else:
+            yield from self.buckets.get(key, {}).items()
+        yield from self.unkeyed.items()
+
+    def __len__(self) -> int:
+        return sum(len(b) for b in self.buckets.values()) + len(self.unkeyed)
+
+    def __bool__(self) -> bool:
+        return bool(self.buckets) or bool(self.unkeyed)
+
+    def __copy__(self) -> "JoinMemory":
+        # Un dict par clé: la copie (clone du moteur) ne partage aucun conteneur modifiable
+        new = JoinMemory(self.keys)
+        new.buckets = {k: dict(v) for k, v in self.buckets.items()}
+        new.unkeyed = dict(self.unkeyed)
+        return new
+
+
+class HashJoinNode(OrdinaryMatchNode):
+    """`OrdinaryMatchNode` dont les mémoires sont des `JoinMemory`."""
+
+    join_keys: Tuple[str, ...] = ()
+
+    def _reset(self):
+        self.left_memory = JoinMemory(self.join_keys)
+        self.right_memory = JoinMemory(self.join_keys)
+
+    def _join(self, token: Token, branch_memory: JoinMemory, matching_memory: JoinMemory, is_left: bool) -> None:
+        # Même traitement que `OrdinaryMatchNode.__activation`, sur les seuls candidats de même clé
+        info = token.to_info()
+        key = branch_memory.key_of(token.context)
+        if token.is_valid():
+            branch_memory.add(info, key)
+        else:
+            branch_memory.remove(info, key)
+
+        for other_info, other_context in matching_memory.candidates(key):
+            if is_left:
+                match = self.matcher(token.context, other_context)
+            else:
+                match = self.matcher(other_context, token.context)
+            if not match:
+                continue
+
+            newcontext = {k: v for k, v in token.context.items() if isinstance(k, str)}
+            for k, v in other_context.items():
+                if not isinstance(k, tuple):
+                    # Negated value are not needed any further
+                    newcontext[k] = v
+
+            newtoken = Token(token.tag, token.data | other_info.data, newcontext)
+            for child in self.children:
+                child.callback(newtoken)
+
+    def _activate_left(self, token):
+        self._join(token, self.left_memory, self.right_memory, is_left=True)
+
+    def _activate_right(self, token):
+        self._join(token, self.right_memory, self.left_memory, is_left=False)
+
+
+class HashNotNode(NotNode):
+    """`NotNode` dont les mémoires sont des `JoinMemory` (nombre de correspondances à part)."""
+
+    join_keys: Tuple[str, ...] = ()
+
+    def _reset(self):
+        self.left_memory = JoinMemory(self.join_keys)
+        self.right_memory = JoinMemory(self.join_keys)
+        # Jeton de gauche -> nombre de jetons de droite qui lui correspondent
+        self.left_counts: Dict[TokenInfo, int] = {}
+
+    def _count(self, token: Token, key: Optional[Hashable], first_only: bool = False) -> int:
+        count = 0
+        for _, right_context in self.right_memory.candidates(key):
+            if self.matcher(token.context, right_context):
+                count += 1
+                if first_only:
+                    break
+        return count
+
+    def _activate_left(self, token):
+        # Même traitement que `NotNode._activate_left`
+        info = token.to_info()
+        key = self.left_memory.key_of(token.context)
+
+        if token.is_valid():
+            count = self._count(token, key)
+            self.left_memory.add(info, key)
+            self.left_counts[info] = count
+        else:
+            count = self._count(token, key, first_only=True)
+            self.left_memory.remove(info, key)
+            self.left_counts.pop(info, None)
+
+        if count == 0:
+            for child in self.children:
+                child.callback(token)
+
+    def _activate_right(self, token):
+        # Même traitement que `NotNode._activate_right`
+        info = token.to_info()
+        key = self.right_memory.key_of(token.context)
+        if token.is_valid():
+            self.right_memory.add(info, key)
+            inc = 1
+        else:
+            self.right_memory.remove(info, key)
+            inc = -1
+
+        for left, left_context in self.left_memory.candidates(key):
+            if not self.matcher(left_context, token.context):
+                continue
+            newcount = self.left_counts[left] + inc
+            self.left_counts[left] = newcount
+            if (newcount == 0 and inc == -1) or (newcount == 1 and inc == 1):
+                newtoken = left.to_valid_token() if inc == -1 else left.to_invalid_token()
+                for child in self.children:
+                    child.callback(newtoken)
+
+
+def _check_bindings(check: Any) -> FrozenSet[str]:
+    """Variables qu'un test alpha lie toujours quand il réussit (`MATCH.x`, `L(...) << x`...)."""
+    if not isinstance(check, FeatureCheck):
+        return frozenset()
+    how = check.how
+    if isinstance(how, (L, P, W)):
+        return frozenset([how.__bind__]) if how.__bind__ is not None else frozenset()
+    if isinstance(how, ANDFC):
+        return frozenset().union(*(_check_bindings(sub) for sub in check.expected))
+    # NOT / OR: liaison négative ou conditionnelle, pas une clé fiable
+    return frozenset()
+
+
+def index_joins(root: BusNode) -> int:
+    """
+    Convertit sur place les jointures du réseau sous `root` en jointures par hachage.
+
+    Seuls les nœuds avec `SameContextCheck` et au moins une variable liée des
+    deux côtés sont convertis. Renvoie le nombre de nœuds convertis.
+    """
+    # Parents de chaque nœud, par port (le réseau ne garde que les liens vers les enfants)
+    parents: Dict[int, Dict[str, Any]] = {}
+    nodes: Dict[int, Any] = {}
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        if id(node) in nodes:
+            continue
+        nodes[id(node)] = node
+        for child in node.children:
+            parents.setdefault(id(child.node), {})[child.callback.__name__] = node
+            stack.append(child.node)
+
+    bound: Dict[int, FrozenSet[str]] = {}
+
+    def bindings(node: Any) -> FrozenSet[str]:
+        if id(node) not in bound:
+            ports = parents.get(id(node), {})
+            if isinstance(node, FeatureTesterNode):
+                value = bindings(ports["activate"]) | _check_bindings(node.matcher)
+            elif isinstance(node, WhereNode):
+                value = bindings(ports["activate"])
+            elif isinstance(node, NotNode):
+                value = bindings(ports["activate_left"])
+            elif isinstance(node, OrdinaryMatchNode):
+                value = bindings(ports["activate_left"]) | bindings(ports["activate_right"])
+            else:
+                value = frozenset()
+            bound[id(node)] = value
+        return bound[id(node)]
+
+    converted = 0
+    for node in nodes.values():
+        if type(node) not in (OrdinaryMatchNode, NotNode) or not isinstance(node.matcher, SameContextCheck):
+            continue
+        ports = parents[id(node)]
+        keys = tuple(sorted(bindings(ports["activate_left"]) & bindings(ports["activate_right"])))
+        if not keys:
+            continue
+        # Même objet: les callbacks déjà câblés chez les parents (méthodes liées) restent valides
+        node.__class__ = HashJoinNode if type(node) is OrdinaryMatchNode else HashNotNode
+        node.join_keys = keys
+        node._reset()
+        converted += 1
+    return converted
+
+
+class IndexedReteMatcher(ReteMatcher):
+    """`ReteMatcher` dont les jointures sont indexées par clé (voir le module)."""
+
+    def build_network(self):
+        super().build_network()
+        self.indexed_joins = index_joins(self.root_node)
@@ -0,0 +1,184 @@
+"""jsonscan.py
+
+Lecture sélective d'un document JSON: seuls les chemins demandés sont
+gardés dans le résultat, le reste est décodé puis aussitôt libéré.
+
+Les chemins sont décrits par un arbre (`compile_paths`):
+
+    compile_paths(["name", "database[*].health_condition_or_goal", "safety"])
+    -> {"name": True, "database": {"*": {"health_condition_or_goal": True}}, "safety": True}
+
+- `True`: la valeur entière est décodée (par le décodeur C de `json`)
+- dict: la valeur (objet ou tableau) est parcourue, seules les clés présentes
+  (ou `*`: toutes les clés / tous les éléments) sont gardées
+- absente: la valeur n'est pas gardée. Elle est tout de même décodée par le
+  décodeur C: élément par élément sous un objet de premier niveau (le
+  conteneur n'est pas construit), en entier ailleurs
+
+Le fichier est lu en entier dans une chaîne, qui domine le pic mémoire: il
+n'est pas plus bas qu'avec `json.load` sur les fiches du catalogue, et la
+lecture est un peu plus lente. Ce module n'est donc pas le lecteur par défaut
+de database.py (CATALOGUE_JSON_PARSER=selective pour l'utiliser).
+"""
+
+from __future__ import annotations
+
+import json
+import re
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+
+PathSpec = Union[bool, Dict[str, "PathSpec"]]
+
+_DECODER = json.JSONDecoder()
+_WS = re.compile(r"[ \t\n\r]*")
+
+
+def compile_paths(paths: Iterable[str]) -> Dict[str, PathSpec]:
+    """Transforme des chemins `a.b[*].c` en arbre de sélection (voir le module)."""
+    tree: Dict[str, PathSpec] = {}
+    for path in paths:
+        parts: List[str] = []
+        for segment in path.split("."):
+            # "database[*]" -> "database", "*"
+            parts.append(segment.split("[", 1)[0])
+            parts.extend("*" for _ in range(segment.count("[*]")))
+
+        node = tree
+        for part in parts[:-1]:
+            child = node.get(part)
+            if child is True:
+                # Un chemin parent est déjà sélectionné en entier
+                break
+            if not isinstance(child, dict):
+                child = node[part] = {}
+            node = child
+        else:
+            node[parts[-1]] = True
+    return tree
+
+
+def _error(s: str, idx: int, msg: str) -> json.JSONDecodeError:
+    return json.JSONDecodeError(msg, s, idx)
+
+
+def _skip_ws(s: str, idx: int) -> int:
+    return _WS.match(s, idx).end()
+
+
+def _skip_value(s: str, idx: int) -> int:
+    """
+    Position juste après la valeur commençant en `idx`.
+
+    Un conteneur est parcouru élément par élément: chaque élément est décodé
+    par le décodeur C puis aussitôt libéré, le conteneur lui-même n'est
+    jamais construit (la mémoire reste bornée par le plus gros élément).
+    """
+    ch = s[idx:idx + 1]
+    if ch == "{":
+        _, idx = _select_object(s, idx, {})
+        return idx
+    if ch == "[":
+        _, idx = _select_array(s, idx, None)
+        return idx
+    return _DECODER.raw_decode(s, idx)[1]
+
+
+def _select_value(s: str, idx: int, spec: PathSpec) -> Tuple[Any, int]:
+    if spec is True:
+        return _DECODER.raw_decode(s, idx)
+
+    ch = s[idx:idx + 1]
+    if ch == "{":
+        return _select_object(s, idx, spec)
+    if ch == "[":
+        return _select_array(s, idx, spec.get("*"))
+    # Scalaire là où un conteneur était attendu: gardé tel quel
+    return _DECODER.raw_decode(s, idx)
+
+
+def _select_object(
+    s: str,
+    idx: int,
+    spec: Dict[str, PathSpec],
+    keys: Optional[Dict[str, None]] = None,
+) -> Tuple[Dict[str, Any], int]:
+    # `keys`: reçoit toutes les clés rencontrées, sélectionnées ou non
+    out: Dict[str, Any] = {}
+    wildcard = spec.get("*")
+    idx = _skip_ws(s, idx + 1)
+    if s[idx:idx + 1] == "}":
+        return out, idx + 1
+
+    while True:
+        if s[idx:idx + 1] != '"':
+            raise _error(s, idx, "Expecting property name enclosed in double quotes")
+        key, idx = _DECODER.raw_decode(s, idx)
+        idx = _skip_ws(s, idx)
+        if s[idx:idx + 1] != ":":
+            raise _error(s, idx, "Expecting ':' delimiter")
+        idx = _skip_ws(s, idx + 1)
+
+        if keys is not None:
+            keys[key] = None
+        sub = spec.get(key, wildcard)
+        if sub is None:
+            idx = _skip_value(s, idx) if keys is not None else _DECODER.raw_decode(s, idx)[1]
+        else:
+            out[key], idx = _select_value(s, idx, sub)
+
+        idx = _skip_ws(s, idx)
+        ch = s[idx:idx + 1]
+        if ch == "}":
+            return out, idx + 1
+        if ch != ",":
+            raise _error(s, idx, "Expecting ',' delimiter")
+        idx = _skip_ws(s, idx + 1)
+
+
+def _select_array(s: str, idx: int, spec: Optional[PathSpec]) -> Tuple[List[Any], int]:
+    out: List[Any] = []
+    idx = _skip_ws(s, idx + 1)
+    if s[idx:idx + 1] == "]":
+        return out, idx + 1
+
+    while True:
+        if spec is None:
+            idx = _DECODER.raw_decode(s, idx)[1]
+        else:
+            value, idx = _select_value(s, idx, spec)
+            out.append(value)
+
+        idx = _skip_ws(s, idx)
+        ch = s[idx:idx + 1]
+        if ch == "]":
+            return out, idx + 1
+        if ch != ",":
+            raise _error(s, idx, "Expecting ',' delimiter")
+        idx = _skip_ws(s, idx + 1)
+
+
+def loads_selected(s: str, spec: Dict[str, PathSpec]) -> Tuple[Dict[str, Any], Tuple[str, ...]]:
+    """
+    Décode les chemins `spec` d'un objet JSON.
+
+    Retourne `(sélection, clés)`: la sélection ne contient que les chemins
+    demandés, `clés` liste toutes les clés de premier niveau, dans l'ordre.
+    Lève `json.JSONDecodeError` si la structure n'est pas un objet JSON valide.
+    """
+    idx = _skip_ws(s, 0)
+    if s[idx:idx + 1] != "{":
+        raise _error(s, idx, "Expecting object")
+
+    keys: Dict[str, None] = {}
+    selected, idx = _select_object(s, idx, spec, keys)
+    if _skip_ws(s, idx) != len(s):
+        raise _error(s, idx, "Extra data")
+    return selected, tuple(keys)
+
+
+def load_selected(path: Path, spec: Dict[str, PathSpec]) -> Tuple[Dict[str, Any], Tuple[str, ...]]:
+    """`loads_selected` sur un fichier UTF-8."""
+    with path.open("r", encoding="utf-8") as f:
+        return loads_selected(f.read(), spec)
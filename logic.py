@@ -5,21 +5,30 @@
 # This patch redirects the old path to the new one.
 import collections
 import collections.abc
+import copy
+import time
 
 if not hasattr(collections, "Mapping"):
     collections.Mapping = collections.abc.Mapping
 # ----------------------------------------
 
 from experta import *
-from database import CATALOGUE_COMPLET
-from typing import List, Dict, Tuple
+from experta.agenda import Agenda
+from experta.factlist import FactList
+from experta.matchers.rete.mixins import ChildNode
+from database import CatalogueSnapshot, current_catalogue
+from hashjoin import IndexedReteMatcher, JoinMemory
+from typing import Any, List, Dict, FrozenSet, Optional, Tuple
 
 # --- HEALTH CONDITION EXTRACTION (Clear & Reusable) ---
 
-def extract_health_conditions_from_supplements() -> Dict[str, List[str]]:
+def extract_health_conditions_from_supplements(snapshot: Optional[CatalogueSnapshot] = None) -> Dict[str, List[str]]:
     """
     Extract all health_condition_or_goal from supplement database entries.
     
+    Args:
+        snapshot: Catalogue to read (defaults to the current one)
+        
     Returns:
         Dict[str, List[str]]: Mapping of product name to list of health conditions
         
@@ -31,9 +40,10 @@ def extract_health_conditions_from_supplements() -> Dict[str, List[str]]:
         }
     """
     product_conditions: Dict[str, List[str]] = {}
+    catalogue = (snapshot or current_catalogue()).catalogue
     
     # Iterate through all categories in the catalogue
-    for category, product_list in CATALOGUE_COMPLET.items():
+    for category, product_list in catalogue.items():
         for sheet in product_list:
             product_name = sheet.get('name', '').strip()
             
@@ -85,6 +95,85 @@ def normalize_health_condition(condition: str) -> str:
     return filtered[0] if filtered else condition.lower()
 
 
+# --- VOCABULARY (Built once per catalogue version) ---
+
+class Vocabulary:
+    """
+    Precomputed vocabulary of one catalogue version.
+
+    Attributes:
+        version: Catalogue version this vocabulary was built from
+        known_symptoms: Normalized symptoms some product treats
+        known_conditions: Conditions some product is contraindicated with
+        normalized: Raw catalogue condition -> normalized condition
+                    (e.g. "Santé du sommeil" -> "sommeil")
+    """
+
+    def __init__(self, snapshot: CatalogueSnapshot):
+        self.version = snapshot.version
+
+        raw_conditions = set()
+        for product_list in snapshot.catalogue.values():
+            for sheet in product_list:
+                for entry in sheet.get('database', []) or []:
+                    raw = entry.get('health_condition_or_goal', '').strip()
+                    if raw:
+                        raw_conditions.add(raw)
+                        raw_conditions.add(raw.lower())
+
+        self.normalized: Dict[str, str] = {raw: normalize_health_condition(raw) for raw in raw_conditions}
+
+        self.known_symptoms: FrozenSet[str] = frozenset(
+            self.normalize(p["cible"]) for p in snapshot.produits if p.get("cible")
+        )
+        self.known_conditions: FrozenSet[str] = frozenset(
+            (c.get("condition") or "").strip().lower() for c in snapshot.contres if c.get("condition")
+        )
+
+    def normalize(self, condition: str) -> str:
+        """Same result as `normalize_health_condition`, as a table lookup for catalogue strings."""
+        normalized = self.normalized.get(condition)
+        return normalized if normalized is not None else normalize_health_condition(condition)
+
+
+class ProductConditionIndex:
+    """
+    Inverted index from normalized condition to the products treating it.
+
+    Attributes:
+        version: Catalogue version this index was built from
+        postings: Normalized condition -> products (e.g. "sommeil" -> ("5-HTP", ...))
+        raw_conditions: Product -> raw health conditions, as extracted from the catalogue
+    """
+
+    def __init__(self, snapshot: CatalogueSnapshot, vocabulary: Vocabulary):
+        self.version = snapshot.version
+
+        product_conditions = extract_health_conditions_from_supplements(snapshot)
+        self.raw_conditions: Dict[str, Tuple[str, ...]] = {
+            product_name: tuple(conditions) for product_name, conditions in product_conditions.items()
+        }
+
+        postings: Dict[str, List[str]] = {}
+        for product_name, conditions in product_conditions.items():
+            for normalized_condition in dict.fromkeys(vocabulary.normalize(c) for c in conditions):
+                postings.setdefault(normalized_condition, []).append(product_name)
+        self.postings: Dict[str, Tuple[str, ...]] = {k: tuple(v) for k, v in postings.items()}
+
+
+def get_vocabulary(snapshot: Optional[CatalogueSnapshot] = None) -> Vocabulary:
+    """Return the vocabulary of `snapshot` (defaults to the current catalogue), building it on first use."""
+    return (snapshot or current_catalogue()).derived("vocabulary", Vocabulary)
+
+
+def get_product_condition_index(snapshot: Optional[CatalogueSnapshot] = None) -> ProductConditionIndex:
+    """Return the product/condition inverted index of `snapshot` (defaults to the current catalogue)."""
+    return (snapshot or current_catalogue()).derived(
+        "product_condition_index",
+        lambda s: ProductConditionIndex(s, get_vocabulary(s)),
+    )
+
+
 def match_symptoms_with_products(patient_symptoms: List[str]) -> Dict[str, Dict]:
     """
     Match patient symptoms with products that can treat them.
@@ -108,34 +197,27 @@ def match_symptoms_with_products(patient_symptoms: List[str]) -> Dict[str, Dict]
             }
         }
     """
-    # Extract all health conditions from supplements
-    product_conditions = extract_health_conditions_from_supplements()
+    # Inverted index built once per catalogue: normalized condition -> products
+    snapshot = current_catalogue()
+    index = get_product_condition_index(snapshot)
+    vocabulary = get_vocabulary(snapshot)
     
     # Normalize patient symptoms (remove empty strings, convert to lowercase)
-    normalized_symptoms = {normalize_health_condition(s) for s in patient_symptoms if s.strip()}
+    normalized_symptoms = {vocabulary.normalize(s) for s in patient_symptoms if s.strip()}
     
-    matched_products: Dict[str, Dict] = {}
+    # Union of the posting lists of the requested symptoms, accumulating matches per product
+    matched: Dict[str, set] = {}
+    for symptom in normalized_symptoms:
+        for product_name in index.postings.get(symptom, ()):
+            matched.setdefault(product_name, set()).add(symptom)
     
-    # Iterate through each product and check if its conditions match patient symptoms
-    for product_name, raw_conditions in product_conditions.items():
-        
-        # Normalize each condition and check for matches
-        matched_symptoms = set()
-        
-        for raw_condition in raw_conditions:
-            normalized_condition = normalize_health_condition(raw_condition)
-            
-            # Check if this normalized condition matches any patient symptom
-            if normalized_condition in normalized_symptoms:
-                matched_symptoms.add(normalized_condition)
-        
-        # Only include products that have at least one matching symptom
-        if matched_symptoms:
-            matched_products[product_name] = {
-                "matched_symptoms": sorted(list(matched_symptoms)),
-                "raw_conditions": raw_conditions,
-                "score": len(matched_symptoms)  # Number of matched symptoms
-            }
+    matched_products: Dict[str, Dict] = {}
+    for product_name, matched_symptoms in matched.items():
+        matched_products[product_name] = {
+            "matched_symptoms": sorted(matched_symptoms),
+            "raw_conditions": list(index.raw_conditions[product_name]),
+            "score": len(matched_symptoms)  # Number of matched symptoms
+        }
     
     # Sort by score (highest first) and then by product name
     sorted_products = dict(
@@ -148,8 +230,135 @@ def match_symptoms_with_products(patient_symptoms: List[str]) -> Dict[str, Dict]
     return sorted_products
 
 
+def extract_product_targets(snapshot: Optional[CatalogueSnapshot] = None) -> List[Tuple[str, str]]:
+    """
+    Extract the (product, normalized condition) pairs loaded as `Produit` facts.
+
+    Args:
+        snapshot: Catalogue to read (defaults to the current one)
+
+    Returns:
+        List[Tuple[str, str]]: e.g. [("Alpha-Lactalbumin", "sommeil"), ...]
+    """
+    targets: List[Tuple[str, str]] = []
+    snapshot = snapshot or current_catalogue()
+
+    # Use the dedicated function to extract all health conditions
+    product_conditions = extract_health_conditions_from_supplements(snapshot)
+    vocabulary = get_vocabulary(snapshot)
+
+    for product_name, conditions in product_conditions.items():
+        for condition in conditions:
+            # Normalize the condition (e.g., "Santé du sommeil" -> "sommeil")
+            targets.append((product_name, vocabulary.normalize(condition)))
+
+    return targets
+
+
+def extract_contraindications(snapshot: Optional[CatalogueSnapshot] = None) -> List[Tuple[str, str]]:
+    """
+    Extract the (product, condition) pairs loaded as `ContreIndication` facts.
+
+    Args:
+        snapshot: Catalogue to read (defaults to the current one)
+
+    Returns:
+        List[Tuple[str, str]]: e.g. [("5-HTP", "grossesse"), ("5-HTP", "carbidopa"), ...]
+    """
+    contraindications: List[Tuple[str, str]] = []
+    catalogue = (snapshot or current_catalogue()).catalogue
+
+    # 1. Iterate over the main categories (Dictionary keys)
+    for category, product_list in catalogue.items():
+
+        # 2. Iterate over the products inside each category list
+        for sheet in product_list:
+            product_name = sheet['name']
+            safety = sheet.get('safety', {})
+
+            # 1. Pregnancy and Breastfeeding logic
+            if 'pregnancy_lactation' in safety:
+                for precaution in safety['pregnancy_lactation']:
+                    condition_text = precaution.get('condition', '').lower()
+                    safety_info = precaution.get('safety_information', '').lower()
+
+                    # Detect warning keywords in French (as data is in French)
+                    # We look for "éviter" (avoid) or "limiter" (limit)
+                    is_risky = "éviter" in condition_text or "éviter" in safety_info or "limiter" in safety_info
+
+                    if "grossesse" in condition_text and is_risky:
+                        contraindications.append((product_name, "grossesse"))
+
+                    if "allaitement" in condition_text and is_risky:
+                        contraindications.append((product_name, "allaitement"))
+
+            # 2. Drug Interactions logic
+            if 'interactions' in safety:
+                for interaction in safety['interactions']:
+                    agent = interaction.get('agent', '').strip().lower()
+                    if agent:
+                        # Create a restriction for this drug/agent
+                        contraindications.append((product_name, agent))
+
+            # 3. Specific Precautions (e.g., Hypertension, Driving)
+            if 'precautions' in safety:
+                for precaution in safety['precautions']:
+                    condition_pop = precaution.get('population_condition', '').strip().lower()
+                    if condition_pop:
+                        contraindications.append((product_name, condition_pop))
+
+    return contraindications
+
+
+# --- SYMBOL TABLE (Built once per catalogue version) ---
+
+class SymbolTable:
+    """
+    Interned product names and normalized conditions of one catalogue version.
+
+    The engine's facts hold the integer ids, never the strings: Rete joins
+    then hash and compare small ints instead of long French texts (e.g.
+    interaction agents). Strings come back only when building the response.
+
+    Attributes:
+        version: Catalogue version this table was built from
+        products: Product id -> product name
+        terms: Term id -> normalized symptom or condition (one namespace, as
+               `Produit.cible` and `ContreIndication.condition` are both matched
+               against client facts)
+        product_targets: `extract_product_targets` as (product id, term id)
+        contraindications: `extract_contraindications` as (product id, term id)
+    """
+
+    def __init__(self, snapshot: CatalogueSnapshot):
+        self.version = snapshot.version
+
+        targets = extract_product_targets(snapshot)
+        contraindications = extract_contraindications(snapshot)
+
+        self.products: Tuple[str, ...] = tuple(sorted({p for p, _ in targets} | {p for p, _ in contraindications}))
+        self.terms: Tuple[str, ...] = tuple(sorted({t for _, t in targets} | {c for _, c in contraindications}))
+        self.product_ids: Dict[str, int] = {p: i for i, p in enumerate(self.products)}
+        self.term_ids: Dict[str, int] = {t: i for i, t in enumerate(self.terms)}
+
+        self.product_targets: Tuple[Tuple[int, int], ...] = tuple(
+            (self.product_ids[p], self.term_ids[t]) for p, t in targets
+        )
+        self.contraindications: Tuple[Tuple[int, int], ...] = tuple(
+            (self.product_ids[p], self.term_ids[c]) for p, c in contraindications
+        )
+
+
+def get_symbol_table(snapshot: Optional[CatalogueSnapshot] = None) -> SymbolTable:
+    """Return the symbol table of `snapshot` (defaults to the current catalogue), building it on first use."""
+    return (snapshot or current_catalogue()).derived("symbol_table", SymbolTable)
+
+
 # --- FACTS DEFINITION (The Engine's Vocabulary) ---
 
+# Every fact field holds a `SymbolTable` id: product ids for `nom` / `produit`,
+# term ids for `cible` / `symptome` / `condition`.
+
 class Produit(Fact):
     """Fact: Represents a product and what condition it treats."""
     pass
@@ -176,7 +385,76 @@ class Recommandation(Fact):
 
 # --- INFERENCE ENGINE ---
 
+class RuleProfiler:
+    """
+    Rule-firing statistics of one engine, collected while profiling is on.
+
+    Attributes:
+        runs: Number of `run()` calls profiled
+        run_seconds: Total time spent in `run()`
+        match_seconds: Part of it spent propagating new facts through the Rete
+                       network and ordering the agenda
+        agenda_peak: Largest number of pending activations seen
+        rules: Rule name -> {"activations", "retracted", "fired", "seconds"}
+               (activations produced by the matcher, including those of the
+               facts declared before `run()`; activations withdrawn before
+               firing; rule firings; time spent in the rule body)
+        facts: Fact type -> count in working memory after the last run
+    """
+
+    def __init__(self):
+        self.runs = 0
+        self.run_seconds = 0.0
+        self.match_seconds = 0.0
+        self.agenda_peak = 0
+        self.rules: Dict[str, Dict[str, Any]] = {}
+        self.facts: Dict[str, int] = {}
+
+    def _rule(self, name: str) -> Dict[str, Any]:
+        stats = self.rules.get(name)
+        if stats is None:
+            stats = self.rules[name] = {"activations": 0, "retracted": 0, "fired": 0, "seconds": 0.0}
+        return stats
+
+    def report(self) -> Dict[str, Any]:
+        """
+        Return the statistics as plain data (JSON serializable).
+
+        Returns:
+            Dict: runs, run/match seconds, agenda peak, per-rule counters,
+                  working memory size and its breakdown by fact type
+        """
+        return {
+            "runs": self.runs,
+            "run_seconds": round(self.run_seconds, 6),
+            "match_seconds": round(self.match_seconds, 6),
+            "agenda_peak": self.agenda_peak,
+            "fired": sum(r["fired"] for r in self.rules.values()),
+            "rules": {
+                name: dict(stats, seconds=round(stats["seconds"], 6))
+                for name, stats in sorted(self.rules.items())
+            },
+            "working_memory": {
+                "facts": sum(self.facts.values()),
+                "by_type": dict(sorted(self.facts.items())),
+            },
+        }
+
+
 class MoteurRecommandation(KnowledgeEngine):
+
+    # Rete joins hash-indexed on their bound variables (see hashjoin.py):
+    # a client fact is only compared with the static facts sharing its value
+    __matcher__ = IndexedReteMatcher
+
+    # Set by `enable_profiling()`; None keeps Experta's own `run()` loop
+    profiler: Optional[RuleProfiler] = None
+
+    def __init__(self, snapshot: Optional[CatalogueSnapshot] = None):
+        # The catalogue this engine's static facts come from (fixed for its lifetime)
+        self.snapshot = snapshot or current_catalogue()
+        self.symbols = get_symbol_table(self.snapshot)
+        super().__init__()
     
     @DefFacts()
     def initial_loading(self):
@@ -186,56 +464,16 @@ class MoteurRecommandation(KnowledgeEngine):
         (Supplements, Herbs, Sport...) and then the products to extract 
         logical rules (Targets & Safety) from the JSON structure.
         """
-        # --- A. Extract & Load Health Conditions from Supplements ---
-        # Use the dedicated function to extract all health conditions
-        product_conditions = extract_health_conditions_from_supplements()
-        
-        for product_name, conditions in product_conditions.items():
-            for condition in conditions:
-                # Normalize the condition (e.g., "Santé du sommeil" -> "sommeil")
-                normalized_condition = normalize_health_condition(condition)
-                # Declare that this product treats this normalized condition
-                yield Produit(nom=product_name, cible=normalized_condition)
-        
-        # --- B. Extract Contraindications (Safety Rules) ---
-        # 1. Iterate over the main categories (Dictionary keys)
-        for category, product_list in CATALOGUE_COMPLET.items():
-            
-            # 2. Iterate over the products inside each category list
-            for sheet in product_list:
-                product_name = sheet['name']
-                safety = sheet.get('safety', {})
-                
-                # 1. Pregnancy and Breastfeeding logic
-                if 'pregnancy_lactation' in safety:
-                    for precaution in safety['pregnancy_lactation']:
-                        condition_text = precaution.get('condition', '').lower()
-                        safety_info = precaution.get('safety_information', '').lower()
-                        
-                        # Detect warning keywords in French (as data is in French)
-                        # We look for "éviter" (avoid) or "limiter" (limit)
-                        is_risky = "éviter" in condition_text or "éviter" in safety_info or "limiter" in safety_info
-                        
-                        if "grossesse" in condition_text and is_risky:
-                            yield ContreIndication(produit=product_name, condition="grossesse")
-                        
-                        if "allaitement" in condition_text and is_risky:
-                            yield ContreIndication(produit=product_name, condition="allaitement")
-
-                # 2. Drug Interactions logic
-                if 'interactions' in safety:
-                    for interaction in safety['interactions']:
-                        agent = interaction.get('agent', '').strip().lower()
-                        if agent:
-                            # Create a restriction for this drug/agent
-                            yield ContreIndication(produit=product_name, condition=agent)
-
-                # 3. Specific Precautions (e.g., Hypertension, Driving)
-                if 'precautions' in safety:
-                    for precaution in safety['precautions']:
-                        condition_pop = precaution.get('population_condition', '').strip().lower()
-                        if condition_pop:
-                             yield ContreIndication(produit=product_name, condition=condition_pop)
+        # Extracted once per catalogue version, already interned (see `SymbolTable`)
+
+        # --- A. Health Conditions treated by each product ---
+        for product_id, term_id in self.symbols.product_targets:
+            # Declare that this product treats this normalized condition
+            yield Produit(nom=product_id, cible=term_id)
+
+        # --- B. Contraindications (Safety Rules) ---
+        for product_id, term_id in self.symbols.contraindications:
+            yield ContreIndication(produit=product_id, condition=term_id)
 
     # --- BUSINESS RULES ---
 
@@ -260,4 +498,212 @@ class MoteurRecommandation(KnowledgeEngine):
     )
     def generate_recommendation(self, p, s):
         # We declare the final recommendation
-        self.declare(Recommandation(nom=p, cible=s))
\ No newline at end of file
+        self.declare(Recommandation(nom=p, cible=s))
+
+    # --- CLIENT FACTS (strings in, ids in working memory) ---
+
+    def declare_need(self, symptome: str) -> None:
+        """
+        Declare a `BesoinClient` for a normalized symptom.
+
+        A symptom no product targets has no id and could not match any rule:
+        nothing is declared.
+        """
+        term_id = self.symbols.term_ids.get(symptome)
+        if term_id is not None:
+            self.declare(BesoinClient(symptome=term_id))
+
+    def declare_condition(self, condition: str) -> None:
+        """Declare a `ConditionClient` for a normalized condition (same rule as `declare_need`)."""
+        term_id = self.symbols.term_ids.get(condition)
+        if term_id is not None:
+            self.declare(ConditionClient(condition=term_id))
+
+    # --- PROFILING ---
+
+    def enable_profiling(self) -> RuleProfiler:
+        """
+        Record rule-firing statistics for every following `run()` of this engine.
+
+        Returns:
+            RuleProfiler: The statistics, updated in place (see `RuleProfiler.report`)
+        """
+        self.profiler = RuleProfiler()
+        return self.profiler
+
+    def get_activations(self):
+        # Called on every declare/retract outside `run()` and on every step inside it
+        added, removed = super().get_activations()
+        profiler = self.profiler
+        if profiler is not None:
+            for activation in added:
+                profiler._rule(activation.rule.__name__)["activations"] += 1
+            for activation in removed:
+                profiler._rule(activation.rule.__name__)["retracted"] += 1
+        return added, removed
+
+    def run(self, steps=float('inf')):
+        if self.profiler is None:
+            return super().run(steps)
+        return self._run_profiled(steps)
+
+    def _run_profiled(self, steps) -> None:
+        """Same loop as `KnowledgeEngine.run`, timing the matching and each firing."""
+        profiler = self.profiler
+        clock = time.perf_counter
+        started = clock()
+
+        self.running = True
+        while steps > 0 and self.running:
+            match_started = clock()
+            added, removed = self.get_activations()
+            self.strategy.update_agenda(self.agenda, added, removed)
+            profiler.agenda_peak = max(profiler.agenda_peak, len(self.agenda.activations))
+
+            activation = self.agenda.get_next()
+            profiler.match_seconds += clock() - match_started
+            if activation is None:
+                break
+
+            steps -= 1
+            stats = profiler._rule(activation.rule.__name__)
+            fired = clock()
+            activation.rule(
+                self,
+                **{k: v for k, v in activation.context.items() if not k.startswith('__')}
+            )
+            stats["seconds"] += clock() - fired
+            stats["fired"] += 1
+
+        self.running = False
+
+        facts: Dict[str, int] = {}
+        for fact in self.facts.values():
+            name = type(fact).__name__
+            facts[name] = facts.get(name, 0) + 1
+        profiler.facts = facts
+        profiler.runs += 1
+        profiler.run_seconds += clock() - started
+
+    # --- COMPILED SNAPSHOT SUPPORT ---
+
+    def checkpoint(self) -> int:
+        """Return a marker identifying every fact declared from now on (see `rollback`)."""
+        return self.facts.last_index
+
+    def facts_since(self, checkpoint: int) -> List[Fact]:
+        """Return the facts declared since `checkpoint`, oldest first."""
+        recent = []
+        for idx in reversed(self.facts):
+            if idx < checkpoint:
+                break
+            recent.append(self.facts[idx])
+        recent.reverse()
+        return recent
+
+    def rollback(self, checkpoint: int) -> None:
+        """
+        Retract every fact declared since `checkpoint`, newest first.
+
+        Used to give a pooled engine back in the state it was borrowed in:
+        the request facts (`BesoinClient`, `ConditionClient`) and the inferred
+        ones (`ProduitInterdit`, `Recommandation`) are removed, the static
+        knowledge base is left untouched.
+        """
+        for fact in reversed(self.facts_since(checkpoint)):
+            self.retract(fact)
+
+    def clone(self) -> "MoteurRecommandation":
+        """
+        Create an independent engine with the same working memory as this one.
+
+        The fact list, agenda and every Rete node memory are copied, so the
+        clone starts exactly where this engine is (e.g. right after `reset()`)
+        without re-running the DefFacts nor re-propagating the static facts.
+        Declared facts are shared between both engines: they are never mutated
+        once declared.
+
+        Returns:
+            MoteurRecommandation: A new engine, ready for `declare()` / `run()`
+        """
+        engine = self.__class__.__new__(self.__class__)
+        engine.running = False
+        engine.snapshot = self.snapshot
+        engine.symbols = self.symbols
+
+        engine.facts = FactList()
+        engine.facts.update(self.facts)
+        engine.facts.last_index = self.facts.last_index
+        engine.facts.reference_counter = self.facts.reference_counter.copy()
+        engine.facts.duplication = self.facts.duplication
+
+        engine.agenda = Agenda()
+        engine.agenda.activations = list(self.agenda.activations)
+
+        engine.matcher = copy.copy(self.matcher)
+        engine.matcher.engine = engine
+        engine.matcher.root_node = _clone_rete_node(self.matcher.root_node, {})
+
+        engine.strategy = self.strategy.__class__()
+        # Profiling is per engine: a clone starts unprofiled
+        engine.profiler = None
+        return engine
+
+
+def _clone_rete_node(node, memo: Dict[int, object]):
+    """
+    Copy a Rete node and its whole sub-network, including node memories.
+
+    Matchers, rules and tokens are immutable and therefore shared; only the
+    memory containers (lists, dicts, sets, hash-join memories) and the
+    children wiring are copied.
+    `memo` keeps nodes reachable from several parents (beta joins) unique.
+    """
+    if id(node) in memo:
+        return memo[id(node)]
+
+    new_node = copy.copy(node)
+    memo[id(node)] = new_node
+
+    for attr, value in vars(node).items():
+        if attr != "children" and isinstance(value, (list, dict, set, JoinMemory)):
+            setattr(new_node, attr, copy.copy(value))
+
+    new_node.children = []
+    for child in node.children:
+        child_node = _clone_rete_node(child.node, memo)
+        # Rebind the callback (activate / activate_left / activate_right) to the copy
+        callback = getattr(child_node, child.callback.__name__)
+        new_node.children.append(ChildNode(child_node, callback))
+
+    return new_node
+
+
+# --- COMPILED KNOWLEDGE BASE (Built once per catalogue snapshot) ---
+
+def compile_knowledge_base(snapshot: Optional[CatalogueSnapshot] = None) -> MoteurRecommandation:
+    """
+    Build a reference engine with every static fact already asserted.
+
+    `reset()` runs `initial_loading` and pushes every `Produit` /
+    `ContreIndication` through the Rete network. The returned engine is never
+    run: it only serves as a template for `new_engine()`.
+    """
+    engine = MoteurRecommandation(snapshot)
+    engine.reset()
+    return engine
+
+
+def get_knowledge_base(snapshot: Optional[CatalogueSnapshot] = None) -> MoteurRecommandation:
+    """Return the compiled knowledge base of `snapshot` (defaults to the current catalogue), compiling it on first use."""
+    return (snapshot or current_catalogue()).derived("knowledge_base", compile_knowledge_base)
+
+
+def new_engine(snapshot: Optional[CatalogueSnapshot] = None) -> MoteurRecommandation:
+    """
+    Return a ready-to-use engine, equivalent to `MoteurRecommandation()` + `reset()`.
+
+    Only the compiled snapshot is copied, so the caller just pays for the
+    `BesoinClient` / `ConditionClient` facts it declares afterwards.
+    """
+    return get_knowledge_base(snapshot).clone()
@@ -0,0 +1,162 @@
+"""memorydb.py
+
+Base MongoDB en mémoire: le sous-ensemble de l'API Motor utilisé par l'API
+(`users.UsersRepository`), pour les tests et `replay.py`, sans mongod.
+
+Filtres d'égalité (chemins pointés), projections d'inclusion ou d'exclusion,
+`$set`, index uniques (`DuplicateKeyError` comme pymongo). Les documents sont
+copiés à l'entrée et à la sortie, comme s'ils passaient par BSON.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import copy
+from typing import Any, Dict, List, Optional
+
+from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+
+class _InsertOneResult:
+    def __init__(self, inserted_id: Any):
+        self.inserted_id = inserted_id
+
+
+class _UpdateResult:
+    def __init__(self, matched_count: int, modified_count: int):
+        self.matched_count = matched_count
+        self.modified_count = modified_count
+
+
+def _get_path(doc: Dict[str, Any], path: str) -> Any:
+    value: Any = doc
+    for part in path.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return None
+        value = value[part]
+    return value
+
+
+def _set_path(doc: Dict[str, Any], path: str, value: Any) -> None:
+    parts = path.split(".")
+    for part in parts[:-1]:
+        doc = doc.setdefault(part, {})
+    doc[parts[-1]] = value
+
+
+def _project(doc: Dict[str, Any], projection: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    doc = copy.deepcopy(doc)
+    if not projection:
+        return doc
+
+    include = [k for k, v in projection.items() if v and k != "_id"]
+    if include:
+        out: Dict[str, Any] = {}
+        for path in include:
+            value = _get_path(doc, path)
+            if value is not None:
+                _set_path(out, path, value)
+        if projection.get("_id", 1):
+            out["_id"] = doc["_id"]
+        return out
+
+    for path, keep in projection.items():
+        if not keep:
+            *parents, last = path.split(".")
+            parent = _get_path(doc, ".".join(parents)) if parents else doc
+            if isinstance(parent, dict):
+                parent.pop(last, None)
+    return doc
+
+
+class InMemoryCollection:
+    """Collection Motor minimale: filtres d'égalité (chemins pointés), `$set`, index uniques."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._docs: Dict[Any, Dict[str, Any]] = {}
+        self._unique: List[str] = []
+        self._lock = asyncio.Lock()
+
+    def _matches(self, doc: Dict[str, Any], flt: Dict[str, Any]) -> bool:
+        return all(_get_path(doc, k) == v for k, v in flt.items())
+
+    def _find(self, flt: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        if set(flt) == {"_id"}:
+            return self._docs.get(flt["_id"])
+        return next((d for d in self._docs.values() if self._matches(d, flt)), None)
+
+    def _check_unique(self, doc: Dict[str, Any]) -> None:
+        for key in self._unique:
+            value = _get_path(doc, key)
+            for other in self._docs.values():
+                if other["_id"] != doc["_id"] and _get_path(other, key) == value:
+                    raise DuplicateKeyError(f"E11000 duplicate key error collection: {self.name} index: {key}_1")
+
+    async def create_index(self, keys: Any, unique: bool = False, **kwargs: Any) -> str:
+        name = keys if isinstance(keys, str) else keys[0][0]
+        if unique and name not in self._unique:
+            self._unique.append(name)
+        return f"{name}_1"
+
+    async def insert_one(self, doc: Dict[str, Any]) -> _InsertOneResult:
+        async with self._lock:
+            doc.setdefault("_id", ObjectId())
+            stored = copy.deepcopy(doc)
+            self._check_unique(stored)
+            self._docs[stored["_id"]] = stored
+            return _InsertOneResult(stored["_id"])
+
+    async def find_one(self, flt: Dict[str, Any], projection: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        doc = self._find(flt)
+        return _project(doc, projection) if doc is not None else None
+
+    def _apply(self, doc: Dict[str, Any], update: Dict[str, Any]) -> Dict[str, Any]:
+        updated = copy.deepcopy(doc)
+        for path, value in (update.get("$set") or {}).items():
+            _set_path(updated, path, copy.deepcopy(value))
+        self._check_unique(updated)
+        return updated
+
+    async def update_one(self, flt: Dict[str, Any], update: Dict[str, Any]) -> _UpdateResult:
+        async with self._lock:
+            doc = self._find(flt)
+            if doc is None:
+                return _UpdateResult(0, 0)
+            self._docs[doc["_id"]] = self._apply(doc, update)
+            return _UpdateResult(1, 1)
+
+    async def find_one_and_update(
+        self,
+        flt: Dict[str, Any],
+        update: Dict[str, Any],
+        projection: Optional[Dict[str, Any]] = None,
+        return_document: bool = ReturnDocument.BEFORE,
+        **kwargs: Any,
+    ) -> Optional[Dict[str, Any]]:
+        async with self._lock:
+            doc = self._find(flt)
+            if doc is None:
+                return None
+            updated = self._apply(doc, update)
+            self._docs[doc["_id"]] = updated
+            return _project(updated if return_document == ReturnDocument.AFTER else doc, projection)
+
+
+class InMemoryDatabase:
+    """Base Motor minimale: `db.users`, `db["users"]`."""
+
+    def __init__(self):
+        self._collections: Dict[str, InMemoryCollection] = {}
+
+    def __getitem__(self, name: str) -> InMemoryCollection:
+        if name not in self._collections:
+            self._collections[name] = InMemoryCollection(name)
+        return self._collections[name]
+
+    def __getattr__(self, name: str) -> InMemoryCollection:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
@@ -0,0 +1,375 @@
+"""metrics.py
+
+Métriques de /decide (histogrammes de durée par étape, compteurs) au format
+texte Prometheus, sans dépendance externe.
+
+Étapes mesurées (`decide_stage_seconds{stage=...}`):
+- `queue`: attente de `run_in_threadpool` avant le début du traitement (api.py)
+- `normalize`: normalisation et tri connus / inconnus (`service._prepare`)
+- `pool_wait`: attente d'un moteur du pool (mode "pool")
+- `reset`: clone du moteur compilé, ou rétractation des faits de la requête
+- `declare`, `run`, `collect`: déclaration des faits, `engine.run()`, lecture des faits inférés
+- `index`: jointures du mode "index"
+- `format`: construction de la réponse
+
+Authentification: durée d'attente et de calcul bcrypt
+(`password_hash_queue_seconds` / `password_hash_seconds`, label `op`: hash ou
+verify) et refus quand la file est pleine (`password_hash_rejected_total`).
+
+Désactivation: `configure(False)` (réglage METRICS_ENABLED). Les points de
+mesure ne font alors qu'un test de booléen, sans appel d'horloge.
+
+Processus workers (procpool.py): `recording()` garde les mesures de /decide
+au lieu de les enregistrer dans le registre du worker, que personne ne lit;
+elles sont renvoyées avec le résultat et rejouées dans le processus
+principal par `replay()`.
+"""
+
+from __future__ import annotations
+
+import bisect
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+
+# Bornes adaptées à des étapes de quelques µs à quelques secondes
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005,
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5,
+)
+
+ENABLED = True
+
+
+def configure(enabled: bool = True) -> None:
+    global ENABLED
+    ENABLED = enabled
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _CounterChild:
+    __slots__ = ("_lock", "value")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0
+
+    def inc(self, amount: int = 1) -> None:
+        with self._lock:
+            self.value += amount
+
+
+class _HistogramChild:
+    __slots__ = ("_lock", "_bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self._lock = threading.Lock()
+        self._bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        i = bisect.bisect_left(self._bounds, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+            self.count += 1
+
+    def time(self) -> "_Timer":
+        return _Timer(self)
+
+
+class _Timer:
+    """`with child.time():` observe la durée du bloc (rien si les métriques sont désactivées)."""
+
+    __slots__ = ("_child", "_started")
+
+    def __init__(self, child: _HistogramChild):
+        self._child = child
+        self._started = 0.0
+
+    def __enter__(self) -> "_Timer":
+        if ENABLED:
+            self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        if ENABLED and self._started:
+            self._child.observe(time.perf_counter() - self._started)
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self) -> "_NullTimer":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        return None
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _Metric(ABC):
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._children: Dict[Tuple[str, ...], object] = {}
+        if not self.labelnames:
+            # Série unique: exposée dès le départ, même à zéro
+            self._children[()] = self._new_child()
+
+    @abstractmethod
+    def _new_child(self):
+        """Nouvelle série (compteur, histogramme...) de cette métrique."""
+
+    def labels(self, *values: str):
+        """Série correspondant aux valeurs de labels (à garder de côté dans le code chaud)."""
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"{self.name}: labels attendus {self.labelnames}, reçu {values}")
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _series(self) -> List[Tuple[Tuple[str, ...], object]]:
+        with self._lock:
+            return sorted(self._children.items())
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} {self.kind}"
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self) -> _CounterChild:
+        return _CounterChild()
+
+    def inc(self, amount: int = 1) -> None:
+        self.labels().inc(amount)
+
+    def render(self) -> Iterable[str]:
+        yield from super().render()
+        for values, child in self._series():
+            yield f"{self.name}{_format_labels(self.labelnames, values)} {child.value}"
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self) -> _HistogramChild:
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def time(self) -> _Timer:
+        return self.labels().time()
+
+    def render(self) -> Iterable[str]:
+        yield from super().render()
+        for values, child in self._series():
+            with child._lock:
+                counts, total, count = list(child.counts), child.sum, child.count
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                le = f'le="{_format_value(bound)}"'
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, values, le)} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, values)} {_format_value(total)}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, values)} {count}"
+
+
+class CallbackMetric(_Metric):
+    """Valeur lue au moment du rendu (`fn()`, None = série absente), pour les stats déjà tenues ailleurs."""
+
+    def __init__(self, name: str, documentation: str, fn: Callable[[], Optional[float]], kind: str = "gauge"):
+        self.kind = kind
+        self._fn = fn
+        super().__init__(name, documentation)
+
+    def _new_child(self) -> None:
+        return None
+
+    def render(self) -> Iterable[str]:
+        value = self._fn()
+        if value is None:
+            return
+        yield from super().render()
+        yield f"{self.name} {_format_value(value)}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+DECIDE_STAGE_SECONDS: Histogram = REGISTRY.register(Histogram(
+    "decide_stage_seconds", "Durée de chaque étape de /decide.", ("stage",),
+))
+DECIDE_REQUEST_SECONDS: Histogram = REGISTRY.register(Histogram(
+    "decide_request_seconds", "Durée de POST /decide côté API, attente du threadpool comprise.",
+))
+DECISIONS_TOTAL: Counter = REGISTRY.register(Counter(
+    "decide_decisions_total", "Décisions calculées (appels de decide et éléments de lot).", ("engine",),
+))
+UNKNOWN_SYMPTOMS_TOTAL: Counter = REGISTRY.register(Counter(
+    "decide_unknown_symptoms_total", "Symptômes reçus absents du catalogue.",
+))
+UNKNOWN_CONDITIONS_TOTAL: Counter = REGISTRY.register(Counter(
+    "decide_unknown_conditions_total", "Conditions médicales reçues absentes du catalogue.",
+))
+RECOMMENDATIONS_TOTAL: Counter = REGISTRY.register(Counter(
+    "decide_recommendations_total", "Produits recommandés, toutes décisions confondues.",
+))
+EMPTY_DECISIONS_TOTAL: Counter = REGISTRY.register(Counter(
+    "decide_empty_decisions_total", "Décisions sans aucune recommandation.",
+))
+PASSWORD_HASH_QUEUE_SECONDS: Histogram = REGISTRY.register(Histogram(
+    "password_hash_queue_seconds", "Attente d'un thread bcrypt libre.", ("op",),
+))
+PASSWORD_HASH_SECONDS: Histogram = REGISTRY.register(Histogram(
+    "password_hash_seconds", "Durée d'un calcul bcrypt.", ("op",),
+))
+PASSWORD_HASH_REJECTED_TOTAL: Counter = REGISTRY.register(Counter(
+    "password_hash_rejected_total", "Calculs bcrypt refusés (file pleine).",
+))
+
+STAGES = ("queue", "normalize", "pool_wait", "reset", "declare", "run", "collect", "index", "format")
+_STAGE: Dict[str, _HistogramChild] = {name: DECIDE_STAGE_SECONDS.labels(name) for name in STAGES}
+
+# Mesures en attente d'être renvoyées au processus principal (voir `recording`)
+_RECORDING: Optional[List[Tuple[Any, ...]]] = None
+
+
+def stage(name: str):
+    """`with stage("run"): ...` mesure une étape de /decide (voir `STAGES`)."""
+    if not ENABLED:
+        return _NULL_TIMER
+    return _Timer(_STAGE[name])
+
+
+def observe_stage(name: str, seconds: float) -> None:
+    if ENABLED:
+        _STAGE[name].observe(seconds)
+
+
+def observe_decision(engine: str, n_unknown_symptoms: int, n_unknown_conditions: int, n_recommendations: int) -> None:
+    if not ENABLED:
+        return
+    if _RECORDING is not None:
+        _RECORDING.append(("decision", engine, n_unknown_symptoms, n_unknown_conditions, n_recommendations))
+        return
+    DECISIONS_TOTAL.labels(engine).inc()
+    if n_unknown_symptoms:
+        UNKNOWN_SYMPTOMS_TOTAL.inc(n_unknown_symptoms)
+    if n_unknown_conditions:
+        UNKNOWN_CONDITIONS_TOTAL.inc(n_unknown_conditions)
+    if n_recommendations:
+        RECOMMENDATIONS_TOTAL.inc(n_recommendations)
+    else:
+        EMPTY_DECISIONS_TOTAL.inc()
+
+
+class _RecordedStage:
+    """Remplace la série d'une étape pendant `recording()`: la durée est gardée, pas enregistrée."""
+
+    __slots__ = ("_name", "_records")
+
+    def __init__(self, name: str, records: List[Tuple[Any, ...]]):
+        self._name = name
+        self._records = records
+
+    def observe(self, value: float) -> None:
+        self._records.append(("stage", self._name, value))
+
+
+@contextmanager
+def recording() -> Iterator[List[Tuple[Any, ...]]]:
+    """`with recording() as records:` garde les mesures de /decide du bloc dans `records` (voir `replay`).
+
+Réservé aux workers de procpool.py, qui traitent une requête à la fois: les
+séries des étapes sont remplacées pour tout le processus le temps du bloc.
+"""
+    global _RECORDING
+    records: List[Tuple[Any, ...]] = []
+    saved = dict(_STAGE)
+    _STAGE.update({name: _RecordedStage(name, records) for name in STAGES})
+    _RECORDING = records
+    try:
+        yield records
+    finally:
+        _RECORDING = None
+        _STAGE.update(saved)
+
+
+def replay(records: Iterable[Tuple[Any, ...]]) -> None:
+    """Enregistre les mesures gardées par `recording()` (dans un worker) dans ce processus."""
+    for kind, *args in records:
+        if kind == "stage":
+            observe_stage(*args)
+        elif kind == "decision":
+            observe_decision(*args)
+
+
+def render() -> str:
+    return REGISTRY.render()
+
+
+def reset() -> None:
+    """Remet toutes les séries à zéro (tests)."""
+    for metric in REGISTRY._metrics:
+        with metric._lock:
+            for values in list(metric._children):
+                metric._children[values] = metric._new_child()
+    _STAGE.update({name: DECIDE_STAGE_SECONDS.labels(name) for name in STAGES})
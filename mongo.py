@@ -1,6 +1,9 @@
 from __future__ import annotations
 
 from functools import lru_cache
+from typing import Literal, Optional
+
+from pydantic import Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
 
@@ -18,6 +21,68 @@ class Settings(BaseSettings):
     JWT_SECRET: str
     JWT_EXPIRES_MINUTES: int = 60 * 24 * 7  # 7 jours
 
+    # bcrypt: coût des nouvelles empreintes (les anciennes sont recalculées à la
+    # connexion), threads dédiés et nombre maximum d'opérations en attente
+    BCRYPT_ROUNDS: int = Field(12, ge=4, le=31)
+    PASSWORD_HASH_WORKERS: int = Field(2, ge=1)
+    PASSWORD_HASH_MAX_PENDING: int = Field(64, ge=1)
+
+    # Cache des utilisateurs authentifiés: "memory" (par processus), "off",
+    # ou "module:fabrique" pour un backend partagé entre workers (voir usercache.py)
+    USER_CACHE_BACKEND: Optional[str] = "memory"
+    USER_CACHE_SIZE: int = Field(10_000, ge=1)
+    USER_CACHE_TTL_SECONDS: Optional[float] = 30.0
+
+    # Moteur de /decide: "experta" (clone par requête), "pool" (moteurs réutilisés)
+    # ou "index" (jointures par dictionnaires, sans Experta)
+    DECIDE_ENGINE: Literal["experta", "pool", "index"] = "experta"
+    ENGINE_POOL_SIZE: int = 4
+    ENGINE_POOL_TIMEOUT_SECONDS: float = 2.0
+    ENGINE_POOL_MAX_AGE_SECONDS: Optional[float] = None
+    ENGINE_POOL_MAX_USES: Optional[int] = None
+
+    # Où s'exécute /decide: "thread" (threadpool de Starlette) ou "process" (workers
+    # démarrés par forkserver, voir procpool.py). 0 worker = un par cœur;
+    # recyclage de tout le pool après N requêtes par worker en moyenne (None = jamais)
+    DECIDE_EXECUTOR: Literal["thread", "process"] = "thread"
+    DECIDE_PROCESS_WORKERS: int = Field(0, ge=0)
+    DECIDE_PROCESS_MAX_PENDING: int = Field(256, ge=1)
+    DECIDE_PROCESS_RECYCLE_AFTER: Optional[int] = Field(None, ge=1)
+
+    # Cache de résultats de /decide (0 = désactivé)
+    DECIDE_CACHE_SIZE: int = 1024
+    DECIDE_CACHE_TTL_SECONDS: Optional[float] = 300.0
+
+    # POST /decide/batch
+    DECIDE_BATCH_MAX_ITEMS: int = 10_000
+
+    # Sessions de décision incrémentales (/decide/sessions, voir sessions.py): nombre
+    # maximum dans le processus, par utilisateur, expiration après inactivité, et
+    # symptômes + conditions par session.
+    # Chaque session garde un clone du moteur: ~200 Kio, plus ~10 Kio par symptôme
+    # ou condition (~700 Kio à 50). Le nombre de sessions est aussi borné par
+    # DECISION_SESSION_MEMORY_MB (par worker) divisé par ce coût au maximum d'items:
+    # 64 Mio et 50 items -> 93 sessions
+    DECISION_SESSION_MAX: int = Field(1000, ge=1)
+    DECISION_SESSION_MEMORY_MB: float = Field(64.0, gt=0)
+    DECISION_SESSION_MAX_PER_USER: int = Field(3, ge=1)
+    DECISION_SESSION_IDLE_SECONDS: float = Field(600.0, gt=0)
+    DECISION_SESSION_MAX_ITEMS: int = Field(50, ge=1)
+
+    # Rechargement du catalogue: scrutation de data/ (None = désactivée,
+    # rechargement manuel via POST /admin/catalogue/reload)
+    CATALOGUE_WATCH_INTERVAL_SECONDS: Optional[float] = None
+
+    # Capture anonymisée des requêtes /decide en JSONL pour replay.py (None = désactivée)
+    DECIDE_CAPTURE_PATH: Optional[str] = None
+    DECIDE_CAPTURE_SAMPLE_RATE: float = 1.0
+
+    # Métriques Prometheus de /decide sur GET /metrics (False = ni mesure ni endpoint)
+    METRICS_ENABLED: bool = True
+
+    # POST /decide?profile=true: profil des règles Experta dans la réponse (debug uniquement)
+    DECIDE_PROFILING_ENABLED: bool = False
+
 
 @lru_cache
 def get_settings() -> Settings:
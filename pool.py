@@ -0,0 +1,179 @@
+"""pool.py
+
+Pool borné de moteurs `MoteurRecommandation` déjà chauds.
+
+Au lieu de cloner un moteur par requête, `service.decide` (mode "pool")
+emprunte un moteur, déclare les faits de la requête, exécute, puis
+rétracte uniquement les faits ajoutés avant de le rendre au pool.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from logic import MoteurRecommandation
+
+
+class PoolTimeout(RuntimeError):
+    """Aucun moteur disponible dans le délai imparti."""
+
+
+class _PooledEngine:
+    __slots__ = ("engine", "created_at", "uses")
+
+    def __init__(self, engine: MoteurRecommandation):
+        self.engine = engine
+        self.created_at = time.monotonic()
+        self.uses = 0
+
+
+class EnginePool:
+    """Pool thread-safe et borné de moteurs prêts à l'emploi.
+
+- `size`: nombre maximum de moteurs (empruntés + disponibles)
+- `timeout`: attente maximale (secondes) lors d'un emprunt quand le pool est plein
+- `max_age` / `max_uses`: recyclage d'un moteur trop ancien ou trop utilisé (None = jamais)
+"""
+
+    def __init__(
+        self,
+        factory: Callable[[], MoteurRecommandation],
+        size: int = 4,
+        timeout: float = 2.0,
+        max_age: Optional[float] = None,
+        max_uses: Optional[int] = None,
+    ):
+        if size < 1:
+            raise ValueError("size doit être >= 1")
+
+        self._factory = factory
+        self.size = size
+        self.timeout = timeout
+        self.max_age = max_age
+        self.max_uses = max_uses
+
+        self._cond = threading.Condition()
+        self._idle: List[_PooledEngine] = []
+        self._in_use: Dict[int, _PooledEngine] = {}
+        self._created = 0
+
+        self._hits = 0
+        self._misses = 0
+        self._waits = 0
+        self._timeouts = 0
+        self._recycled = 0
+        self._discarded = 0
+        self._wait_time_total = 0.0
+
+    def warm(self) -> None:
+        """Crée les moteurs manquants jusqu'à `size` (à appeler au démarrage)."""
+        while True:
+            with self._cond:
+                if self._created >= self.size:
+                    return
+                self._created += 1
+            try:
+                pooled = _PooledEngine(self._factory())
+            except BaseException:
+                with self._cond:
+                    self._created -= 1
+                    self._cond.notify()
+                raise
+            with self._cond:
+                self._idle.append(pooled)
+                self._cond.notify()
+
+    def _acquire(self) -> _PooledEngine:
+        deadline = time.monotonic() + self.timeout
+        waited = False
+        with self._cond:
+            while True:
+                if self._idle:
+                    pooled = self._idle.pop()
+                    self._hits += 1
+                    break
+                if self._created < self.size:
+                    self._created += 1
+                    self._misses += 1
+                    pooled = None
+                    break
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._timeouts += 1
+                    raise PoolTimeout(f"aucun moteur disponible après {self.timeout:.3f}s")
+                if not waited:
+                    waited = True
+                    self._waits += 1
+                started = time.monotonic()
+                self._cond.wait(remaining)
+                self._wait_time_total += time.monotonic() - started
+
+        if pooled is None:
+            try:
+                pooled = _PooledEngine(self._factory())
+            except BaseException:
+                with self._cond:
+                    self._created -= 1
+                    self._cond.notify()
+                raise
+
+        with self._cond:
+            self._in_use[id(pooled.engine)] = pooled
+        return pooled
+
+    def _is_expired(self, pooled: _PooledEngine) -> bool:
+        if self.max_uses is not None and pooled.uses >= self.max_uses:
+            return True
+        if self.max_age is not None and time.monotonic() - pooled.created_at >= self.max_age:
+            return True
+        return False
+
+    def _release(self, pooled: _PooledEngine, broken: bool) -> None:
+        with self._cond:
+            self._in_use.pop(id(pooled.engine), None)
+            pooled.uses += 1
+            if broken:
+                self._discarded += 1
+                self._created -= 1
+            elif self._is_expired(pooled):
+                self._recycled += 1
+                self._created -= 1
+            else:
+                self._idle.append(pooled)
+            self._cond.notify()
+
+    @contextmanager
+    def engine(self) -> Iterator[MoteurRecommandation]:
+        """Emprunte un moteur; il est jeté (et non rendu) si le bloc lève une exception."""
+        pooled = self._acquire()
+        try:
+            yield pooled.engine
+        except BaseException:
+            self._release(pooled, broken=True)
+            raise
+        else:
+            self._release(pooled, broken=False)
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        with self._cond:
+            ages = [now - p.created_at for p in self._idle] + [now - p.created_at for p in self._in_use.values()]
+            return {
+                "size": self.size,
+                "created": self._created,
+                "idle": len(self._idle),
+                "in_use": len(self._in_use),
+                "hits": self._hits,
+                "misses": self._misses,
+                "waits": self._waits,
+                "timeouts": self._timeouts,
+                "recycled": self._recycled,
+                "discarded": self._discarded,
+                "wait_time_total_s": round(self._wait_time_total, 6),
+                "engine_age_max_s": round(max(ages), 3) if ages else 0.0,
+                "engine_age_mean_s": round(sum(ages) / len(ages), 3) if ages else 0.0,
+            }
@@ -0,0 +1,343 @@
+"""procpool.py
+
+Exécution de `service.decide` dans un pool de processus (option
+DECIDE_EXECUTOR="process").
+
+La boucle match/fire d'Experta est du Python pur qui garde le GIL: des
+threads supplémentaires n'apportent que de l'attente. Ici chaque requête
+tourne dans un worker, un processus à part.
+
+Démarrage des workers: méthode "forkserver", jamais par fork de ce
+processus. Le serveur a des threads (threadpool de Starlette, bcrypt,
+scrutation du catalogue, sessions...) qui peuvent tenir un verrou (caches,
+snapshot, métriques) au moment d'un fork: l'enfant hériterait du verrou tenu
+et se bloquerait. Le forkserver est un processus neuf, sans thread, qui
+importe `service` (et donc charge le catalogue) une fois; chaque worker en
+est forké et partage ces pages. À son démarrage, un worker recharge le
+catalogue si le forkserver a une version de retard, puis compile le moteur.
+Comme avec "spawn", un script lancé directement (`python script.py`) est
+réimporté par chaque worker: son code de lancement doit être sous
+`if __name__ == "__main__"` (uvicorn l'est déjà).
+
+Un pool n'est utilisé qu'une fois tous ses workers prêts:
+- `warm()` (au démarrage) le construit dans le thread appelant
+- recyclage, rechargement du catalogue, worker mort: le remplaçant est
+  construit dans un thread de fond; les requêtes continuent sur l'ancien
+  pool (ancien catalogue) jusqu'à l'échange, sous verrou. `submit` ne fait
+  que choisir un pool déjà prêt, sans jamais démarrer de processus.
+
+- `max_pending`: requêtes admises (en cours + en attente) avant refus (`ProcessPoolBusy`, 503)
+- `recycle_after`: nombre moyen de requêtes par worker après lequel tout le
+  pool est remplacé (`max_tasks_per_child` de concurrent.futures
+  redémarrerait un worker à froid pendant qu'une requête l'attend)
+
+Métriques: les étapes de /decide mesurées dans un worker sont renvoyées avec
+la décision (`decide_in_worker`) et rejouées ici (`metrics.replay`).
+
+Sans forkserver (Windows), le pool n'est pas créé et /decide reste sur les threads.
+"""
+
+from __future__ import annotations
+
+import multiprocessing
+import os
+import signal
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import metrics
+import service
+from database import current_catalogue, get_catalogue_store, reload_catalogue
+from pool import PoolTimeout
+
+
+_START_METHOD = "forkserver"
+# Importés une fois par le forkserver, hérités par chaque worker
+_PRELOAD = ["service"]
+# Durée maximale du démarrage d'un pool (chargement du catalogue compris)
+_WARM_TIMEOUT = 120.0
+
+
+class ProcessPoolBusy(PoolTimeout):
+    """Trop de requêtes en attente d'un worker."""
+
+
+def _init_worker(version: str, settings: Dict[str, Any], ready: Any) -> None:
+    # Ctrl-C est géré par le processus principal, qui arrête le pool proprement
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    # Le forkserver a chargé le catalogue à son démarrage: il peut avoir une version de retard
+    if current_catalogue().version != version:
+        reload_catalogue()
+        if current_catalogue().version != version:
+            raise RuntimeError(f"Catalogue {version} introuvable dans data/ (trouvé: {current_catalogue().version})")
+    service.configure(**settings)
+
+    # Tous les workers démarrent avant le premier traitement (voir `DecideProcessPool._build`)
+    try:
+        ready.wait(_WARM_TIMEOUT)
+    except threading.BrokenBarrierError:
+        pass
+
+
+def _ping() -> int:
+    return os.getpid()
+
+
+def decide_in_worker(
+    metrics_enabled: bool, symptomes: List[str], conditions: Optional[List[str]]
+) -> Tuple[Dict[str, Any], List[Tuple[Any, ...]]]:
+    """`service.decide` dans un worker: (décision, mesures à rejouer par `metrics.replay`)."""
+    metrics.configure(metrics_enabled)
+    with metrics.recording() as records:
+        decision = service.decide(symptomes, conditions)
+    return decision, records
+
+
+class DecideProcessPool:
+    """Pool de processus démarrés par forkserver, borné et recyclé (voir le module)."""
+
+    def __init__(self, workers: int = 0, max_pending: int = 256, recycle_after: Optional[int] = None):
+        if _START_METHOD not in multiprocessing.get_all_start_methods():
+            raise RuntimeError("Le pool de processus de /decide nécessite le démarrage par forkserver")
+
+        self.workers = workers or os.cpu_count() or 1
+        if max_pending < self.workers:
+            raise ValueError("max_pending doit être >= workers")
+        if recycle_after is not None and recycle_after < 1:
+            raise ValueError("recycle_after doit être >= 1")
+
+        self.max_pending = max_pending
+        self.recycle_after = recycle_after
+
+        self._context = multiprocessing.get_context(_START_METHOD)
+        # Sans effet si le forkserver tourne déjà (il garde ses modules)
+        self._context.set_forkserver_preload(_PRELOAD)
+
+        self._lock = threading.Lock()
+        # Un seul pool en construction à la fois
+        self._build_lock = threading.Lock()
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._stale = False
+        # Incrémenté à chaque invalidation: un pool construit avant reste périmé
+        self._epoch = 0
+        self._closed = False
+        self._tasks = 0
+        self._replacer: Optional[threading.Thread] = None
+
+        self._pending = 0
+        self._completed = 0
+        self._rejected = 0
+        self._generations = 0
+        self._broken = 0
+        self._failed_builds = 0
+
+    def _build(self) -> ProcessPoolExecutor:
+        """Nouveau pool, tous workers démarrés. Bloquant: jamais depuis la boucle d'événements."""
+        ready = self._context.Barrier(self.workers)
+        executor = ProcessPoolExecutor(
+            self.workers,
+            mp_context=self._context,
+            initializer=_init_worker,
+            initargs=(current_catalogue().version, service.decide_settings(), ready),
+        )
+        try:
+            # Les workers attendent la barrière avant de traiter: chaque ping démarre un processus
+            pings = [executor.submit(_ping) for _ in range(self.workers)]
+            for ping in pings:
+                ping.result(timeout=_WARM_TIMEOUT)
+        except BaseException:
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+        return executor
+
+    def replace(self) -> None:
+        """Construit un nouveau pool dans le thread appelant, puis le met en service à la place de l'ancien."""
+        with self._build_lock:
+            epoch = self._epoch
+            try:
+                executor = self._build()
+            except Exception:
+                with self._lock:
+                    self._failed_builds += 1
+                raise
+            with self._lock:
+                if self._closed:
+                    old = executor
+                else:
+                    old, self._executor = self._executor, executor
+                    # Invalidé pendant la construction (rechargement): encore un remplacement
+                    self._stale = epoch != self._epoch
+                    self._tasks = 0
+                    self._generations += 1
+        if old is not None:
+            # Les requêtes déjà soumises à l'ancien pool se terminent, puis ses workers s'arrêtent
+            old.shutdown(wait=False)
+
+    def _replace_in_background(self) -> None:
+        # Appelé sous self._lock
+        if self._closed or (self._replacer is not None and self._replacer.is_alive()):
+            return
+        self._replacer = threading.Thread(target=self._background_replace, name="decide-pool-replace", daemon=True)
+        self._replacer.start()
+
+    def _background_replace(self) -> None:
+        try:
+            while True:
+                self.replace()
+                with self._lock:
+                    if not self._stale or self._closed:
+                        return
+        except Exception:
+            # Compté dans stats(); nouvelle tentative à la prochaine requête (le pool reste marqué périmé)
+            pass
+
+    def _acquire(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self._rejected += 1
+                raise ProcessPoolBusy("Decide process pool queue is full")
+
+            executor = self._executor
+            if executor is None:
+                raise ProcessPoolBusy("Decide process pool is not ready")
+            recycle = self.recycle_after is not None and self._tasks >= self.recycle_after * self.workers
+            if self._stale or recycle:
+                self._replace_in_background()
+
+            self._pending += 1
+            self._tasks += 1
+            return executor
+
+    def _release(self, future: Future) -> None:
+        with self._lock:
+            self._pending -= 1
+            self._completed += 1
+
+    def submit(self, fn: Callable[..., Any], *args: Any) -> Future:
+        """Soumet `fn(*args)` (fonction de module, arguments picklables). Lève `ProcessPoolBusy` si la file est pleine."""
+        executor = self._acquire()
+        try:
+            future = executor.submit(fn, *args)
+        except (BrokenProcessPool, RuntimeError):
+            # Worker mort (OOM...) ou pool arrêté entre-temps: remplacé en arrière-plan
+            with self._lock:
+                self._pending -= 1
+                self._broken += 1
+                if self._executor is executor:
+                    self._stale = True
+                    self._epoch += 1
+                    self._replace_in_background()
+            raise ProcessPoolBusy("Decide process pool unavailable")
+        future.add_done_callback(self._release)
+        return future
+
+    def mark_broken(self) -> None:
+        """À appeler quand un résultat lève `BrokenProcessPool`: le pool est remplacé en arrière-plan."""
+        with self._lock:
+            self._broken += 1
+            self._stale = True
+            self._epoch += 1
+            self._replace_in_background()
+
+    def warm(self) -> None:
+        """Démarre les workers maintenant (au démarrage), dans le thread appelant."""
+        self.replace()
+
+    def invalidate(self) -> None:
+        """Remplace le pool en arrière-plan (catalogue rechargé); l'ancien sert jusqu'à l'échange."""
+        with self._lock:
+            self._stale = True
+            self._epoch += 1
+            self._replace_in_background()
+
+    def wait_replaced(self, timeout: Optional[float] = None) -> bool:
+        """Attend la fin du remplacement en cours. Faux s'il n'est pas terminé après `timeout`."""
+        replacer = self._replacer
+        if replacer is not None:
+            replacer.join(timeout)
+            return not replacer.is_alive()
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "max_pending": self.max_pending,
+                "recycle_after": self.recycle_after,
+                "pending": self._pending,
+                "completed": self._completed,
+                "rejected": self._rejected,
+                "generations": self._generations,
+                "broken": self._broken,
+                "failed_builds": self._failed_builds,
+                "replacing": self._replacer is not None and self._replacer.is_alive(),
+            }
+
+    def shutdown(self, wait: bool = True) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+            self._closed = True
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=not wait)
+
+
+_POOL: Optional[DecideProcessPool] = None
+
+
+def configure(workers: int = 0, max_pending: int = 256, recycle_after: Optional[int] = None) -> Optional[DecideProcessPool]:
+    """Crée le pool et démarre ses workers (bloquant). À appeler une fois `service` configuré."""
+    global _POOL
+    shutdown()
+    if _START_METHOD not in multiprocessing.get_all_start_methods():
+        return None
+    pool = DecideProcessPool(workers, max_pending, recycle_after)
+    pool.warm()
+    _POOL = pool
+    return pool
+
+
+def get_decide_pool() -> Optional[DecideProcessPool]:
+    return _POOL
+
+
+def shutdown() -> None:
+    global _POOL
+    pool, _POOL = _POOL, None
+    if pool is not None:
+        pool.shutdown()
+
+
+def process_pool_stats() -> Optional[Dict[str, Any]]:
+    pool = _POOL
+    return pool.stats() if pool is not None else None
+
+
+def _on_catalogue_reload(snapshot) -> None:
+    # Les workers portent l'ancien catalogue: nouveau pool, construit en arrière-plan
+    pool = _POOL
+    if pool is not None:
+        pool.invalidate()
+
+
+get_catalogue_store().subscribe(_on_catalogue_reload)
+
+
+def _stat(name: str):
+    def read() -> Optional[float]:
+        stats = process_pool_stats()
+        return stats.get(name) if stats else None
+    return read
+
+
+for _name, _kind, _doc in (
+    ("pending", "gauge", "Requêtes /decide soumises au pool de processus et non terminées."),
+    ("rejected", "counter", "Requêtes /decide refusées (file du pool de processus pleine)."),
+    ("generations", "counter", "Pools de processus créés (démarrage, recyclage, rechargement)."),
+    ("broken", "counter", "Pools de processus cassés (worker mort)."),
+    ("failed_builds", "counter", "Remplacements de pool de processus en échec (démarrage des workers)."),
+):
+    suffix = "_total" if _kind == "counter" else ""
+    metrics.REGISTRY.register(metrics.CallbackMetric(f"decide_process_{_name}{suffix}", _doc, _stat(_name), _kind))
@@ -0,0 +1,311 @@
+"""replay.py
+
+Rejoue une charge sur l'application FastAPI, dans le processus (pas de
+serveur, pas de MongoDB): les requêtes passent par l'ASGI de `api.app` et les
+routes d'authentification utilisent une base en mémoire (`memorydb.InMemoryDatabase`).
+
+Sources de requêtes /decide:
+- une capture JSONL (voir `capture.py`, `DECIDE_CAPTURE_PATH`)
+- à défaut, des requêtes tirées au hasard dans le vocabulaire du catalogue
+
+Usage:
+    python replay.py captures/decide.jsonl --concurrency 32
+    python replay.py --requests 2000 --mix decide=8,login=1,me=1 --users 20
+    python replay.py captures/decide.jsonl --preserve-timing --speed 4   # forme de charge d'origine, 4x plus vite
+    python replay.py ... --json rapport.json
+
+Rapport: par endpoint, nombre de requêtes, erreurs, débit et latences p50/p95/p99.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import secrets
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from memorydb import InMemoryDatabase
+
+
+# --- Sources de requêtes ---
+
+def load_capture(path: Path) -> List[Dict[str, Any]]:
+    records = []
+    with path.open("r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                records.append(json.loads(line))
+    records.sort(key=lambda r: r.get("t", 0.0))
+    return records
+
+
+def synthetic_decide_bodies(n: int, seed: int = 0) -> List[Dict[str, Any]]:
+    """Requêtes /decide aléatoires: 1 à 5 symptômes connus, 0 à 2 conditions connues."""
+    from logic import get_vocabulary
+
+    vocabulary = get_vocabulary()
+    symptomes = sorted(vocabulary.known_symptoms)
+    conditions = sorted(vocabulary.known_conditions)
+    rng = random.Random(seed)
+    return [
+        {
+            "symptomes": rng.sample(symptomes, rng.randint(1, min(5, len(symptomes)))),
+            "conditions_medicales": rng.sample(conditions, rng.randint(0, min(2, len(conditions)))),
+        }
+        for _ in range(n)
+    ]
+
+
+def parse_mix(text: str) -> Dict[str, int]:
+    mix: Dict[str, int] = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in OPERATIONS:
+            raise ValueError(f"Opération inconnue: {name!r} (attendu: {', '.join(OPERATIONS)})")
+        mix[name] = int(weight or 1)
+    return mix
+
+
+# --- Exécution ---
+
+def _percentile(ordered: List[float], q: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+
+    def add(self, endpoint: str, seconds: float, ok: bool) -> None:
+        self.latencies.setdefault(endpoint, []).append(seconds)
+        if not ok:
+            self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+
+    def report(self, wall: float) -> Dict[str, Any]:
+        endpoints: Dict[str, Any] = {}
+        everything: List[float] = []
+        for endpoint, samples in sorted(self.latencies.items()):
+            ordered = sorted(samples)
+            everything.extend(ordered)
+            endpoints[endpoint] = self._summary(ordered, self.errors.get(endpoint, 0), wall)
+        return {
+            "wall_s": round(wall, 3),
+            "total": self._summary(sorted(everything), sum(self.errors.values()), wall),
+            "endpoints": endpoints,
+        }
+
+    @staticmethod
+    def _summary(ordered: List[float], errors: int, wall: float) -> Dict[str, Any]:
+        return {
+            "requests": len(ordered),
+            "errors": errors,
+            "throughput_rps": round(len(ordered) / wall, 2) if wall > 0 else 0.0,
+            "p50_ms": round(_percentile(ordered, 0.50) * 1000, 3),
+            "p95_ms": round(_percentile(ordered, 0.95) * 1000, 3),
+            "p99_ms": round(_percentile(ordered, 0.99) * 1000, 3),
+        }
+
+
+class Session:
+    """Client HTTP in-process et comptes de test pour les routes authentifiées."""
+
+    def __init__(self, client, recorder: Recorder, decide_bodies: Iterator[Dict[str, Any]]):
+        self.client = client
+        self.recorder = recorder
+        self.decide_bodies = decide_bodies
+        self.users: List[Tuple[str, str, str]] = []  # (email, mot de passe, jeton)
+        self.rng = random.Random(1)
+
+    async def request(self, endpoint: str, method: str, url: str, **kwargs: Any):
+        started = time.perf_counter()
+        response = await self.client.request(method, url, **kwargs)
+        self.recorder.add(endpoint, time.perf_counter() - started, response.status_code < 400)
+        return response
+
+    async def create_users(self, n: int) -> None:
+        for _ in range(n):
+            email = f"replay-{secrets.token_hex(6)}@example.com"
+            password = secrets.token_urlsafe(12)
+            response = await self.request("POST /auth/signup", "POST", "/auth/signup", json={"email": email, "password": password})
+            response.raise_for_status()
+            self.users.append((email, password, response.json()["access_token"]))
+
+    def _user(self) -> Tuple[str, str, str]:
+        if not self.users:
+            raise RuntimeError("--users doit être > 0 pour les opérations authentifiées")
+        return self.rng.choice(self.users)
+
+    async def decide(self, body: Optional[Dict[str, Any]] = None) -> None:
+        await self.request("POST /decide", "POST", "/decide", json=body or next(self.decide_bodies))
+
+    async def login(self) -> None:
+        email, password, _ = self._user()
+        await self.request("POST /auth/login", "POST", "/auth/login", json={"email": email, "password": password})
+
+    async def me(self) -> None:
+        _, _, token = self._user()
+        await self.request("GET /users/me", "GET", "/users/me", headers={"Authorization": f"Bearer {token}"})
+
+    async def profile(self) -> None:
+        _, _, token = self._user()
+        payload = {"activity_level": self.rng.choice(["light", "moderate", "active"])}
+        await self.request(
+            "PUT /users/me/profile", "PUT", "/users/me/profile",
+            json=payload, headers={"Authorization": f"Bearer {token}"},
+        )
+
+
+OPERATIONS = ("decide", "login", "me", "profile")
+
+
+async def _closed_loop(session: Session, operations: Iterable[str], concurrency: int) -> None:
+    it = iter(operations)
+
+    async def worker() -> None:
+        for op in it:
+            await getattr(session, op)()
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+
+async def _open_loop(session: Session, records: List[Dict[str, Any]], concurrency: int, speed: float) -> None:
+    # Chaque requête part à son instant d'origine (divisé par `speed`), dans la limite de `concurrency`
+    semaphore = asyncio.Semaphore(concurrency)
+    start = time.perf_counter()
+    t0 = records[0].get("t", 0.0) if records else 0.0
+
+    async def fire(record: Dict[str, Any]) -> None:
+        delay = (record.get("t", 0.0) - t0) / speed - (time.perf_counter() - start)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        async with semaphore:
+            await session.decide(record["body"])
+
+    await asyncio.gather(*(fire(r) for r in records))
+
+
+async def run(
+    capture: Optional[Path] = None,
+    requests: Optional[int] = None,
+    concurrency: int = 16,
+    mix: Optional[Dict[str, int]] = None,
+    users: int = 0,
+    preserve_timing: bool = False,
+    speed: float = 1.0,
+    seed: int = 0,
+) -> Dict[str, Any]:
+    """Rejoue la charge et retourne le rapport (voir `Recorder.report`)."""
+    import httpx
+
+    # Réglages nécessaires au démarrage de l'application; la base est remplacée
+    # par InMemoryDatabase et la capture est désactivée pour ne pas capturer le replay
+    os.environ.setdefault("MONGODB_URI", "mongodb://replay.invalid")
+    os.environ.setdefault("JWT_SECRET", secrets.token_urlsafe(32))
+    os.environ["DECIDE_CAPTURE_PATH"] = ""
+
+    import api
+    from mongo import get_db, get_settings
+
+    get_settings.cache_clear()
+    db = InMemoryDatabase()
+    api.app.dependency_overrides[get_db] = lambda: db
+
+    records = load_capture(capture) if capture else []
+    bodies = [r["body"] for r in records] or synthetic_decide_bodies(max(requests or 1000, 1), seed)
+    mix = mix or {"decide": 1}
+    needs_users = users or (1 if any(op != "decide" for op in mix) else 0)
+
+    recorder = Recorder()
+    try:
+        async with api.app.router.lifespan_context(api.app):
+            transport = httpx.ASGITransport(app=api.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://replay") as client:
+                session = Session(client, Recorder(), itertools.cycle(bodies))
+                await session.create_users(needs_users)
+                session.recorder = recorder
+
+                started = time.perf_counter()
+                if preserve_timing:
+                    if not records:
+                        raise ValueError("--preserve-timing nécessite une capture")
+                    await _open_loop(session, records[:requests] if requests else records, concurrency, speed)
+                else:
+                    total = requests or len(bodies)
+                    rng = random.Random(seed)
+                    names = list(mix)
+                    weights = [mix[n] for n in names]
+                    await _closed_loop(session, (rng.choices(names, weights)[0] for _ in range(total)), concurrency)
+                wall = time.perf_counter() - started
+    finally:
+        api.app.dependency_overrides.pop(get_db, None)
+
+    report = recorder.report(wall)
+    report["config"] = {
+        "capture": str(capture) if capture else None,
+        "concurrency": concurrency,
+        "mix": mix,
+        "users": needs_users,
+        "preserve_timing": preserve_timing,
+        "speed": speed,
+    }
+    return report
+
+
+def _print_report(report: Dict[str, Any]) -> None:
+    print(f"Durée: {report['wall_s']}s")
+    header = f"{'endpoint':<24} {'req':>7} {'err':>5} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}"
+    print(header)
+    print("-" * len(header))
+    rows = list(report["endpoints"].items()) + [("TOTAL", report["total"])]
+    for name, r in rows:
+        print(
+            f"{name:<24} {r['requests']:>7} {r['errors']:>5} {r['throughput_rps']:>9} "
+            f"{r['p50_ms']:>9} {r['p95_ms']:>9} {r['p99_ms']:>9}"
+        )
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Rejoue une charge sur l'application, dans le processus.")
+    parser.add_argument("capture", nargs="?", type=Path, help="capture JSONL de /decide (défaut: requêtes synthétiques)")
+    parser.add_argument("--requests", type=int, default=None, help="nombre de requêtes (défaut: toute la capture, ou 1000)")
+    parser.add_argument("--concurrency", type=int, default=16, help="requêtes simultanées")
+    parser.add_argument("--mix", type=parse_mix, default=None, help="pondération des opérations, ex: decide=8,login=1,me=1,profile=1")
+    parser.add_argument("--users", type=int, default=0, help="comptes créés pour les opérations authentifiées")
+    parser.add_argument("--preserve-timing", action="store_true", help="respecte les instants de la capture (charge ouverte)")
+    parser.add_argument("--speed", type=float, default=1.0, help="accélération avec --preserve-timing")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", type=Path, default=None, help="écrit aussi le rapport en JSON")
+    args = parser.parse_args(argv)
+
+    report = asyncio.run(
+        run(
+            capture=args.capture,
+            requests=args.requests,
+            concurrency=args.concurrency,
+            mix=args.mix,
+            users=args.users,
+            preserve_timing=args.preserve_timing,
+            speed=args.speed,
+            seed=args.seed,
+        )
+    )
+    _print_report(report)
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+    return 1 if report["total"]["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,27 +1,49 @@
 from __future__ import annotations
 
+import asyncio
 import hashlib
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Optional, TypeVar
 
 import bcrypt
 from jose import JWTError, jwt
 
+import metrics
 from mongo import get_settings
 
 ALGORITHM = "HS256"
 
+T = TypeVar("T")
+
 
 def _prehash(password: str) -> bytes:
     # évite les problèmes bcrypt (72 bytes) + stable
     return hashlib.sha256(password.encode("utf-8")).digest()
 
 
-def hash_password(password: str) -> str:
-    salt = bcrypt.gensalt(rounds=12)
+def hash_password(password: str, rounds: Optional[int] = None) -> str:
+    # Coût par défaut: réglage BCRYPT_ROUNDS
+    salt = bcrypt.gensalt(rounds=rounds or get_settings().BCRYPT_ROUNDS)
     hashed = bcrypt.hashpw(_prehash(password), salt)
     return hashed.decode("utf-8")
 
 
+def hash_rounds(password_hash: str) -> Optional[int]:
+    # "$2b$12$<sel+empreinte>" -> 12
+    parts = password_hash.split("$")
+    if len(parts) < 4 or not parts[2].isdigit():
+        return None
+    return int(parts[2])
+
+
+def needs_rehash(password_hash: str, rounds: Optional[int] = None) -> bool:
+    """Vrai si l'empreinte n'a pas le coût configuré (à recalculer après une connexion réussie)."""
+    return hash_rounds(password_hash) != (rounds or get_settings().BCRYPT_ROUNDS)
+
+
 def verify_password(password: str, password_hash: str) -> bool:
     try:
         return bcrypt.checkpw(_prehash(password), password_hash.encode("utf-8"))
@@ -29,6 +51,127 @@ def verify_password(password: str, password_hash: str) -> bool:
         return False
 
 
+class HasherBusy(RuntimeError):
+    """Trop de calculs bcrypt en attente."""
+
+
+class PasswordHasher:
+    """Exécute bcrypt hors de la boucle d'événements, dans un pool de threads borné.
+
+bcrypt libère le GIL pendant le calcul: des threads suffisent, sans coût de
+sérialisation. Au-delà de `max_pending` opérations (en cours + en attente),
+les suivantes sont refusées (`HasherBusy`) plutôt que d'allonger la file.
+
+- `workers`: calculs simultanés (au plus un cœur chacun)
+- `max_pending`: opérations admises au total avant refus
+"""
+
+    def __init__(self, workers: int = 2, max_pending: int = 64):
+        if workers < 1:
+            raise ValueError("workers doit être >= 1")
+        if max_pending < workers:
+            raise ValueError("max_pending doit être >= workers")
+
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._completed = 0
+        self._rejected = 0
+
+    async def _submit(self, op: str, fn: Callable[..., T], *args: Any) -> T:
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self._rejected += 1
+                metrics.PASSWORD_HASH_REJECTED_TOTAL.inc()
+                raise HasherBusy("Password hashing queue is full")
+            self._pending += 1
+
+        submitted = time.perf_counter()
+
+        def job() -> T:
+            started = time.perf_counter()
+            try:
+                return fn(*args)
+            finally:
+                if metrics.ENABLED:
+                    metrics.PASSWORD_HASH_QUEUE_SECONDS.labels(op).observe(started - submitted)
+                    metrics.PASSWORD_HASH_SECONDS.labels(op).observe(time.perf_counter() - started)
+
+        try:
+            future = self._executor.submit(job)
+        except RuntimeError:
+            # Pool arrêté (reconfiguration): l'opération n'a pas été admise
+            with self._lock:
+                self._pending -= 1
+            raise
+        # Libéré à la fin du calcul, pas de l'attente: un client qui se déconnecte
+        # (tâche annulée) laisse tourner bcrypt, qui compte toujours dans max_pending
+        future.add_done_callback(self._release)
+        return await asyncio.wrap_future(future)
+
+    def _release(self, future: Future) -> None:
+        with self._lock:
+            self._pending -= 1
+            self._completed += 1
+
+    async def hash(self, password: str, rounds: Optional[int] = None) -> str:
+        return await self._submit("hash", hash_password, password, rounds)
+
+    async def verify(self, password: str, password_hash: str) -> bool:
+        return await self._submit("verify", verify_password, password, password_hash)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "max_pending": self.max_pending,
+                "pending": self._pending,
+                "completed": self._completed,
+                "rejected": self._rejected,
+            }
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=True)
+
+
+_HASHER: Optional[PasswordHasher] = None
+_HASHER_LOCK = threading.Lock()
+
+
+def configure_password_hasher(workers: int = 2, max_pending: int = 64) -> PasswordHasher:
+    """Remplace le pool bcrypt (l'ancien termine ses calculs en cours)."""
+    global _HASHER
+    hasher = PasswordHasher(workers, max_pending)
+    with _HASHER_LOCK:
+        old, _HASHER = _HASHER, hasher
+    if old is not None:
+        old.shutdown()
+    return hasher
+
+
+def get_password_hasher() -> PasswordHasher:
+    # Créé au premier usage avec les réglages si configure_password_hasher n'a pas été appelé
+    global _HASHER
+    hasher = _HASHER
+    if hasher is None:
+        with _HASHER_LOCK:
+            if _HASHER is None:
+                s = get_settings()
+                _HASHER = PasswordHasher(s.PASSWORD_HASH_WORKERS, s.PASSWORD_HASH_MAX_PENDING)
+            hasher = _HASHER
+    return hasher
+
+
+def shutdown_password_hasher() -> None:
+    global _HASHER
+    with _HASHER_LOCK:
+        hasher, _HASHER = _HASHER, None
+    if hasher is not None:
+        hasher.shutdown()
+
+
 def create_access_token(user_id: str) -> str:
     s = get_settings()
     exp = datetime.now(timezone.utc) + timedelta(minutes=s.JWT_EXPIRES_MINUTES)
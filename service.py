@@ -1,78 +1,196 @@
 from __future__ import annotations
 
-from typing import Any, Dict, List, Optional, Set, Tuple
+import time
+from contextlib import contextmanager
+from typing import AbstractSet, Any, Callable, Dict, FrozenSet, Iterator, List, Optional, Set, Tuple
 
-from database import CATALOGUE_PRODUITS, CONTRE_INDICATIONS
+import metrics
+from cache import TTLCache
+from database import CatalogueSnapshot, current_catalogue, get_catalogue_store
+from fastpath import get_decision_index
 from logic import (
     MoteurRecommandation,
-    BesoinClient,
-    ConditionClient,
     Recommandation,
     ProduitInterdit,
-    normalize_health_condition,
+    Vocabulary,
+    get_knowledge_base,
+    get_vocabulary,
+    new_engine,
 )
+from pool import EnginePool
 
 
-def _norm(x: str) -> str:
-    return (x or "").strip().lower()
+# Moteurs d'exécution de `decide`:
+# - "experta": un clone du moteur compilé par requête (défaut)
+# - "pool": un moteur emprunté à un pool borné, remis à zéro par rétractation
+# - "index": jointures par dictionnaires (fastpath.py), sans Experta
+DECIDE_ENGINES = ("experta", "pool", "index")
 
+_DECIDE_ENGINE = "experta"
+_ENGINE_POOL: Optional[EnginePool] = None
+_POOL_SETTINGS: Dict[str, Any] = {}
+# Arguments du dernier `configure` (repris par les workers de procpool.py)
+_SETTINGS: Dict[str, Any] = {"engine": "experta"}
 
-def _norm_symptome(x: str) -> str:
-    # IMPORTANT: même normalisation que celle utilisée dans logic.py
-    return normalize_health_condition(_norm(x))
+# Cache des faits inférés, indexé par l'entrée canonique (désactivé par défaut)
+_RESULT_CACHE: Optional[TTLCache] = None
 
 
-def _known_symptomes() -> Set[str]:
-    # IMPORTANT: normaliser aussi les symptômes connus, sinon mismatch
-    out: Set[str] = set()
-    for p in CATALOGUE_PRODUITS:
-        cible = p.get("cible")
-        if cible:
-            out.add(_norm_symptome(cible))
-    return out
+def configure(
+    engine: str = "experta",
+    pool_size: int = 4,
+    pool_timeout: float = 2.0,
+    pool_max_age: Optional[float] = None,
+    pool_max_uses: Optional[int] = None,
+    cache_size: int = 0,
+    cache_ttl: Optional[float] = 300.0,
+) -> None:
+    """Choisit le moteur d'exécution de `decide` (voir `DECIDE_ENGINES`) et son cache.
 
+`cache_size=0` désactive le cache de résultats. Reconfigurer repart d'un cache vide.
+"""
+    global _DECIDE_ENGINE, _ENGINE_POOL, _POOL_SETTINGS, _RESULT_CACHE, _SETTINGS
 
-def _known_conditions() -> Set[str]:
-    return {(_norm(c.get("condition", ""))) for c in CONTRE_INDICATIONS if c.get("condition")}
+    if engine not in DECIDE_ENGINES:
+        raise ValueError(f"Moteur inconnu: {engine!r} (attendu: {', '.join(DECIDE_ENGINES)})")
 
+    pool_settings = {"size": pool_size, "timeout": pool_timeout, "max_age": pool_max_age, "max_uses": pool_max_uses}
+    snapshot = current_catalogue()
+    _warm_snapshot(snapshot, engine)
+    pool = _make_pool(snapshot, pool_settings) if engine == "pool" else None
+
+    _DECIDE_ENGINE = engine
+    _ENGINE_POOL = pool
+    _POOL_SETTINGS = pool_settings
+    _RESULT_CACHE = TTLCache(cache_size, ttl=cache_ttl) if cache_size > 0 else None
+    _SETTINGS = {"engine": engine, **{f"pool_{k}": v for k, v in pool_settings.items()}, "cache_size": cache_size, "cache_ttl": cache_ttl}
 
-def decide(symptomes: List[str], conditions_medicales: Optional[List[str]] = None) -> Dict[str, Any]:
-    conditions_medicales = conditions_medicales or []
 
-    symptomes_norm = [_norm_symptome(s) for s in symptomes if _norm(s)]
-    conditions_norm = [_norm(c) for c in conditions_medicales if _norm(c)]
+def decide_settings() -> Dict[str, Any]:
+    """Arguments de `configure` pour reproduire la configuration courante (ex: dans un autre processus)."""
+    return dict(_SETTINGS)
 
-    known_s = _known_symptomes()
-    known_c = _known_conditions()
 
-    unknown_symptomes = sorted({s for s in symptomes_norm if s not in known_s})
-    unknown_conditions = sorted({c for c in conditions_norm if c not in known_c})
+def _make_pool(snapshot: CatalogueSnapshot, settings: Dict[str, Any]) -> EnginePool:
+    pool = EnginePool(lambda: new_engine(snapshot), **settings)
+    pool.warm()
+    return pool
 
-    symptomes_use = [s for s in symptomes_norm if s in known_s]
-    conditions_use = [c for c in conditions_norm if c in known_c]
 
-    engine = MoteurRecommandation()
-    engine.reset()
+def _warm_snapshot(snapshot: CatalogueSnapshot, engine: Optional[str] = None) -> None:
+    """Construit ce dont le moteur configuré a besoin pour `snapshot` (avant sa publication)."""
+    engine = engine or _DECIDE_ENGINE
+    get_vocabulary(snapshot)
+    if engine == "index":
+        get_decision_index(snapshot)
+    else:
+        get_knowledge_base(snapshot)
 
-    for s in symptomes_use:
-        engine.declare(BesoinClient(symptome=s))
 
-    for c in conditions_use:
-        engine.declare(ConditionClient(condition=c))
+def _on_catalogue_reload(snapshot: CatalogueSnapshot) -> None:
+    # Les moteurs du pool portent les faits de l'ancien catalogue: nouveau pool.
+    # Les emprunts en cours se terminent sur l'ancien, qui est ensuite abandonné.
+    global _ENGINE_POOL
+    if _ENGINE_POOL is not None:
+        _ENGINE_POOL = _make_pool(snapshot, _POOL_SETTINGS)
 
-    engine.run()
 
-    facts = list(engine.facts.values())
+get_catalogue_store().add_warmup(_warm_snapshot)
+get_catalogue_store().subscribe(_on_catalogue_reload)
+
+
+def engine_stats() -> Dict[str, Any]:
+    return {
+        "engine": _DECIDE_ENGINE,
+        "pool": _ENGINE_POOL.stats() if _ENGINE_POOL is not None else None,
+        "cache": _RESULT_CACHE.stats() if _RESULT_CACHE is not None else None,
+    }
+
+
+def _norm(x: str) -> str:
+    return (x or "").strip().lower()
+
+
+def _norm_symptome(x: str, vocabulary: Optional[Vocabulary] = None) -> str:
+    # IMPORTANT: même normalisation que celle utilisée dans logic.py
+    return (vocabulary or get_vocabulary()).normalize(_norm(x))
+
 
+def _known_symptomes(snapshot: Optional[CatalogueSnapshot] = None) -> FrozenSet[str]:
+    # Précalculés une fois par snapshot du catalogue (voir logic.Vocabulary)
+    return get_vocabulary(snapshot).known_symptoms
+
+
+def _known_conditions(snapshot: Optional[CatalogueSnapshot] = None) -> FrozenSet[str]:
+    return get_vocabulary(snapshot).known_conditions
+
+
+def _infer(
+    engine: MoteurRecommandation,
+    checkpoint: int,
+    symptomes_use: List[str],
+    conditions_use: List[str],
+) -> Tuple[Set[str], Set[Tuple[str, str]]]:
+    with metrics.stage("declare"):
+        for s in symptomes_use:
+            engine.declare_need(s)
+
+        for c in conditions_use:
+            engine.declare_condition(c)
+
+    with metrics.stage("run"):
+        engine.run()
+
+    with metrics.stage("collect"):
+        return _collect(engine, checkpoint)
+
+
+def _collect(engine: MoteurRecommandation, checkpoint: int) -> Tuple[Set[str], Set[Tuple[str, str]]]:
     forbidden: Set[str] = set()
     matches: Set[Tuple[str, str]] = set()
 
-    for f in facts:
+    # Les faits statiques sont antérieurs au checkpoint: seuls les faits inférés nous intéressent
+    # Les faits portent des ids (logic.SymbolTable): retour aux chaînes ici seulement
+    products, terms = engine.symbols.products, engine.symbols.terms
+    for f in engine.facts_since(checkpoint):
         if isinstance(f, ProduitInterdit):
-            forbidden.add(f["produit"])
+            forbidden.add(products[f["produit"]])
         elif isinstance(f, Recommandation):
-            matches.add((f["nom"], f["cible"]))
+            matches.add((products[f["nom"]], terms[f["cible"]]))
+
+    return forbidden, matches
+
+
+def _prepare(
+    symptomes: List[str],
+    conditions_medicales: Optional[List[str]],
+    vocabulary: Vocabulary,
+) -> Dict[str, Any]:
+    """Normalise l'entrée et sépare les symptômes/conditions connus des inconnus."""
+    with metrics.stage("normalize"):
+        conditions_medicales = conditions_medicales or []
+        known_s = vocabulary.known_symptoms
+        known_c = vocabulary.known_conditions
+
+        symptomes_norm = [_norm_symptome(s, vocabulary) for s in symptomes if _norm(s)]
+        conditions_norm = [_norm(c) for c in conditions_medicales if _norm(c)]
+
+        return {
+            "symptomes": symptomes,
+            "conditions_medicales": conditions_medicales,
+            "symptomes_utilises": [s for s in symptomes_norm if s in known_s],
+            "conditions_utilisees": [c for c in conditions_norm if c in known_c],
+            "unknown_symptomes": sorted({s for s in symptomes_norm if s not in known_s}),
+            "unknown_conditions": sorted({c for c in conditions_norm if c not in known_c}),
+        }
 
+
+def _format_decision(
+    prepared: Dict[str, Any],
+    forbidden: AbstractSet[str],
+    matches: AbstractSet[Tuple[str, str]],
+) -> Dict[str, Any]:
+    """Construit la réponse de `decide` à partir des faits inférés."""
     matches = {(p, s) for (p, s) in matches if p not in forbidden}
 
     by_product: Dict[str, Set[str]] = {}
@@ -94,14 +212,153 @@ def decide(symptomes: List[str], conditions_medicales: Optional[List[str]] = Non
 
     return {
         "input": {
-            "symptomes": symptomes,
-            "conditions_medicales": conditions_medicales,
-            "symptomes_utilises": symptomes_use,
-            "conditions_utilisees": conditions_use,
+            "symptomes": prepared["symptomes"],
+            "conditions_medicales": prepared["conditions_medicales"],
+            "symptomes_utilises": prepared["symptomes_utilises"],
+            "conditions_utilisees": prepared["conditions_utilisees"],
         },
         "best_decision": best_decision,
         "recommendations": recommendations,
         "forbidden_products": sorted(forbidden),
-        "unknown_symptomes": unknown_symptomes,
-        "unknown_conditions": unknown_conditions,
+        "unknown_symptomes": prepared["unknown_symptomes"],
+        "unknown_conditions": prepared["unknown_conditions"],
     }
+
+
+def _infer_and_rollback(
+    engine: MoteurRecommandation,
+    symptomes_use: List[str],
+    conditions_use: List[str],
+) -> Tuple[Set[str], Set[Tuple[str, str]]]:
+    checkpoint = engine.checkpoint()
+    try:
+        return _infer(engine, checkpoint, symptomes_use, conditions_use)
+    finally:
+        # Rend le moteur dans son état initial: seuls les faits de cette requête sont retirés
+        with metrics.stage("reset"):
+            engine.rollback(checkpoint)
+
+
+def _run(
+    snapshot: CatalogueSnapshot,
+    symptomes_use: List[str],
+    conditions_use: List[str],
+    engine: Optional[MoteurRecommandation] = None,
+) -> Tuple[Set[str], Set[Tuple[str, str]]]:
+    """Exécute le moteur configuré sur `snapshot`. `engine`: clone réutilisé entre appels (mode "experta")."""
+    if _DECIDE_ENGINE == "index":
+        with metrics.stage("index"):
+            return get_decision_index(snapshot).infer(symptomes_use, conditions_use)
+
+    pool = _ENGINE_POOL
+    if pool is not None:
+        waiting = time.perf_counter() if metrics.ENABLED else 0.0
+        with pool.engine() as pooled:
+            if waiting:
+                metrics.observe_stage("pool_wait", time.perf_counter() - waiting)
+            if pooled.snapshot is snapshot:
+                return _infer_and_rollback(pooled, symptomes_use, conditions_use)
+        # Pool pas encore remplacé après un rechargement: clone du bon snapshot ci-dessous
+
+    if engine is not None and engine.snapshot is snapshot:
+        return _infer_and_rollback(engine, symptomes_use, conditions_use)
+
+    # Copie du moteur compilé: les faits statiques sont déjà dans le réseau Rete
+    with metrics.stage("reset"):
+        engine = new_engine(snapshot)
+    return _infer(engine, engine.checkpoint(), symptomes_use, conditions_use)
+
+
+def _cache_key(prepared: Dict[str, Any], version: str) -> Tuple[str, Tuple[str, ...], Tuple[str, ...]]:
+    # Entrée canonique: normalisée, dédoublonnée, triée. La version du catalogue
+    # fait partie de la clé pour qu'un rechargement des données invalide le cache.
+    return (
+        version,
+        tuple(sorted(set(prepared["symptomes_utilises"]))),
+        tuple(sorted(set(prepared["conditions_utilisees"]))),
+    )
+
+
+def _decide_prepared(
+    prepared: Dict[str, Any],
+    snapshot: CatalogueSnapshot,
+    engine: Optional[MoteurRecommandation] = None,
+) -> Dict[str, Any]:
+    cache = _RESULT_CACHE
+    key = _cache_key(prepared, snapshot.version) if cache is not None else None
+
+    inferred = cache.get(key) if cache is not None else None
+    if inferred is None:
+        forbidden, matches = _run(snapshot, prepared["symptomes_utilises"], prepared["conditions_utilisees"], engine)
+        inferred = (frozenset(forbidden), frozenset(matches))
+        if cache is not None:
+            cache.set(key, inferred)
+
+    # La réponse est reconstruite à chaque appel: le bloc "input" reflète l'entrée brute de l'appelant
+    with metrics.stage("format"):
+        decision = _format_decision(prepared, inferred[0], inferred[1])
+
+    metrics.observe_decision(
+        _DECIDE_ENGINE,
+        len(decision["unknown_symptomes"]),
+        len(decision["unknown_conditions"]),
+        len(decision["recommendations"]),
+    )
+    return decision
+
+
+def decide(symptomes: List[str], conditions_medicales: Optional[List[str]] = None) -> Dict[str, Any]:
+    # Un seul snapshot pour toute la requête, même si le catalogue est rechargé pendant son traitement
+    snapshot = current_catalogue()
+    prepared = _prepare(symptomes, conditions_medicales, get_vocabulary(snapshot))
+    return _decide_prepared(prepared, snapshot)
+
+
+def decide_profiled(symptomes: List[str], conditions_medicales: Optional[List[str]] = None) -> Dict[str, Any]:
+    """
+    `decide` sur un clone Experta instrumenté, quel que soit le moteur configuré.
+
+    Sans cache: la réponse porte en plus une clé "profile" (voir
+    `logic.RuleProfiler.report`): activations et temps par règle, pic de
+    l'agenda, faits en mémoire de travail.
+    """
+    snapshot = current_catalogue()
+    prepared = _prepare(symptomes, conditions_medicales, get_vocabulary(snapshot))
+
+    engine = new_engine(snapshot)
+    profiler = engine.enable_profiling()
+    forbidden, matches = _infer(engine, engine.checkpoint(), prepared["symptomes_utilises"], prepared["conditions_utilisees"])
+
+    decision = _format_decision(prepared, forbidden, matches)
+    decision["profile"] = profiler.report()
+    return decision
+
+
+@contextmanager
+def batch_decider() -> Iterator[Callable[[List[str], Optional[List[str]]], Dict[str, Any]]]:
+    """
+    Fournit une fonction équivalente à `decide` pour traiter beaucoup de requêtes.
+
+    Tout le lot utilise le snapshot du catalogue courant à l'entrée du bloc et,
+    en mode "experta", un seul clone du moteur (remis à zéro par rétractation
+    entre deux requêtes). Une erreur sur une requête n'affecte pas les
+    suivantes: le clone fautif est simplement remplacé.
+    """
+    snapshot = current_catalogue()
+    vocabulary = get_vocabulary(snapshot)
+    engine: Optional[MoteurRecommandation] = None
+
+    def decide_one(symptomes: List[str], conditions_medicales: Optional[List[str]] = None) -> Dict[str, Any]:
+        nonlocal engine
+        prepared = _prepare(symptomes, conditions_medicales, vocabulary)
+
+        shared = engine
+        engine = None
+        if shared is None and _DECIDE_ENGINE == "experta":
+            shared = new_engine(snapshot)
+
+        decision = _decide_prepared(prepared, snapshot, shared)
+        engine = shared
+        return decision
+
+    yield decide_one
@@ -0,0 +1,376 @@
+"""sessions.py
+
+Sessions de décision incrémentales (POST /decide/sessions).
+
+Un client conversationnel ajoute les symptômes un par un: plutôt que de
+reposter toute la liste à /decide (clone du moteur et inférence complète à
+chaque étape), il ouvre une session qui garde un moteur Experta vivant et
+envoie des deltas (ajout/retrait de symptômes ou de conditions). Seuls les
+faits qui changent sont déclarés ou retirés.
+
+Experta n'a pas de maintien de vérité: un fait inféré reste en mémoire quand
+ses prémisses disparaissent. La session retire donc elle-même:
+- symptôme retiré: son `BesoinClient` et les `Recommandation` qui le couvrent
+- condition retirée: tous les `ProduitInterdit` (un même produit peut être
+  interdit par plusieurs conditions) et les `ConditionClient`, puis redéclare
+  les conditions restantes; l'anti-jointure de `generate_recommendation`
+  réactive les produits qui ne sont plus interdits
+- condition ajoutée: les `Recommandation` déjà inférées des produits devenus interdits
+
+La décision renvoyée est exactement celle de `service.decide` sur les listes
+de la session. Moteur "index": pas de moteur Experta, l'index recalcule la
+décision (quelques microsecondes). Moteur "pool": un clone dédié, comme
+"experta" (les moteurs du pool servent les requêtes sans état).
+
+Bornes (coût d'une session: voir `ENGINE_COST_KIB` et `ITEM_COST_KIB`):
+- `max_sessions` sessions au plus dans le processus: la moins récemment
+  utilisée est évincée au-delà. `configure(..., memory_mb=)` le réduit au
+  nombre de sessions pleines (`max_items`) qui tiennent dans ce budget
+- `max_per_user` sessions par utilisateur: la plus ancienne de l'utilisateur
+  est évincée à la création d'une nouvelle
+- `idle_timeout`: une session inutilisée expire
+- `max_items`: symptômes + conditions par session (`TooManyItems`)
+
+Les sessions vivent dans la mémoire du worker qui les a créées: avec
+plusieurs workers, le répartiteur doit router un client vers le même worker.
+Après un rechargement du catalogue, le moteur d'une session est reconstruit
+au delta suivant.
+"""
+
+from __future__ import annotations
+
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set
+
+import metrics
+import service
+from database import current_catalogue
+from fastpath import get_decision_index
+from logic import (
+    BesoinClient,
+    ConditionClient,
+    MoteurRecommandation,
+    ProduitInterdit,
+    Recommandation,
+    get_vocabulary,
+    new_engine,
+)
+
+
+# Coût mémoire d'une session (tracemalloc, catalogue actuel, moteur Experta):
+# le clone du moteur, puis les faits déclarés et inférés par symptôme ou condition
+ENGINE_COST_KIB = 200
+ITEM_COST_KIB = 10
+
+
+class TooManyItems(ValueError):
+    """Le delta dépasserait le nombre maximum de symptômes + conditions d'une session."""
+
+
+class DecisionSession:
+    """Listes de symptômes et de conditions d'un client, et moteur qui les reflète."""
+
+    def __init__(self, session_id: str, user_id: str, max_items: int = 50):
+        self.id = session_id
+        self.user_id = user_id
+        self.max_items = max_items
+        self.created_at = time.time()
+
+        # Entrée brute du client, dans l'ordre d'ajout (sans doublon après normalisation)
+        self.symptomes: List[str] = []
+        self.conditions: List[str] = []
+
+        # Sérialise les deltas d'une même session (appelés depuis le threadpool)
+        self.lock = threading.Lock()
+
+        self._engine: Optional[MoteurRecommandation] = None
+        self._checkpoint = 0
+        # Termes normalisés actuellement déclarés dans `_engine`
+        self._symptoms_in_engine: Set[str] = set()
+        self._conditions_in_engine: Set[str] = set()
+
+    def apply(
+        self,
+        add_symptomes: Iterable[str] = (),
+        remove_symptomes: Iterable[str] = (),
+        add_conditions: Iterable[str] = (),
+        remove_conditions: Iterable[str] = (),
+    ) -> Dict[str, Any]:
+        """Applique un delta et renvoie la décision (même format que `service.decide`)."""
+        with self.lock:
+            snapshot = current_catalogue()
+            vocabulary = get_vocabulary(snapshot)
+
+            def symptom_key(x: str) -> str:
+                return service._norm_symptome(x, vocabulary) if service._norm(x) else ""
+
+            symptomes = _edit(self.symptomes, add_symptomes, remove_symptomes, symptom_key)
+            conditions = _edit(self.conditions, add_conditions, remove_conditions, service._norm)
+            if len(symptomes) + len(conditions) > self.max_items:
+                raise TooManyItems(f"Too many items in session (max {self.max_items})")
+
+            prepared = service._prepare(symptomes, conditions, vocabulary)
+            if service._DECIDE_ENGINE == "index":
+                forbidden, matches = get_decision_index(snapshot).infer(
+                    prepared["symptomes_utilises"], prepared["conditions_utilisees"]
+                )
+            else:
+                try:
+                    forbidden, matches = self._sync(
+                        snapshot, set(prepared["symptomes_utilises"]), set(prepared["conditions_utilisees"])
+                    )
+                except BaseException:
+                    # État du moteur incertain: reconstruit entièrement au prochain delta
+                    self._engine = None
+                    raise
+
+            self.symptomes, self.conditions = symptomes, conditions
+            with metrics.stage("format"):
+                return service._format_decision(prepared, forbidden, matches)
+
+    def _sync(self, snapshot, symptoms: Set[str], conditions: Set[str]):
+        engine = self._engine
+        if engine is None or engine.snapshot is not snapshot:
+            with metrics.stage("reset"):
+                engine = new_engine(snapshot)
+            self._engine = engine
+            self._checkpoint = engine.checkpoint()
+            self._symptoms_in_engine = set()
+            self._conditions_in_engine = set()
+
+        term_ids = engine.symbols.term_ids
+        removed_s = self._symptoms_in_engine - symptoms
+        added_s = symptoms - self._symptoms_in_engine
+        removed_c = self._conditions_in_engine - conditions
+        added_c = conditions - self._conditions_in_engine
+
+        with metrics.stage("declare"):
+            if removed_s:
+                removed_ids = {term_ids.get(s) for s in removed_s}
+                self._retract(
+                    lambda f: (isinstance(f, BesoinClient) and f["symptome"] in removed_ids)
+                    or (isinstance(f, Recommandation) and f["cible"] in removed_ids)
+                )
+            if removed_c:
+                # Pas de lien ProduitInterdit -> condition: on repart des conditions restantes
+                self._retract(lambda f: isinstance(f, (ConditionClient, ProduitInterdit)))
+                added_c = conditions
+
+            # Symptômes d'abord, comme `service._infer`
+            for s in added_s:
+                engine.declare_need(s)
+            for c in added_c:
+                engine.declare_condition(c)
+
+        with metrics.stage("run"):
+            engine.run()
+
+        if added_c:
+            # Recommandations inférées avant que leur produit ne soit interdit
+            forbidden_ids = {f["produit"] for f in engine.facts_since(self._checkpoint) if isinstance(f, ProduitInterdit)}
+            self._retract(lambda f: isinstance(f, Recommandation) and f["nom"] in forbidden_ids)
+
+        self._symptoms_in_engine = symptoms
+        self._conditions_in_engine = conditions
+        with metrics.stage("collect"):
+            return service._collect(engine, self._checkpoint)
+
+    def _retract(self, predicate: Callable[[Any], bool]) -> None:
+        engine = self._engine
+        for fact in [f for f in engine.facts_since(self._checkpoint) if predicate(f)]:
+            engine.retract(fact)
+
+    def decision(self) -> Dict[str, Any]:
+        """Décision courante (delta vide: ne fait que reconstruire le moteur après un rechargement)."""
+        return self.apply()
+
+
+def _edit(current: List[str], add: Iterable[str], remove: Iterable[str], key: Callable[[str], str]) -> List[str]:
+    """`current` sans les éléments de `remove`, puis avec ceux de `add` absents (comparés après normalisation)."""
+    removed = {key(x) for x in remove}
+    out = [x for x in current if key(x) not in removed]
+    present = {key(x) for x in out}
+    for x in add:
+        k = key(x)
+        if k and k not in present:
+            out.append(x)
+            present.add(k)
+    return out
+
+
+class SessionStore:
+    """Sessions du processus, bornées en nombre (total et par utilisateur) et en inactivité."""
+
+    def __init__(
+        self,
+        max_sessions: int = 1000,
+        max_per_user: int = 3,
+        idle_timeout: float = 600.0,
+        max_items: int = 50,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if max_sessions < 1 or max_per_user < 1:
+            raise ValueError("max_sessions et max_per_user doivent être >= 1")
+
+        self.max_sessions = max_sessions
+        self.max_per_user = max_per_user
+        self.idle_timeout = idle_timeout
+        self.max_items = max_items
+        self._clock = clock
+        self._lock = threading.Lock()
+
+        # id -> (dernier accès, session), du moins au plus récemment utilisé
+        self._sessions: "OrderedDict[str, List[Any]]" = OrderedDict()
+        self._by_user: Dict[str, "OrderedDict[str, None]"] = {}
+
+        self._created = 0
+        self._expired = 0
+        self._evicted = 0
+
+    def _drop(self, session_id: str) -> None:
+        # Appelé sous self._lock
+        _, session = self._sessions.pop(session_id)
+        user_sessions = self._by_user.get(session.user_id)
+        if user_sessions is not None:
+            user_sessions.pop(session_id, None)
+            if not user_sessions:
+                del self._by_user[session.user_id]
+
+    def _purge_expired(self, now: float) -> None:
+        # Appelé sous self._lock. Ordre LRU: les sessions expirées sont en tête
+        while self._sessions:
+            session_id, (last_used, _) = next(iter(self._sessions.items()))
+            if now - last_used < self.idle_timeout:
+                break
+            self._drop(session_id)
+            self._expired += 1
+
+    def new_session(self, user_id: str) -> DecisionSession:
+        """Session aux bornes du magasin, pas encore enregistrée: le premier delta
+        peut être appliqué (et refusé) avant `add`, sans évincer de session."""
+        return DecisionSession(secrets.token_urlsafe(16), user_id, self.max_items)
+
+    def create(self, user_id: str) -> DecisionSession:
+        return self.add(self.new_session(user_id))
+
+    def add(self, session: DecisionSession) -> DecisionSession:
+        """Enregistre `session`, après éviction de la plus ancienne de l'utilisateur ou de la moins récemment utilisée."""
+        now = self._clock()
+        user_id = session.user_id
+        with self._lock:
+            self._purge_expired(now)
+
+            user_sessions = self._by_user.get(user_id)
+            while user_sessions and len(user_sessions) >= self.max_per_user:
+                self._drop(next(iter(user_sessions)))
+                self._evicted += 1
+            while len(self._sessions) >= self.max_sessions:
+                self._drop(next(iter(self._sessions)))
+                self._evicted += 1
+
+            self._sessions[session.id] = [now, session]
+            self._by_user.setdefault(user_id, OrderedDict())[session.id] = None
+            self._created += 1
+        return session
+
+    def get(self, session_id: str, user_id: str) -> Optional[DecisionSession]:
+        """Session `session_id` de `user_id` (None si inconnue, expirée ou d'un autre utilisateur)."""
+        now = self._clock()
+        with self._lock:
+            self._purge_expired(now)
+            entry = self._sessions.get(session_id)
+            if entry is None or entry[1].user_id != user_id:
+                return None
+            entry[0] = now
+            self._sessions.move_to_end(session_id)
+            self._by_user[user_id].move_to_end(session_id)
+            return entry[1]
+
+    def delete(self, session_id: str, user_id: str) -> bool:
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None or entry[1].user_id != user_id:
+                return False
+            self._drop(session_id)
+            return True
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._sessions)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._purge_expired(self._clock())
+            return {
+                "sessions": len(self._sessions),
+                "users": len(self._by_user),
+                "max_sessions": self.max_sessions,
+                "max_per_user": self.max_per_user,
+                "idle_timeout": self.idle_timeout,
+                "created": self._created,
+                "expired": self._expired,
+                "evicted": self._evicted,
+            }
+
+
+_STORE: Optional[SessionStore] = None
+
+
+def max_sessions_for(memory_mb: float, max_items: int) -> int:
+    """Nombre de sessions de `max_items` symptômes + conditions qui tiennent dans `memory_mb` Mio."""
+    return max(1, int(memory_mb * 1024 // (ENGINE_COST_KIB + ITEM_COST_KIB * max_items)))
+
+
+def configure(
+    max_sessions: int = 1000,
+    max_per_user: int = 3,
+    idle_timeout: float = 600.0,
+    max_items: int = 50,
+    memory_mb: Optional[float] = None,
+) -> SessionStore:
+    """Remplace le magasin de sessions (les sessions existantes sont abandonnées)."""
+    global _STORE
+    if memory_mb is not None:
+        max_sessions = min(max_sessions, max_sessions_for(memory_mb, max_items))
+    _STORE = SessionStore(max_sessions, max_per_user, idle_timeout, max_items)
+    return _STORE
+
+
+def get_session_store() -> SessionStore:
+    # Configuré au premier usage depuis les réglages si `configure` n'a pas été appelé
+    if _STORE is None:
+        from mongo import get_settings
+
+        s = get_settings()
+        configure(
+            s.DECISION_SESSION_MAX,
+            s.DECISION_SESSION_MAX_PER_USER,
+            s.DECISION_SESSION_IDLE_SECONDS,
+            s.DECISION_SESSION_MAX_ITEMS,
+            s.DECISION_SESSION_MEMORY_MB,
+        )
+    return _STORE
+
+
+def session_stats() -> Optional[Dict[str, Any]]:
+    store = _STORE
+    return store.stats() if store is not None else None
+
+
+def _stat(name: str):
+    def read() -> Optional[float]:
+        stats = session_stats()
+        return stats.get(name) if stats else None
+    return read
+
+
+for _metric, _name, _kind, _doc in (
+    ("decision_sessions", "sessions", "gauge", "Sessions de décision en mémoire."),
+    ("decision_sessions_created_total", "created", "counter", "Sessions de décision créées."),
+    ("decision_sessions_expired_total", "expired", "counter", "Sessions de décision expirées (inactivité)."),
+    ("decision_sessions_evicted_total", "evicted", "counter", "Sessions de décision évincées (limite totale ou par utilisateur)."),
+):
+    metrics.REGISTRY.register(metrics.CallbackMetric(_metric, _doc, _stat(_name), _kind))
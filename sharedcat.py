@@ -0,0 +1,337 @@
+"""sharedcat.py
+
+Index de décision du catalogue dans un fichier binaire projeté en mémoire
+(mmap, lecture seule), partagé par tous les workers d'une même machine.
+
+Un `fastpath.DecisionIndex` est fait de dicts, de frozensets et de chaînes
+Python: chaque worker en a sa copie, et même hérité par fork, les mises à
+jour de compteurs de références salissent les pages partagées. Ici les
+mêmes tables sont des tableaux d'entiers et des chaînes UTF-8 dans un
+fichier: les workers qui le projettent partagent les pages du cache du
+système, sans objet Python par entrée.
+
+Contenu (entiers uint32 little-endian, sections alignées sur 4 octets):
+- tables de chaînes triées (octets UTF-8): produits, symptômes, conditions,
+  chacune avec sa table de hachage (crc32, sondage linéaire) -> id, sans
+  dict par worker
+- symptôme -> produits et condition -> produits interdits, au format CSR
+  (tableau d'offsets par ligne + tableau d'ids de produits)
+
+Un fichier par version du catalogue (`decision-index-<version>.bin`), écrit
+de façon atomique par le premier processus qui en a besoin, ou à l'avance
+par `compile_catalogue.py`. Un worker encore sur l'ancienne version pendant
+un rechargement garde son fichier ouvert; après chaque écriture, seuls les deux
+segments les plus récents restent dans le répertoire (`prune_segments`).
+
+Désactivé par CATALOGUE_SHARED_INDEX=0: `fastpath.DecisionIndex` en mémoire.
+Le moteur Experta (réseau Rete) reste un graphe d'objets Python propre à
+chaque worker: seul le moteur "index" profite du partage.
+"""
+
+from __future__ import annotations
+
+import mmap
+import os
+import struct
+import zlib
+from array import array
+from contextlib import suppress
+from pathlib import Path
+from collections.abc import Mapping
+from typing import Dict, FrozenSet, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+from database import CatalogueSnapshot, current_catalogue
+
+
+ENABLED = os.environ.get("CATALOGUE_SHARED_INDEX", "1") != "0"
+_DIR = Path(os.environ.get("CATALOGUE_SHARED_DIR", str(Path(__file__).resolve().parent / ".cache")))
+
+_MAGIC = b"AJAIDX01"
+_SECTIONS = (
+    "products.offsets", "products.blob", "products.hash",
+    "symptoms.offsets", "symptoms.blob", "symptoms.hash",
+    "conditions.offsets", "conditions.blob", "conditions.hash",
+    "targets", "forbidden",
+)
+# magic, version (64 octets ASCII), puis (offset, longueur) de chaque section
+_HEADER = struct.Struct(f"<8s64s{2 * len(_SECTIONS)}I")
+_EMPTY = 0xFFFFFFFF
+
+# Segments gardés par répertoire après une écriture: la nouvelle version et la
+# précédente, encore ouverte par les workers pas encore rechargés (sinon chacun
+# réécrirait la sienne en ouvrant l'index)
+_KEEP_SEGMENTS = 2
+
+
+def segment_path(version: str, directory: Optional[Path] = None) -> Path:
+    return (directory or _DIR) / f"decision-index-{version}.bin"
+
+
+# --- Écriture ---
+
+def _string_table(strings: Iterable[str]) -> Tuple[List[str], List[bytes]]:
+    """Chaînes triées -> (chaînes, [offsets, blob UTF-8, table de hachage])."""
+    ordered = sorted(set(strings), key=lambda s: s.encode("utf-8"))
+    offsets = array("I", [0])
+    blob = bytearray()
+    for s in ordered:
+        blob += s.encode("utf-8")
+        offsets.append(len(blob))
+
+    # Au moins deux fois plus de cases que de chaînes (puissance de 2): sondages courts
+    slots = array("I", [_EMPTY]) * max(2, 1 << (2 * len(ordered) - 1).bit_length())
+    mask = len(slots) - 1
+    for i, s in enumerate(ordered):
+        h = zlib.crc32(s.encode("utf-8")) & mask
+        while slots[h] != _EMPTY:
+            h = (h + 1) & mask
+        slots[h] = i
+    return ordered, [offsets.tobytes(), bytes(blob), slots.tobytes()]
+
+
+def _csr(rows: Sequence[str], pairs: Iterable[Tuple[str, str]], product_ids: Dict[str, int]) -> bytes:
+    """Lignes `rows` -> ids de produits triés: [n+1 offsets][ids]."""
+    row_ids = {r: i for i, r in enumerate(rows)}
+    postings: List[Set[int]] = [set() for _ in rows]
+    for produit, key in pairs:
+        postings[row_ids[key]].add(product_ids[produit])
+
+    offsets = array("I", [0])
+    ids = array("I")
+    for products in postings:
+        ids.extend(sorted(products))
+        offsets.append(len(ids))
+    return offsets.tobytes() + ids.tobytes()
+
+
+def _pad(data: bytes) -> bytes:
+    return data + b"\0" * (-len(data) % 4)
+
+
+def build_segment(
+    version: str,
+    product_targets: Sequence[Tuple[str, str]],
+    contraindications: Sequence[Tuple[str, str]],
+) -> bytes:
+    """Contenu binaire du segment (voir le module) pour ces règles extraites."""
+    products, products_sections = _string_table(
+        [p for p, _ in product_targets] + [p for p, _ in contraindications]
+    )
+    symptoms, symptoms_sections = _string_table(s for _, s in product_targets)
+    conditions, conditions_sections = _string_table(c for _, c in contraindications)
+
+    product_ids = {p: i for i, p in enumerate(products)}
+    sections = [
+        *products_sections,
+        *symptoms_sections,
+        *conditions_sections,
+        _csr(symptoms, product_targets, product_ids),
+        _csr(conditions, contraindications, product_ids),
+    ]
+
+    table: List[int] = []
+    body = bytearray()
+    for data in sections:
+        table += [_HEADER.size + len(body), len(data)]
+        body += _pad(data)
+
+    header = _HEADER.pack(_MAGIC, version.encode("ascii"), *table)
+    return header + bytes(body)
+
+
+def write_segment(path: Path, data: bytes) -> bool:
+    # Écriture atomique (plusieurs workers peuvent écrire le même fichier en même temps)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp.write_bytes(data)
+        os.replace(tmp, path)
+        return True
+    except OSError:
+        return False
+    finally:
+        # Fichier temporaire laissé par une écriture interrompue (disque plein...)
+        with suppress(OSError):
+            tmp.unlink()
+
+
+def prune_segments(directory: Optional[Path] = None, keep: int = _KEEP_SEGMENTS) -> int:
+    """Supprime les segments au-delà des `keep` plus récents. Renvoie le nombre de fichiers supprimés.
+
+    Un worker qui projette encore un segment supprimé continue de le lire: le
+    fichier quitte le répertoire, pas la mémoire, jusqu'à la fermeture du mmap.
+    """
+    segments = []
+    for path in (directory or _DIR).glob("decision-index-*.bin"):
+        with suppress(OSError):
+            segments.append((path.stat().st_mtime_ns, path))
+    segments.sort(reverse=True)
+
+    removed = 0
+    for _, path in segments[keep:]:
+        try:
+            path.unlink()
+        except OSError:
+            continue
+        removed += 1
+    return removed
+
+
+# --- Lecture ---
+
+class StringTable:
+    """Chaînes d'un segment: `table[i]` -> chaîne, `table.find(s)` -> id ou None."""
+
+    def __init__(self, buf: mmap.mmap, offsets: memoryview, blob_start: int, slots: memoryview):
+        self._buf = buf
+        self._offsets = offsets
+        self._start = blob_start
+        self._slots = slots
+        self._mask = len(slots) - 1
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def _bytes(self, i: int) -> bytes:
+        # Le découpage d'un mmap renvoie directement des bytes (pas de vue intermédiaire)
+        start = self._start
+        return self._buf[start + self._offsets[i]:start + self._offsets[i + 1]]
+
+    def __getitem__(self, i: int) -> str:
+        start, offsets = self._start, self._offsets
+        return self._buf[start + offsets[i]:start + offsets[i + 1]].decode("utf-8")
+
+    def __iter__(self) -> Iterator[str]:
+        return (self[i] for i in range(len(self)))
+
+    def find(self, s: str) -> Optional[int]:
+        key = s.encode("utf-8")
+        slots, mask = self._slots, self._mask
+        h = zlib.crc32(key) & mask
+        while True:
+            i = slots[h]
+            if i == _EMPTY:
+                return None
+            if self._bytes(i) == key:
+                return i
+            h = (h + 1) & mask
+
+
+class _Postings:
+    """Table CSR: `postings[i]` -> ids de produits de la ligne i (vue, sans copie)."""
+
+    def __init__(self, data: memoryview, rows: int):
+        self._offsets = data[:rows + 1]
+        self._ids = data[rows + 1:]
+
+    def __getitem__(self, i: int) -> memoryview:
+        return self._ids[self._offsets[i]:self._offsets[i + 1]]
+
+
+class _PostingsMapping(Mapping):
+    """Vue `chaîne -> frozenset de produits` (comme les dicts de `DecisionIndex`), décodée à l'accès."""
+
+    def __init__(self, keys: StringTable, postings: _Postings, products: StringTable):
+        self._keys = keys
+        self._postings = postings
+        self._products = products
+
+    def __getitem__(self, key: str) -> FrozenSet[str]:
+        i = self._keys.find(key)
+        if i is None:
+            raise KeyError(key)
+        return frozenset(self._products[p] for p in self._postings[i])
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._keys)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+
+class SharedDecisionIndex:
+    """Même contrat que `fastpath.DecisionIndex`, lu dans un segment projeté en mémoire."""
+
+    def __init__(self, path: Path):
+        with path.open("rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.path = path
+
+        buf = memoryview(self._mmap)
+        magic, version, *table = _HEADER.unpack_from(buf)
+        if magic != _MAGIC:
+            raise ValueError(f"{path}: segment d'index invalide")
+        self.version = version.rstrip(b"\0").decode("ascii")
+
+        sections = {
+            name: buf[table[2 * i]:table[2 * i] + table[2 * i + 1]]
+            for i, name in enumerate(_SECTIONS)
+        }
+        def strings(name: str) -> StringTable:
+            blob_start = table[2 * _SECTIONS.index(f"{name}.blob")]
+            return StringTable(self._mmap, sections[f"{name}.offsets"].cast("I"), blob_start, sections[f"{name}.hash"].cast("I"))
+
+        self.products = strings("products")
+        self.symptoms = strings("symptoms")
+        self.conditions = strings("conditions")
+        self._targets = _Postings(sections["targets"].cast("I"), len(self.symptoms))
+        self._forbidden = _Postings(sections["forbidden"].cast("I"), len(self.conditions))
+
+        # Mêmes attributs que `DecisionIndex` (ex: `batch.CatalogueMatrix`)
+        self.products_by_symptom = _PostingsMapping(self.symptoms, self._targets, self.products)
+        self.forbidden_by_condition = _PostingsMapping(self.conditions, self._forbidden, self.products)
+
+    def infer(
+        self, symptomes_use: List[str], conditions_use: List[str]
+    ) -> Tuple[Set[str], Set[Tuple[str, str]]]:
+        """Même contrat que `service._infer`: (produits interdits, paires (produit, symptôme) recommandées)."""
+        forbidden_ids: Set[int] = set()
+        for c in conditions_use:
+            i = self.conditions.find(c)
+            if i is not None:
+                forbidden_ids.update(self._forbidden[i])
+
+        product = self.products.__getitem__
+        matches: Set[Tuple[str, str]] = set()
+        for s in symptomes_use:
+            i = self.symptoms.find(s)
+            if i is None:
+                continue
+            for p in self._targets[i]:
+                if p not in forbidden_ids:
+                    matches.add((product(p), s))
+
+        return {product(p) for p in forbidden_ids}, matches
+
+    def __reduce__(self):
+        # Picklé (artefact, pool de processus...): rouvert depuis le fichier
+        return (SharedDecisionIndex, (self.path,))
+
+
+def write_decision_index(snapshot: Optional[CatalogueSnapshot] = None, directory: Optional[Path] = None) -> Optional[Path]:
+    """Écrit le segment du snapshot (par défaut le catalogue courant). None si l'écriture échoue."""
+    from logic import extract_contraindications, extract_product_targets
+
+    snapshot = snapshot or current_catalogue()
+    path = segment_path(snapshot.version, directory)
+    data = build_segment(snapshot.version, extract_product_targets(snapshot), extract_contraindications(snapshot))
+    if not write_segment(path, data):
+        return None
+    prune_segments(directory)
+    return path
+
+
+def open_decision_index(snapshot: Optional[CatalogueSnapshot] = None, directory: Optional[Path] = None) -> Optional[SharedDecisionIndex]:
+    """Segment du snapshot, écrit s'il n'existe pas encore. None si impossible (disque en lecture seule...)."""
+    snapshot = snapshot or current_catalogue()
+    path = segment_path(snapshot.version, directory)
+    for attempt in range(2):
+        try:
+            index = SharedDecisionIndex(path)
+            if index.version == snapshot.version:
+                return index
+        except (OSError, ValueError, struct.error):
+            pass
+        if attempt == 0 and write_decision_index(snapshot, directory) is None:
+            return None
+    return None
@@ -1,12 +1,49 @@
+import random
 import unittest
 from logic import (
     extract_health_conditions_from_supplements,
     normalize_health_condition,
     match_symptoms_with_products,
     MoteurRecommandation,
-    Produit
+    Produit,
+    extract_contraindications,
+    extract_product_targets,
+    get_knowledge_base,
+    get_symbol_table,
+    get_vocabulary,
+    new_engine,
 )
-from database import CATALOGUE_COMPLET
+import asyncio
+import json
+import multiprocessing
+from datetime import datetime
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from unittest import mock
+from bson import ObjectId
+import database
+import jsonscan
+from database import CATALOGUE_COMPLET, CATALOGUE_PRODUITS, CONTRE_INDICATIONS, load_sheet_details
+from batch import decide_batch, get_catalogue_matrix
+from cache import TTLCache
+from fastpath import build_decision_index, get_decision_index
+from pool import EnginePool, PoolTimeout
+import service
+import sessions
+import benchmark
+import capture
+import hashjoin
+import memorydb
+import procpool
+import metrics
+import replay
+import security
+import sharedcat
+import usercache
+import users
 
 
 def _norm(s: str) -> str:
@@ -22,6 +59,31 @@ def _category_of_product(product_name: str) -> str:
     return ""
 
 
+def _api_client():
+    """Client HTTP branché directement sur l'application ASGI (sans serveur)"""
+    import httpx
+    import api
+
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=api.app), base_url="http://test")
+
+
+class _SettingsEnvMixin:
+    """Environnement minimal de mongo.Settings pour chaque test, paramètres relus au début et à la fin"""
+
+    ENV = {"MONGODB_URI": "mongodb://test.invalid", "JWT_SECRET": "test", "BCRYPT_ROUNDS": "4"}
+
+    def setUp(self):
+        from mongo import get_settings
+
+        super().setUp()
+        patcher = mock.patch.dict(os.environ, self.ENV)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        get_settings.cache_clear()
+        self.addCleanup(get_settings.cache_clear)
+        self.addCleanup(security.shutdown_password_hasher)
+
+
 class TestHealthConditionExtraction(unittest.TestCase):
     """Tests pour l'extraction des conditions de santé"""
 
@@ -144,6 +206,38 @@ class TestMatchSymptomsWithProducts(unittest.TestCase):
         self.assertEqual(len(result), 0, "Des produits ont été trouvés pour symptôme inconnu")
 
 
+class TestProductConditionIndex(unittest.TestCase):
+    """Tests pour l'index inversé condition -> produits utilisé par le matching"""
+
+    @staticmethod
+    def _brute_force(patient_symptoms):
+        """Ancien algorithme: parcours de tout le catalogue à chaque appel"""
+        wanted = {normalize_health_condition(s) for s in patient_symptoms if s.strip()}
+        out = {}
+        for product_name, raw_conditions in extract_health_conditions_from_supplements().items():
+            matched = {normalize_health_condition(c) for c in raw_conditions} & wanted
+            if matched:
+                out[product_name] = {
+                    "matched_symptoms": sorted(matched),
+                    "raw_conditions": raw_conditions,
+                    "score": len(matched),
+                }
+        return dict(sorted(out.items(), key=lambda x: (-x[1]["score"], x[0])))
+
+    def test_index_matches_full_scan_for_every_symptom(self):
+        """Vérifie l'équivalence avec un parcours complet, symptôme par symptôme"""
+        for symptom in sorted(get_vocabulary().known_symptoms):
+            result = match_symptoms_with_products([symptom])
+            self.assertEqual(result, self._brute_force([symptom]), symptom)
+            # L'ordre (score puis nom) fait partie du contrat
+            self.assertEqual(list(result), list(self._brute_force([symptom])))
+
+    def test_index_matches_full_scan_for_combinations(self):
+        """Vérifie l'équivalence avec un parcours complet pour plusieurs symptômes"""
+        for symptoms in (["Sommeil", "Dépression"], ["Fatigue", "Stress", "Anxiété"], ["Santé du sommeil", ""]):
+            self.assertEqual(list(match_symptoms_with_products(symptoms).items()), list(self._brute_force(symptoms).items()))
+
+
 class TestDataLoading(unittest.TestCase):
     """Tests pour le chargement des données"""
 
@@ -179,6 +273,52 @@ class TestDataLoading(unittest.TestCase):
                     self.assertIn("database", product, f"{product.get('name')} sans 'database'")
 
 
+class TestLazyCatalogue(unittest.TestCase):
+    """Tests pour la projection compacte et le chargement paresseux des fiches"""
+
+    def setUp(self):
+        self.sheet = next(s for s in CATALOGUE_COMPLET["complement_alimentaire"] if s["name"] == "5-HTP")
+        with self.sheet.path.open(encoding="utf-8") as f:
+            self.full = json.load(f)
+
+    def test_projection_keeps_engine_fields(self):
+        """Vérifie que les champs utilisés par le moteur sont identiques au JSON"""
+        self.assertEqual(self.sheet["safety"], self.full["safety"])
+        self.assertEqual(
+            [e["health_condition_or_goal"] for e in self.sheet["database"]],
+            [e["health_condition_or_goal"] for e in self.full["database"]],
+        )
+        self.assertNotIn("outcomes", self.sheet["database"][0])
+
+    def test_heavy_sections_load_on_access(self):
+        """Vérifie que les sections lourdes sont relues à la demande"""
+        load_sheet_details.cache_clear()
+        self.assertEqual(list(self.sheet), list(self.full))
+        self.assertEqual(self.sheet["references"], self.full["references"])
+        self.assertEqual(self.sheet.details(), self.full)
+        self.assertEqual(load_sheet_details.cache_info().currsize, 1)
+
+    def test_details_follow_file_changes(self):
+        """Vérifie qu'un JSON modifié sur disque n'est pas servi depuis une entrée lue avant"""
+        tmp = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, tmp, ignore_errors=True)
+        path = tmp / "fiche.json"
+        path.write_text(json.dumps({"name": "A", "faq": ["avant"]}), encoding="utf-8")
+        sheet = database.CatalogueSheet(path, {"name": "A", "faq": ["avant"]})
+        self.assertEqual(sheet["faq"], ["avant"])
+
+        path.write_text(json.dumps({"name": "A", "faq": ["après"]}), encoding="utf-8")
+        os.utime(path, ns=(path.stat().st_atime_ns, path.stat().st_mtime_ns + 1_000_000))
+        self.assertEqual(sheet["faq"], ["après"])
+
+    def test_details_cache_is_bounded(self):
+        """Vérifie que le cache des fiches complètes reste borné"""
+        for sheet in CATALOGUE_COMPLET["complement_alimentaire"]:
+            sheet.get("faq")
+        info = load_sheet_details.cache_info()
+        self.assertLessEqual(info.currsize, info.maxsize)
+
+
 class TestIntegrationScenarios(unittest.TestCase):
     """Tests d'intégration pour les scénarios complets"""
 
@@ -224,6 +364,1662 @@ class TestIntegrationScenarios(unittest.TestCase):
         self.assertGreaterEqual(first_product["score"], 1)
 
 
+def _facts_signature(engine):
+    """Représentation comparable des faits d'un moteur (sans les identifiants internes)."""
+    return sorted(
+        (type(f).__name__, tuple(sorted((k, v) for k, v in f.items() if not k.startswith("__"))))
+        for f in engine.facts.values()
+    )
+
+
+class TestCompiledKnowledgeBase(unittest.TestCase):
+    """Tests pour le moteur compilé une fois et cloné à chaque requête"""
+
+    def _run(self, engine, symptomes, conditions):
+        for s in symptomes:
+            engine.declare_need(s)
+        for c in conditions:
+            engine.declare_condition(c)
+        engine.run()
+        return _facts_signature(engine)
+
+    def test_clone_has_static_facts(self):
+        """Vérifie qu'un clone contient les mêmes faits qu'un reset() complet"""
+        fresh = MoteurRecommandation()
+        fresh.reset()
+        self.assertEqual(_facts_signature(new_engine()), _facts_signature(fresh))
+
+    def test_clone_matches_fresh_engine(self):
+        """Vérifie que le clone produit les mêmes faits inférés qu'un moteur neuf"""
+        scenarios = [
+            (["sommeil"], []),
+            (["fatigue", "stress"], ["grossesse"]),
+            (["dépression", "sommeil"], ["anticoagulants"]),
+        ]
+        for symptomes, conditions in scenarios:
+            fresh = MoteurRecommandation()
+            fresh.reset()
+            self.assertEqual(
+                self._run(new_engine(), symptomes, conditions),
+                self._run(fresh, symptomes, conditions),
+            )
+
+    def test_clone_does_not_touch_snapshot(self):
+        """Vérifie que l'exécution d'un clone ne modifie pas la base compilée"""
+        before = _facts_signature(get_knowledge_base())
+        self._run(new_engine(), ["sommeil"], ["grossesse"])
+        self.assertEqual(_facts_signature(get_knowledge_base()), before)
+
+    def test_symbol_table_round_trip(self):
+        """Vérifie que les faits statiques portent des ids qui redonnent les règles extraites"""
+        symbols = get_symbol_table()
+        self.assertEqual(
+            [(symbols.products[p], symbols.terms[t]) for p, t in symbols.product_targets],
+            extract_product_targets(),
+        )
+        self.assertEqual(
+            [(symbols.products[p], symbols.terms[c]) for p, c in symbols.contraindications],
+            extract_contraindications(),
+        )
+        for fact in get_knowledge_base().facts.values():
+            for k, v in fact.items():
+                if not k.startswith("__"):
+                    self.assertIsInstance(v, int, (type(fact).__name__, k))
+
+    def test_unknown_term_declares_nothing(self):
+        """Vérifie qu'un symptôme ou une condition hors catalogue ne crée aucun fait"""
+        engine = new_engine()
+        checkpoint = engine.checkpoint()
+        engine.declare_need("symptôme inconnu")
+        engine.declare_condition("condition inconnue")
+        self.assertEqual(engine.facts_since(checkpoint), [])
+
+
+class _PlainRete(MoteurRecommandation):
+    """Même moteur avec les jointures d'origine d'Experta (parcours complet des mémoires)."""
+
+    __matcher__ = hashjoin.ReteMatcher
+
+
+class TestHashJoins(unittest.TestCase):
+    """Tests pour les jointures Rete indexées par hachage (hashjoin.py)"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.plain = _PlainRete()
+        cls.plain.reset()
+
+    def _run(self, engine, symptomes, conditions):
+        for s in symptomes:
+            engine.declare_need(s)
+        for c in conditions:
+            engine.declare_condition(c)
+        engine.run()
+        return _facts_signature(engine)
+
+    def test_joins_are_indexed(self):
+        """Vérifie que les trois jointures des deux règles sont converties, sur leurs variables"""
+        engine = new_engine()
+        self.assertEqual(engine.matcher.indexed_joins, 3)
+        keys = set()
+        stack = [engine.matcher.root_node]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, (hashjoin.HashJoinNode, hashjoin.HashNotNode)):
+                keys.add((type(node).__name__, node.join_keys))
+            stack.extend(child.node for child in node.children)
+        self.assertEqual(keys, {("HashJoinNode", ("c",)), ("HashJoinNode", ("s",)), ("HashNotNode", ("p",))})
+
+    def test_matches_plain_rete(self):
+        """Vérifie les mêmes faits inférés qu'avec les jointures d'Experta, requête après requête"""
+        rng = random.Random(3)
+        symptomes = sorted(service._known_symptomes())
+        conditions = sorted(service._known_conditions())
+        for _ in range(25):
+            s = rng.sample(symptomes, rng.randint(1, 8))
+            c = rng.sample(conditions, rng.randint(0, 4))
+            self.assertEqual(self._run(new_engine(), s, c), self._run(self.plain.clone(), s, c), (s, c))
+
+    def test_retractions_match_plain_rete(self):
+        """Vérifie les retraits (jetons invalides, compteurs de l'anti-jointure) contre les jointures d'Experta"""
+        def scenario(engine):
+            checkpoint = engine.checkpoint()
+            engine.declare_need("sommeil")
+            engine.declare_condition("grossesse")
+            engine.run()
+            for fact in engine.facts_since(checkpoint):
+                if type(fact).__name__ in ("ConditionClient", "ProduitInterdit"):
+                    engine.retract(fact)
+            engine.run()
+            return _facts_signature(engine)
+
+        self.assertEqual(scenario(new_engine()), scenario(self.plain.clone()))
+
+    def test_clone_memories_are_independent(self):
+        """Vérifie qu'un clone ne partage aucune mémoire de jointure avec la base compilée"""
+        base = get_knowledge_base()
+        before = {
+            id(node): (len(node.left_memory), len(node.right_memory))
+            for node in self._hash_nodes(base)
+        }
+        self._run(new_engine(), ["sommeil", "fatigue"], ["grossesse"])
+        after = {id(node): (len(node.left_memory), len(node.right_memory)) for node in self._hash_nodes(base)}
+        self.assertEqual(after, before)
+
+    def test_unkeyed_tokens_fall_back_to_full_scan(self):
+        """Vérifie qu'un jeton sans clé (valeur non hachable) reste comparé à tous les autres"""
+        memory = hashjoin.JoinMemory(("c",))
+        hashable = hashjoin.TokenInfo([], {"c": 1})
+        self.assertEqual(memory.key_of({"c": 1}), (1,))
+        self.assertIsNone(memory.key_of({"c": [1]}))
+        self.assertIsNone(memory.key_of({}))
+
+        memory.add(hashable, (1,))
+        unkeyed = hashjoin.TokenInfo([], {"x": 2})
+        memory.add(unkeyed, None)
+        self.assertEqual({info for info, _ in memory.candidates((1,))}, {hashable, unkeyed})
+        self.assertEqual({info for info, _ in memory.candidates((2,))}, {unkeyed})
+        self.assertEqual({info for info, _ in memory.candidates(None)}, {hashable, unkeyed})
+
+        memory.remove(hashable, (1,))
+        self.assertEqual(len(memory), 1)
+        self.assertEqual(memory.buckets, {})
+
+    @staticmethod
+    def _hash_nodes(engine):
+        seen, stack = {}, [engine.matcher.root_node]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, (hashjoin.HashJoinNode, hashjoin.HashNotNode)):
+                seen[id(node)] = node
+            stack.extend(child.node for child in node.children)
+        return list(seen.values())
+
+
+class TestEnginePool(unittest.TestCase):
+    """Tests pour le pool de moteurs réutilisés entre requêtes"""
+
+    def tearDown(self):
+        service.configure(engine="experta")
+
+    def test_rollback_restores_snapshot(self):
+        """Vérifie que rollback() retire uniquement les faits de la requête"""
+        engine = new_engine()
+        before = _facts_signature(engine)
+        checkpoint = engine.checkpoint()
+        engine.declare_need("sommeil")
+        engine.declare_condition("grossesse")
+        engine.run()
+        self.assertNotEqual(_facts_signature(engine), before)
+        engine.rollback(checkpoint)
+        self.assertEqual(_facts_signature(engine), before)
+        self.assertEqual(engine.agenda.activations, [])
+
+    def test_pool_mode_matches_experta_mode(self):
+        """Vérifie que le mode pool donne les mêmes décisions, requête après requête"""
+        scenarios = [
+            (["Sommeil"], ["Grossesse"]),
+            (["Fatigue", "Stress"], []),
+            (["Sommeil"], []),
+            (["Dépression", "Sommeil"], ["Anticoagulants"]),
+        ]
+        expected = [service.decide(s, c) for s, c in scenarios]
+        service.configure(engine="pool", pool_size=1)
+        self.assertEqual([service.decide(s, c) for s, c in scenarios], expected)
+
+        stats = service.engine_stats()["pool"]
+        self.assertEqual(stats["created"], 1)
+        self.assertEqual(stats["hits"], len(scenarios))
+
+    def test_pool_timeout_when_exhausted(self):
+        """Vérifie qu'un emprunt échoue après le délai quand tous les moteurs sont pris"""
+        pool = EnginePool(new_engine, size=1, timeout=0.01)
+        with pool.engine():
+            with self.assertRaises(PoolTimeout):
+                with pool.engine():
+                    pass
+        self.assertEqual(pool.stats()["timeouts"], 1)
+        self.assertEqual(pool.stats()["waits"], 1)
+
+    def test_pool_recycles_engines(self):
+        """Vérifie qu'un moteur est recyclé après max_uses emprunts"""
+        pool = EnginePool(new_engine, size=1, max_uses=2)
+        for _ in range(3):
+            with pool.engine():
+                pass
+        self.assertEqual(pool.stats()["recycled"], 1)
+        self.assertEqual(pool.stats()["misses"], 2)
+
+
+class TestDecisionIndexDifferential(unittest.TestCase):
+    """Test différentiel: le moteur par index doit décider exactement comme Experta.
+
+    Une décision se décompose en produits interdits (qui ne dépendent que des
+    conditions) et en paires (produit, symptôme) filtrées par ces interdits.
+    Comparer chaque condition seule, chaque symptôme seul, puis chaque symptôme
+    associé à chaque condition tour à tour couvre toutes les combinaisons du catalogue.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.symptomes = sorted(service._known_symptomes())
+        cls.conditions = sorted(service._known_conditions())
+
+    def tearDown(self):
+        service.configure(engine="experta")
+
+    def _both(self, symptomes, conditions):
+        service.configure(engine="experta")
+        reference = service.decide(symptomes, conditions)
+        service.configure(engine="index")
+        return reference, service.decide(symptomes, conditions)
+
+    def test_index_covers_every_fact(self):
+        """Vérifie que l'index contient tous les symptômes et conditions connus du moteur"""
+        index = get_decision_index()
+        for s in self.symptomes:
+            self.assertIn(s, index.products_by_symptom)
+        for c in self.conditions:
+            self.assertIn(c, index.forbidden_by_condition)
+
+    def test_every_condition(self):
+        """Vérifie les produits interdits pour chaque condition du catalogue"""
+        for c in self.conditions:
+            reference, fast = self._both(["sommeil"], [c])
+            self.assertEqual(fast, reference, c)
+
+    def test_every_symptom(self):
+        """Vérifie les recommandations pour chaque symptôme du catalogue"""
+        for s in self.symptomes:
+            reference, fast = self._both([s], [])
+            self.assertEqual(fast, reference, s)
+
+    def test_symptom_condition_pairs(self):
+        """Vérifie chaque symptôme avec une condition, en parcourant toutes les conditions"""
+        for i, s in enumerate(self.symptomes):
+            c = self.conditions[i % len(self.conditions)]
+            reference, fast = self._both([s, "fatigue"], [c, "grossesse"])
+            self.assertEqual(fast, reference, (s, c))
+
+    def test_everything_at_once(self):
+        """Vérifie la décision avec tous les symptômes et toutes les conditions"""
+        reference, fast = self._both(self.symptomes, self.conditions)
+        self.assertEqual(fast, reference)
+
+
+class TestSharedDecisionIndex(unittest.TestCase):
+    """Tests pour l'index de décision projeté en mémoire (sharedcat.py)"""
+
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+        self.snapshot = database.current_catalogue()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def test_matches_dict_index(self):
+        """Vérifie que le segment donne les mêmes tables et décisions que DecisionIndex"""
+        shared = sharedcat.open_decision_index(self.snapshot, self.tmp)
+        reference = build_decision_index(self.snapshot)
+
+        self.assertIsInstance(shared, sharedcat.SharedDecisionIndex)
+        self.assertEqual(shared.version, self.snapshot.version)
+        self.assertEqual(dict(shared.products_by_symptom), reference.products_by_symptom)
+        self.assertEqual(dict(shared.forbidden_by_condition), reference.forbidden_by_condition)
+
+        rng = random.Random(7)
+        symptomes = sorted(reference.products_by_symptom)
+        conditions = sorted(reference.forbidden_by_condition)
+        for _ in range(300):
+            s = rng.sample(symptomes, rng.randint(0, 6)) + ["inconnu"]
+            c = rng.sample(conditions, rng.randint(0, 3)) + ["inconnue"]
+            self.assertEqual(shared.infer(s, c), reference.infer(s, c), (s, c))
+
+    def test_string_table_lookup(self):
+        """Vérifie la recherche d'id, chaînes accentuées et absentes comprises"""
+        data = sharedcat.build_segment("v1", [("Thé", "sommeil"), ("Café", "fatigue"), ("Thé", "été")], [("Café", "grossesse")])
+        path = self.tmp / "segment.bin"
+        self.assertTrue(sharedcat.write_segment(path, data))
+        index = sharedcat.SharedDecisionIndex(path)
+
+        self.assertEqual(list(index.symptoms), ["fatigue", "sommeil", "été"])
+        for i, s in enumerate(index.symptoms):
+            self.assertEqual(index.symptoms.find(s), i)
+        self.assertIsNone(index.symptoms.find("ete"))
+        self.assertIsNone(index.conditions.find(""))
+        self.assertEqual(index.infer(["sommeil", "fatigue"], ["grossesse"]), ({"Café"}, {("Thé", "sommeil")}))
+
+    def test_stale_or_corrupt_segment_is_rewritten(self):
+        """Vérifie qu'un fichier d'une autre version ou illisible est réécrit"""
+        path = sharedcat.segment_path(self.snapshot.version, self.tmp)
+        sharedcat.write_segment(path, sharedcat.build_segment("autre", [("Thé", "sommeil")], []))
+        self.assertEqual(sharedcat.open_decision_index(self.snapshot, self.tmp).version, self.snapshot.version)
+
+        path.write_bytes(b"pas un segment")
+        self.assertEqual(sharedcat.open_decision_index(self.snapshot, self.tmp).version, self.snapshot.version)
+
+    def test_failed_write_leaves_no_tmp(self):
+        """Vérifie qu'une écriture qui échoue ne laisse pas de fichier temporaire"""
+        path = self.tmp / "segment.bin"
+        path.mkdir()
+        self.assertFalse(sharedcat.write_segment(path, b"donnees"))
+        self.assertEqual([p.name for p in self.tmp.iterdir()], ["segment.bin"])
+
+    def test_old_segments_are_pruned(self):
+        """Vérifie que seuls les deux segments les plus récents restent, un segment supprimé restant lisible"""
+        for age, version in enumerate(("v3", "v2", "v1")):
+            path = sharedcat.segment_path(version, self.tmp)
+            sharedcat.write_segment(path, sharedcat.build_segment(version, [("Thé", "sommeil")], []))
+            os.utime(path, ns=(time.time_ns() - (age + 1) * 10**9,) * 2)
+        opened = sharedcat.SharedDecisionIndex(sharedcat.segment_path("v1", self.tmp))
+
+        sharedcat.write_decision_index(self.snapshot, self.tmp)
+        remaining = sorted(p.name for p in self.tmp.iterdir())
+        self.assertEqual(remaining, sorted(sharedcat.segment_path(v, self.tmp).name for v in ("v3", self.snapshot.version)))
+        self.assertEqual(opened.infer(["sommeil"], []), (set(), {("Thé", "sommeil")}))
+
+    def test_unwritable_directory_falls_back(self):
+        """Vérifie le repli sur DecisionIndex quand le segment ne peut pas être écrit"""
+        blocker = self.tmp / "fichier"
+        blocker.write_text("")
+        self.assertIsNone(sharedcat.open_decision_index(self.snapshot, blocker / "sous-dossier"))
+
+        current = self.snapshot
+        snapshot = database.CatalogueSnapshot({
+            "version": current.version,
+            "catalogue": current.catalogue,
+            "categories": current.categories,
+            "conditions": current.conditions,
+            "produits": current.produits,
+            "contres": current.contres,
+        })
+        with mock.patch.object(sharedcat, "_DIR", blocker / "sous-dossier"):
+            index = get_decision_index(snapshot)
+        self.assertNotIsInstance(index, sharedcat.SharedDecisionIndex)
+        self.assertEqual(index.infer(["sommeil"], []), build_decision_index(self.snapshot).infer(["sommeil"], []))
+
+
+class TestBatchScoring(unittest.TestCase):
+    """Tests pour le scoring matriciel d'un lot de patients"""
+
+    def test_decide_batch_matches_decide(self):
+        """Vérifie que decide_batch donne exactement les réponses de decide"""
+        rng = random.Random(42)
+        symptomes = sorted(service._known_symptomes())
+        conditions = sorted(service._known_conditions())
+        requests = [
+            (rng.sample(symptomes, rng.randint(0, 5)) + ["Inconnu"], rng.sample(conditions, rng.randint(0, 2)))
+            for _ in range(200)
+        ]
+        requests.append((["Sommeil", "sommeil"], None))
+
+        expected = [service.decide(s, c) for s, c in requests]
+        self.assertEqual(decide_batch(requests, chunk_size=64), expected)
+
+    def test_score_coverage_and_forbidden_mask(self):
+        """Vérifie la couverture et le masque interdit pour un patient"""
+        matrix = get_catalogue_matrix()
+        coverage, forbidden = matrix.score([["sommeil", "fatigue"]], [["grossesse"]])
+        decision = service.decide(["sommeil", "fatigue"], ["grossesse"])
+
+        self.assertEqual(coverage.shape, (1, len(matrix.products)))
+        self.assertEqual(
+            {matrix.products[p] for p in range(len(matrix.products)) if forbidden[0, p]},
+            set(decision["forbidden_products"]),
+        )
+        for reco in decision["recommendations"]:
+            self.assertEqual(coverage[0, matrix.product_ids[reco["produit"]]], reco["score"])
+
+
+class TestBatchDecider(unittest.TestCase):
+    """Tests pour le traitement en lot de /decide/batch"""
+
+    REQUESTS = [
+        (["Sommeil"], ["Grossesse"]),
+        (["Fatigue", "Stress"], []),
+        (["Sommeil"], None),
+        (["Dépression", "Sommeil"], ["Anticoagulants"]),
+    ]
+
+    def tearDown(self):
+        service.configure(engine="experta")
+
+    def test_batch_matches_decide_in_every_mode(self):
+        """Vérifie que le lot donne les réponses de decide, quel que soit le moteur"""
+        expected = [service.decide(s, c) for s, c in self.REQUESTS]
+        for engine in service.DECIDE_ENGINES:
+            service.configure(engine=engine, pool_size=1)
+            with service.batch_decider() as decide_one:
+                self.assertEqual([decide_one(s, c) for s, c in self.REQUESTS], expected, engine)
+
+    def test_error_does_not_break_batch(self):
+        """Vérifie qu'une requête en erreur n'affecte pas les suivantes"""
+        with service.batch_decider() as decide_one:
+            with self.assertRaises(TypeError):
+                decide_one(None, ["grossesse"])
+            self.assertEqual(decide_one(["Sommeil"], ["Grossesse"]), service.decide(["Sommeil"], ["Grossesse"]))
+
+    def test_internal_error_hides_detail(self):
+        """Vérifie qu'une erreur interne est journalisée sans renvoyer son message au client"""
+        import contextlib
+        import api
+
+        def broken(symptomes, conditions):
+            raise RuntimeError("chemin interne /srv/secret")
+
+        with mock.patch.object(api, "batch_decider", lambda: contextlib.nullcontext(broken)):
+            with self.assertLogs("api", level="ERROR") as logs:
+                lines = "".join(api._decide_batch_lines([{"symptomes": ["sommeil"]}]))
+        self.assertEqual(json.loads(lines), {"index": 0, "error": "internal_error"})
+        self.assertIn("chemin interne", "\n".join(logs.output))
+
+
+class TestTTLCache(unittest.TestCase):
+    """Tests pour le cache LRU + TTL"""
+
+    def setUp(self):
+        self.now = 0.0
+        self.cache = TTLCache(2, ttl=10, clock=lambda: self.now)
+
+    def test_lru_eviction(self):
+        """Vérifie l'éviction de l'entrée la moins récemment utilisée"""
+        self.cache.set("a", 1)
+        self.cache.set("b", 2)
+        self.cache.get("a")
+        self.cache.set("c", 3)
+        self.assertEqual(self.cache.get("a"), 1)
+        self.assertIsNone(self.cache.get("b"))
+        self.assertEqual(self.cache.stats()["evictions"], 1)
+
+    def test_ttl_expiration(self):
+        """Vérifie qu'une entrée expirée n'est plus servie"""
+        self.cache.set("a", 1)
+        self.now = 10.0
+        self.assertIsNone(self.cache.get("a"))
+        stats = self.cache.stats()
+        self.assertEqual((stats["expirations"], stats["misses"], stats["size"]), (1, 1, 0))
+
+
+class TestDecideResultCache(unittest.TestCase):
+    """Tests pour le cache de résultats devant decide"""
+
+    def setUp(self):
+        service.configure(engine="experta", cache_size=16)
+
+    def tearDown(self):
+        service.configure(engine="experta")
+
+    def test_canonical_inputs_share_an_entry(self):
+        """Vérifie que l'ordre, la casse et les doublons ne changent pas la clé"""
+        first = service.decide(["Sommeil", "Fatigue"], ["Grossesse"])
+        second = service.decide([" fatigue", "SOMMEIL", "sommeil"], ["grossesse"])
+
+        stats = service.engine_stats()["cache"]
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 1))
+        self.assertEqual(second["recommendations"], first["recommendations"])
+        self.assertEqual(second["forbidden_products"], first["forbidden_products"])
+        # Le bloc input reflète toujours l'entrée brute
+        self.assertEqual(second["input"]["symptomes"], [" fatigue", "SOMMEIL", "sommeil"])
+        self.assertEqual(second["input"]["symptomes_utilises"], ["fatigue", "sommeil", "sommeil"])
+
+    def test_cached_decision_equals_uncached(self):
+        """Vérifie qu'une réponse servie par le cache est identique à un calcul complet"""
+        service.decide(["Dépression"], ["Anticoagulants"])
+        cached = service.decide(["Dépression"], ["Anticoagulants"])
+        service.configure(engine="experta")
+        self.assertEqual(cached, service.decide(["Dépression"], ["Anticoagulants"]))
+
+    def test_catalogue_version_is_part_of_key(self):
+        """Vérifie qu'un changement de version du catalogue invalide les entrées"""
+        service.decide(["Sommeil"])
+        current = database.current_catalogue()
+        other = database.CatalogueSnapshot({
+            "version": "autre-version",
+            "catalogue": current.catalogue,
+            "categories": current.categories,
+            "conditions": current.conditions,
+            "produits": current.produits,
+            "contres": current.contres,
+        })
+        with mock.patch.object(service, "current_catalogue", return_value=other):
+            service.decide(["Sommeil"])
+        self.assertEqual(service.engine_stats()["cache"]["misses"], 2)
+
+
+class TestVocabulary(unittest.TestCase):
+    """Tests pour le vocabulaire précalculé du catalogue"""
+
+    def test_known_symptoms_match_catalogue(self):
+        """Vérifie les symptômes connus contre un recalcul complet du catalogue"""
+        expected = {normalize_health_condition(p["cible"]) for p in CATALOGUE_PRODUITS if p.get("cible")}
+        self.assertEqual(get_vocabulary().known_symptoms, expected)
+
+    def test_known_conditions_match_catalogue(self):
+        """Vérifie les conditions connues contre un recalcul complet du catalogue"""
+        expected = {c["condition"].strip().lower() for c in CONTRE_INDICATIONS if c.get("condition")}
+        self.assertEqual(get_vocabulary().known_conditions, expected)
+
+    def test_normalize_table_matches_function(self):
+        """Vérifie que la table de normalisation équivaut à normalize_health_condition"""
+        vocabulary = get_vocabulary()
+        for raw, normalized in vocabulary.normalized.items():
+            self.assertEqual(normalized, normalize_health_condition(raw))
+        self.assertEqual(vocabulary.normalize("Santé du coeur"), "coeur")
+
+    def test_vocabulary_is_built_once(self):
+        """Vérifie que le vocabulaire n'est pas reconstruit d'une requête à l'autre"""
+        self.assertIs(get_vocabulary(), get_vocabulary())
+
+
+class TestCompiledCatalogueArtifact(unittest.TestCase):
+    """Tests pour l'artefact compilé du catalogue (démarrage à froid)"""
+
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+        self.data_dir = self.tmp / "data"
+        shutil.copytree(database._DATA_DIR / "categories", self.data_dir / "categories")
+        shutil.copytree(database._DATA_DIR / "conditions", self.data_dir / "conditions")
+        (self.data_dir / "supplements").mkdir()
+        src = sorted((database._DATA_DIR / "supplements").glob("*.json"))[0]
+        self.sheet_path = self.data_dir / "supplements" / src.name
+        shutil.copy(src, self.sheet_path)
+        self.cache_path = self.tmp / "catalogue.pickle"
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def test_unpicklable_artifact_leaves_no_tmp(self):
+        """Vérifie qu'un artefact non sérialisable est ignoré sans laisser de fichier temporaire"""
+        self.assertFalse(database._write_artifact(self.cache_path, {"index": lambda: None}))
+        self.assertEqual(list(self.tmp.glob("*.tmp")), [])
+        self.assertFalse(self.cache_path.exists())
+
+    def test_artifact_round_trip(self):
+        """Vérifie que le catalogue relu depuis l'artefact est identique à celui des JSON"""
+        compiled, source = database._load_compiled(self.data_dir, self.cache_path)
+        self.assertEqual(source, "json")
+        reloaded, source = database._load_compiled(self.data_dir, self.cache_path)
+        self.assertEqual(source, "artifact")
+
+        self.assertEqual(reloaded["version"], compiled["version"])
+        self.assertEqual(reloaded["produits"], compiled["produits"])
+        self.assertEqual(reloaded["contres"], compiled["contres"])
+        self.assertEqual(reloaded["conditions"], compiled["conditions"])
+        for category, sheets in compiled["catalogue"].items():
+            self.assertEqual([dict(s) for s in reloaded["catalogue"][category]], [dict(s) for s in sheets])
+
+    def test_modified_json_rebuilds_artifact(self):
+        """Vérifie qu'un JSON modifié invalide l'artefact"""
+        compiled, _ = database._load_compiled(self.data_dir, self.cache_path)
+        sheet = json.loads(self.sheet_path.read_text(encoding="utf-8"))
+        sheet["name"] = "Produit renommé"
+        self.sheet_path.write_text(json.dumps(sheet), encoding="utf-8")
+
+        rebuilt, source = database._load_compiled(self.data_dir, self.cache_path)
+        self.assertEqual(source, "json")
+        self.assertNotEqual(rebuilt["version"], compiled["version"])
+        self.assertEqual(rebuilt["catalogue"]["complement_alimentaire"][0]["name"], "Produit renommé")
+
+    def test_touched_json_keeps_artifact(self):
+        """Vérifie qu'un simple changement de date (contenu identique) garde l'artefact"""
+        database._load_compiled(self.data_dir, self.cache_path)
+        st = self.sheet_path.stat()
+        os.utime(self.sheet_path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+
+        _, source = database._load_compiled(self.data_dir, self.cache_path)
+        self.assertEqual(source, "artifact")
+
+    def test_corrupted_artifact_is_ignored(self):
+        """Vérifie qu'un artefact illisible est reconstruit depuis les JSON"""
+        self.cache_path.write_bytes(b"pas un pickle")
+        _, source = database._load_compiled(self.data_dir, self.cache_path)
+        self.assertEqual(source, "json")
+
+
+class TestSelectiveJsonLoader(unittest.TestCase):
+    """Tests pour la lecture sélective des fiches JSON"""
+
+    def test_compile_paths(self):
+        """Vérifie l'arbre de sélection construit depuis les chemins"""
+        spec = jsonscan.compile_paths(["name", "database[*].health_condition_or_goal", "safety", "safety.interactions"])
+        self.assertEqual(spec, {"name": True, "database": {"*": {"health_condition_or_goal": True}}, "safety": True})
+
+    def test_matches_full_load_on_catalogue(self):
+        """Vérifie que la projection sélective égale la projection d'un json.load complet, fiche par fiche"""
+        for path in sorted(database._DATA_DIR.rglob("*.json")):
+            full = json.loads(path.read_text(encoding="utf-8"))
+            selected, keys = jsonscan.load_selected(path, database._SHEET_SPEC)
+            self.assertEqual(keys, tuple(full), path.name)
+            self.assertEqual(database._project_sheet(selected), database._project_sheet(full), path.name)
+
+    def test_skipped_sections_with_tricky_strings(self):
+        """Vérifie le saut de sections contenant crochets, guillemets échappés et unicode"""
+        doc = {
+            "references": [{"title": 'a "quoted" ] } [ {', "n": [1, 2.5e3, None, True]}, "\\", "é\u00e9"],
+            "name": "Produit",
+            "database": [{"health_condition_or_goal": "Sommeil", "results": [{"x": "]"}]}, {"other": 1}],
+            "empty": {},
+        }
+        selected, keys = jsonscan.loads_selected(json.dumps(doc, indent=2), database._SHEET_SPEC)
+        self.assertEqual(keys, ("references", "name", "database", "empty"))
+        self.assertEqual(selected, {"name": "Produit", "database": [{"health_condition_or_goal": "Sommeil"}, {}]})
+
+    def test_invalid_json_raises(self):
+        """Vérifie qu'une structure invalide lève une JSONDecodeError"""
+        for text in ('{"name": "x",}', '{"name" "x"}', '{"references": [1, 2', '["pas un objet"]', '{"name": "x"} extra'):
+            with self.assertRaises(json.JSONDecodeError, msg=text):
+                jsonscan.loads_selected(text, database._SHEET_SPEC)
+
+
+class TestParallelCatalogueLoading(unittest.TestCase):
+    """Tests pour le chargement parallèle de data/"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.sequential = database._compile_from_json(database._DATA_DIR, workers=1)
+
+    def _assert_same_catalogue(self, compiled):
+        for key in ("version", "produits", "contres", "categories", "conditions"):
+            self.assertEqual(compiled[key], self.sequential[key], key)
+        for category, sheets in self.sequential["catalogue"].items():
+            self.assertEqual([s.path for s in compiled["catalogue"][category]], [s.path for s in sheets])
+            self.assertEqual([dict(s) for s in compiled["catalogue"][category]], [dict(s) for s in sheets])
+
+    def test_thread_pool_matches_sequential(self):
+        """Vérifie que la fusion en parallèle (threads) garde l'ordre et le contenu séquentiels"""
+        with mock.patch.object(database, "_LOAD_EXECUTOR", "thread"):
+            self._assert_same_catalogue(database._compile_from_json(database._DATA_DIR, workers=4))
+
+    def test_process_pool_matches_sequential(self):
+        """Vérifie que la fusion en parallèle (processus) garde l'ordre et le contenu séquentiels"""
+        with mock.patch.object(database, "_LOAD_EXECUTOR", "process"):
+            self._assert_same_catalogue(database._compile_from_json(database._DATA_DIR, workers=3))
+
+    def test_reload_never_forks(self):
+        """Vérifie qu'un rechargement lit data/ avec des threads, même si CATALOGUE_LOAD_EXECUTOR=process"""
+        tmp = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, tmp, ignore_errors=True)
+        shutil.copytree(database._DATA_DIR / "supplements", tmp / "supplements")
+        store = database.CatalogueStore(tmp, tmp / "catalogue.pickle")
+
+        with mock.patch.multiple(database, _LOAD_EXECUTOR="process", _LOAD_WORKERS=2, _CACHE_ENABLED=False), \
+                mock.patch.object(database, "ProcessPoolExecutor", side_effect=AssertionError("fork")):
+            self.assertTrue(store.reload(force=True))
+
+    def test_timings_cover_every_file(self):
+        """Vérifie qu'une durée est rapportée pour chaque JSON lu"""
+        timings = self.sequential["file_timings"]
+        expected = sorted(p.relative_to(database._DATA_DIR).as_posix() for p in database._DATA_DIR.rglob("*.json"))
+        self.assertEqual(sorted(t["file"] for t in timings), expected)
+        self.assertTrue(all(t["seconds"] >= 0 and t["bytes"] > 0 for t in timings))
+        slowest = database.slowest_files(timings, 3)
+        self.assertEqual(len(slowest), 3)
+        self.assertGreaterEqual(slowest[0]["seconds"], slowest[-1]["seconds"])
+
+    def test_invalid_file_is_named(self):
+        """Vérifie qu'un JSON invalide lu par un worker est signalé avec son chemin"""
+        tmp = Path(tempfile.mkdtemp())
+        try:
+            (tmp / "supplements").mkdir()
+            (tmp / "supplements" / "a.json").write_text('{"name": "A"}', encoding="utf-8")
+            (tmp / "supplements" / "b.json").write_text('{"name": ', encoding="utf-8")
+            with mock.patch.object(database, "_LOAD_EXECUTOR", "thread"):
+                with self.assertRaisesRegex(ValueError, "b.json"):
+                    database._compile_from_json(tmp, workers=2)
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+
+class TestCatalogueReload(unittest.TestCase):
+    """Tests pour le rechargement à chaud du catalogue"""
+
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+        self.data_dir = self.tmp / "data"
+        (self.data_dir / "supplements").mkdir(parents=True)
+        src = sorted((database._DATA_DIR / "supplements").glob("*.json"))[0]
+        self.sheet_path = self.data_dir / "supplements" / src.name
+        shutil.copy(src, self.sheet_path)
+        self.store = database.CatalogueStore(self.data_dir, self.tmp / "catalogue.pickle")
+
+    def tearDown(self):
+        self.store.stop_watching()
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def _rename_product(self, name):
+        sheet = json.loads(self.sheet_path.read_text(encoding="utf-8"))
+        sheet["name"] = name
+        self.sheet_path.write_text(json.dumps(sheet), encoding="utf-8")
+
+    def _product_name(self, snapshot):
+        return snapshot.catalogue["complement_alimentaire"][0]["name"]
+
+    def test_unchanged_data_is_not_reloaded(self):
+        """Vérifie qu'aucun snapshot n'est publié si data/ n'a pas changé"""
+        before = self.store.current()
+        self.assertFalse(self.store.reload())
+        self.assertIs(self.store.current(), before)
+
+    def test_reload_swaps_snapshot(self):
+        """Vérifie qu'un JSON modifié publie un nouveau snapshot sans toucher à l'ancien"""
+        before = self.store.current()
+        old_name = self._product_name(before)
+        self._rename_product("Produit renommé")
+
+        self.assertTrue(self.store.reload())
+        after = self.store.current()
+        self.assertEqual(after.generation, before.generation + 1)
+        self.assertNotEqual(after.version, before.version)
+        self.assertEqual(self._product_name(after), "Produit renommé")
+        # Un traitement qui tient encore l'ancien snapshot le voit inchangé
+        self.assertEqual(self._product_name(before), old_name)
+
+        stats = self.store.stats()
+        self.assertEqual((stats["version"], stats["reloads"]), (after.version, 1))
+        self.assertIsNotNone(stats["last_reload_duration_s"])
+
+    def test_derived_values_are_per_snapshot(self):
+        """Vérifie que le vocabulaire est reconstruit pour le nouveau snapshot uniquement"""
+        before = self.store.current()
+        vocabulary = get_vocabulary(before)
+        self._rename_product("Produit renommé")
+        self.store.reload()
+
+        self.assertIs(get_vocabulary(before), vocabulary)
+        self.assertEqual(get_vocabulary(self.store.current()).version, self.store.current().version)
+
+    def test_failed_warmup_keeps_current_snapshot(self):
+        """Vérifie qu'un échec de préparation laisse l'ancien snapshot en place"""
+        before = self.store.current()
+
+        def broken(snapshot):
+            raise RuntimeError("index invalide")
+
+        self.store.add_warmup(broken)
+        self._rename_product("Produit renommé")
+        with self.assertRaises(RuntimeError):
+            self.store.reload()
+
+        self.assertIs(self.store.current(), before)
+        stats = self.store.stats()
+        self.assertEqual((stats["reloads"], stats["reload_failures"]), (0, 1))
+        self.assertIn("index invalide", stats["last_error"])
+
+    def test_subscribers_see_new_snapshot(self):
+        """Vérifie que les abonnés sont notifiés après publication"""
+        seen = []
+        self.store.subscribe(lambda snapshot: seen.append(snapshot is self.store.current()))
+        self.store.reload(force=True)
+        self.assertEqual(seen, [True])
+
+    def test_watcher_reloads_on_change(self):
+        """Vérifie que la scrutation de data/ recharge automatiquement"""
+        self.store.start_watching(0.02)
+        self._rename_product("Produit renommé")
+
+        deadline = time.monotonic() + 5
+        while self.store.current().generation == 1 and time.monotonic() < deadline:
+            time.sleep(0.02)
+        self.assertEqual(self._product_name(self.store.current()), "Produit renommé")
+
+
+class TestCatalogueReloadEndpoint(_SettingsEnvMixin, unittest.TestCase):
+    """Tests pour POST /admin/catalogue/reload"""
+
+    def setUp(self):
+        super().setUp()
+        usercache.configure("off")
+        self.addCleanup(usercache.configure, None)
+
+    def test_failure_hides_detail(self):
+        """Vérifie qu'un échec de rechargement est journalisé sans renvoyer son message au client"""
+        import api
+        from mongo import get_db
+
+        db = memorydb.InMemoryDatabase()
+        api.app.dependency_overrides[get_db] = lambda: db
+        self.addCleanup(api.app.dependency_overrides.pop, get_db, None)
+
+        async def scenario():
+            async with _api_client() as client:
+                signup = await client.post("/auth/signup", json={"email": "admin@example.com", "password": "motdepasse"})
+                await db.users.update_one({"email": "admin@example.com"}, {"$set": {"role": "admin"}})
+                headers = {"Authorization": f"Bearer {signup.json()['access_token']}"}
+                return await client.post("/admin/catalogue/reload", headers=headers)
+
+        broken = mock.patch.object(database.get_catalogue_store(), "reload", side_effect=RuntimeError("/srv/secret"))
+        with broken, self.assertLogs("api", level="ERROR") as logs:
+            response = asyncio.run(scenario())
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(response.json(), {"detail": "Catalogue reload failed"})
+        self.assertIn("/srv/secret", "\n".join(logs.output))
+
+
+class TestServiceCatalogueReload(unittest.TestCase):
+    """Tests pour decide pendant un rechargement du catalogue"""
+
+    def tearDown(self):
+        service.configure(engine="experta")
+
+    def test_pool_is_replaced_on_reload(self):
+        """Vérifie que le pool est reconstruit sur le nouveau snapshot et que decide reste identique"""
+        expected = service.decide(["Sommeil", "Fatigue"], ["Grossesse"])
+        service.configure(engine="pool", pool_size=2)
+        old_pool = service._ENGINE_POOL
+
+        self.assertTrue(database.reload_catalogue(force=True))
+        self.assertIsNot(service._ENGINE_POOL, old_pool)
+        with service._ENGINE_POOL.engine() as engine:
+            self.assertIs(engine.snapshot, database.current_catalogue())
+        self.assertEqual(service.decide(["Sommeil", "Fatigue"], ["Grossesse"]), expected)
+
+    def test_stale_engine_is_not_used(self):
+        """Vérifie qu'un moteur d'un ancien snapshot n'est pas utilisé pour le nouveau"""
+        stale = new_engine()
+        database.reload_catalogue(force=True)
+        snapshot = database.current_catalogue()
+
+        with mock.patch.object(stale, "run", side_effect=AssertionError("moteur périmé")):
+            forbidden, matches = service._run(snapshot, ["sommeil"], [], stale)
+        self.assertTrue(matches)
+
+
+class TestBenchmarkHarness(unittest.TestCase):
+    """Tests pour les outils de benchmark.py (sans lancer les mesures)"""
+
+    def test_compare_flags_only_regressions(self):
+        """Vérifie qu'une hausse au-delà du seuil est signalée, pas une baisse ni une métrique nouvelle"""
+        baseline = {"results": {"x1": {"decide.p50_ms": 10.0, "import.p50_ms": 100.0}}}
+        current = {"results": {"x1": {"decide.p50_ms": 13.0, "import.p50_ms": 50.0, "nouvelle.p50_ms": 1.0}}}
+        regressions = benchmark.compare(current, baseline, threshold=0.25)
+        self.assertEqual([(r["scale"], r["metric"]) for r in regressions], [("x1", "decide.p50_ms")])
+        self.assertEqual(benchmark.compare(current, baseline, threshold=0.5), [])
+
+    def test_synthetic_catalogue_scales_products(self):
+        """Vérifie qu'un catalogue synthétique 2x double les fiches, avec des noms distincts"""
+        tmp = Path(tempfile.mkdtemp())
+        try:
+            target = benchmark.build_synthetic_catalogue(2, tmp / "data")
+            original = list((database._DATA_DIR / "diets").glob("*.json"))
+            copies = sorted((target / "diets").glob("*.json"))
+            self.assertEqual(len(copies), 2 * len(original))
+            names = [json.loads(p.read_text(encoding="utf-8"))["name"] for p in copies]
+            self.assertEqual(len(set(names)), len(names))
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+
+class TestDecideCapture(unittest.TestCase):
+    """Tests pour la capture anonymisée des requêtes /decide (capture.py)"""
+
+    def test_anonymize_keeps_only_known_terms(self):
+        """Vérifie que les termes hors catalogue sont masqués et les autres champs supprimés"""
+        payload = {
+            "symptomes": [" Sommeil ", "jean dupont, 12 rue x", ""],
+            "conditions_medicales": ["Grossesse", "mon diagnostic"],
+            "email": "a@b.c",
+        }
+        out = capture.anonymize_decide_payload(payload)
+        self.assertEqual(out, {
+            "symptomes": ["sommeil", capture.UNKNOWN_TERM],
+            "conditions_medicales": ["grossesse", capture.UNKNOWN_TERM],
+        })
+        self.assertIsNone(capture.anonymize_decide_payload({"conditions_medicales": []}))
+
+    def test_writer_appends_jsonl_and_skips_invalid_bodies(self):
+        """Vérifie que le writer écrit un enregistrement JSONL par corps exploitable"""
+        tmp = Path(tempfile.mkdtemp())
+        try:
+            writer = capture.CaptureWriter(tmp / "sub" / "decide.jsonl")
+            writer.submit("/decide", json.dumps({"symptomes": ["sommeil"]}).encode(), 200, 0.002)
+            writer.submit("/decide", b"{pas du json", 422, 0.001)
+            writer.close()
+
+            records = replay.load_capture(tmp / "sub" / "decide.jsonl")
+            self.assertEqual(len(records), 1)
+            self.assertEqual(records[0]["status"], 200)
+            self.assertEqual(records[0]["body"], {"symptomes": ["sommeil"], "conditions_medicales": []})
+            self.assertEqual(writer.stats()["skipped"], 1)
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+
+class TestReplay(unittest.TestCase):
+    """Tests pour l'outil de rejeu de charge (replay.py)"""
+
+    def test_replay_captured_traffic(self):
+        """Vérifie qu'une capture se rejoue sans erreur, avec un rapport par endpoint"""
+        tmp = Path(tempfile.mkdtemp())
+        try:
+            path = tmp / "decide.jsonl"
+            records = [
+                {"t": i * 0.001, "method": "POST", "path": "/decide", "status": 200, "body": body}
+                for i, body in enumerate(replay.synthetic_decide_bodies(10, seed=3))
+            ]
+            path.write_text("".join(json.dumps(r) + "\n" for r in records), encoding="utf-8")
+
+            with mock.patch.dict(os.environ, {"MONGODB_URI": "mongodb://replay.invalid", "JWT_SECRET": "test"}):
+                report = asyncio.run(replay.run(path, concurrency=4, mix={"decide": 3, "me": 1}, users=1))
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+        self.assertEqual(report["total"]["errors"], 0)
+        # Les comptes sont créés avant la mesure: pas de signup dans le rapport
+        self.assertNotIn("POST /auth/signup", report["endpoints"])
+        self.assertEqual(report["total"]["requests"], 10)
+        self.assertIn("p99_ms", report["endpoints"]["POST /decide"])
+
+
+class TestDecideMetrics(unittest.TestCase):
+    """Tests pour l'instrumentation de /decide (metrics.py)"""
+
+    def setUp(self):
+        metrics.reset()
+        metrics.configure(True)
+        service.configure(engine="experta", cache_size=0)
+
+    def tearDown(self):
+        metrics.configure(True)
+
+    def _count(self, text, series):
+        line = next(l for l in text.splitlines() if l.startswith(series + " "))
+        return float(line.split()[-1])
+
+    def test_decide_records_stages_and_counters(self):
+        """Vérifie que chaque étape du moteur est mesurée et que les compteurs suivent la décision"""
+        decision = service.decide(["sommeil", "symptome inexistant"], ["condition inexistante"])
+        text = metrics.render()
+
+        for stage in ("normalize", "reset", "declare", "run", "collect", "format"):
+            self.assertEqual(self._count(text, f'decide_stage_seconds_count{{stage="{stage}"}}'), 1, stage)
+        self.assertEqual(self._count(text, 'decide_decisions_total{engine="experta"}'), 1)
+        self.assertEqual(self._count(text, "decide_unknown_symptoms_total"), 1)
+        self.assertEqual(self._count(text, "decide_unknown_conditions_total"), 1)
+        self.assertEqual(self._count(text, "decide_recommendations_total"), len(decision["recommendations"]))
+
+    def test_histogram_buckets_are_cumulative(self):
+        """Vérifie le format Prometheus: buckets cumulés, +Inf égal au nombre d'observations"""
+        for seconds in (0.00001, 0.003, 10.0):
+            metrics.observe_stage("run", seconds)
+        text = metrics.render()
+        self.assertEqual(self._count(text, 'decide_stage_seconds_bucket{stage="run",le="1e-05"}'), 1)
+        self.assertEqual(self._count(text, 'decide_stage_seconds_bucket{stage="run",le="0.005"}'), 2)
+        self.assertEqual(self._count(text, 'decide_stage_seconds_bucket{stage="run",le="+Inf"}'), 3)
+        self.assertIn("# TYPE decide_stage_seconds histogram", text)
+
+    def test_metric_without_series_type_is_rejected(self):
+        """Vérifie qu'une métrique qui ne définit pas `_new_child` échoue dès sa construction"""
+        class Incomplete(metrics._Metric):
+            kind = "gauge"
+
+        with self.assertRaises(TypeError):
+            Incomplete("incomplete", "Sans type de série.")
+
+    def test_disabled_records_nothing(self):
+        """Vérifie qu'aucune mesure n'est prise quand les métriques sont désactivées"""
+        metrics.configure(False)
+        service.decide(["sommeil"], [])
+        metrics.configure(True)
+        text = metrics.render()
+        self.assertEqual(self._count(text, 'decide_stage_seconds_count{stage="run"}'), 0)
+        self.assertEqual(self._count(text, "decide_empty_decisions_total"), 0)
+
+    def test_metrics_endpoint(self):
+        """Vérifie que GET /metrics sert le texte Prometheus, et 404 une fois désactivé"""
+        async def get():
+            async with _api_client() as client:
+                return await client.get("/metrics")
+
+        response = asyncio.run(get())
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.headers["content-type"].startswith("text/plain"))
+        self.assertIn("decide_request_seconds_count", response.text)
+
+        metrics.configure(False)
+        self.assertEqual(asyncio.run(get()).status_code, 404)
+
+
+class TestRuleProfiler(_SettingsEnvMixin, unittest.TestCase):
+    """Tests pour le profil des règles Experta (logic.RuleProfiler)"""
+
+    def test_profile_counts_match_inferred_facts(self):
+        """Vérifie que les déclenchements par règle correspondent aux faits inférés"""
+        engine = new_engine()
+        profiler = engine.enable_profiling()
+        engine.declare_need("sommeil")
+        engine.declare_condition("grossesse")
+        engine.run()
+        report = profiler.report()
+
+        by_type = report["working_memory"]["by_type"]
+        rules = report["rules"]
+        self.assertEqual(rules["detect_danger"]["fired"], by_type.get("ProduitInterdit", 0))
+        self.assertEqual(rules["generate_recommendation"]["fired"], by_type.get("Recommandation", 0))
+        for stats in rules.values():
+            # Toute activation est soit déclenchée, soit retirée par un ProduitInterdit
+            self.assertEqual(stats["activations"] - stats["retracted"], stats["fired"])
+        self.assertGreaterEqual(report["agenda_peak"], 1)
+        self.assertEqual(report["working_memory"]["facts"], len(engine.facts))
+        json.dumps(report)
+
+    def test_clone_is_not_profiled(self):
+        """Vérifie qu'un clone d'un moteur profilé repart sans profil"""
+        engine = new_engine()
+        engine.enable_profiling()
+        self.assertIsNone(engine.clone().profiler)
+        self.assertIsNone(new_engine().profiler)
+
+    def test_decide_profiled_matches_decide(self):
+        """Vérifie que la décision profilée est identique à la décision normale"""
+        service.configure(engine="experta", cache_size=0)
+        symptomes, conditions = ["sommeil", "stress"], ["grossesse"]
+        profiled = service.decide_profiled(symptomes, conditions)
+        profile = profiled.pop("profile")
+        self.assertEqual(profiled, service.decide(symptomes, conditions))
+        self.assertEqual(profile["runs"], 1)
+
+    def test_api_profile_flag_requires_setting(self):
+        """Vérifie que ?profile=true est refusé tant que DECIDE_PROFILING_ENABLED n'est pas activé"""
+        from mongo import get_settings
+
+        async def post():
+            async with _api_client() as client:
+                return await client.post("/decide?profile=true", json={"symptomes": ["sommeil"]})
+
+        self.assertEqual(asyncio.run(post()).status_code, 403)
+
+        with mock.patch.dict(os.environ, {"DECIDE_PROFILING_ENABLED": "true"}):
+            get_settings.cache_clear()
+            response = asyncio.run(post())
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("generate_recommendation", response.json()["profile"]["rules"])
+
+
+class TestPasswordHashing(_SettingsEnvMixin, unittest.TestCase):
+    """Tests pour bcrypt hors de la boucle d'événements (security.PasswordHasher)"""
+
+    def test_rounds_and_needs_rehash(self):
+        """Vérifie la lecture du coût d'une empreinte et la détection d'un coût obsolète"""
+        password_hash = security.hash_password("secret")
+        self.assertEqual(security.hash_rounds(password_hash), 4)
+        self.assertFalse(security.needs_rehash(password_hash))
+        self.assertTrue(security.needs_rehash(password_hash, rounds=5))
+        self.assertIsNone(security.hash_rounds("pas une empreinte"))
+
+    def test_hasher_verifies_in_executor(self):
+        """Vérifie hash/verify via le pool et le décompte des opérations"""
+        hasher = security.PasswordHasher(workers=1, max_pending=4)
+        self.addCleanup(hasher.shutdown)
+
+        async def scenario():
+            password_hash = await hasher.hash("secret")
+            return await hasher.verify("secret", password_hash), await hasher.verify("autre", password_hash)
+
+        self.assertEqual(asyncio.run(scenario()), (True, False))
+        self.assertEqual(hasher.stats()["completed"], 3)
+        self.assertEqual(hasher.stats()["pending"], 0)
+
+    def test_hasher_rejects_when_full(self):
+        """Vérifie qu'au-delà de max_pending les opérations sont refusées au lieu d'attendre"""
+        import threading
+
+        hasher = security.PasswordHasher(workers=1, max_pending=1)
+        self.addCleanup(hasher.shutdown)
+        release = threading.Event()
+
+        async def scenario():
+            blocked = asyncio.ensure_future(hasher._submit("hash", release.wait))
+            await asyncio.sleep(0)
+            with self.assertRaises(security.HasherBusy):
+                await hasher.verify("secret", "x")
+            release.set()
+            await blocked
+
+        asyncio.run(scenario())
+        self.assertEqual(hasher.stats()["rejected"], 1)
+
+    def test_cancelled_wait_keeps_slot_until_done(self):
+        """Vérifie qu'un calcul dont l'attente est annulée (client déconnecté) compte jusqu'à sa fin"""
+        import threading
+
+        hasher = security.PasswordHasher(workers=1, max_pending=1)
+        self.addCleanup(hasher.shutdown)
+        started, release = threading.Event(), threading.Event()
+
+        def job():
+            started.set()
+            release.wait()
+
+        async def scenario():
+            waiting = asyncio.ensure_future(hasher._submit("hash", job))
+            await asyncio.get_running_loop().run_in_executor(None, started.wait)
+            try:
+                waiting.cancel()
+                with self.assertRaises(asyncio.CancelledError):
+                    await waiting
+                with self.assertRaises(security.HasherBusy):
+                    await asyncio.wait_for(hasher.verify("secret", "x"), 5)
+            finally:
+                release.set()
+
+        asyncio.run(scenario())
+        hasher.shutdown()
+        self.assertEqual((hasher.stats()["pending"], hasher.stats()["rejected"]), (0, 1))
+
+    def test_login_rehashes_when_rounds_change(self):
+        """Vérifie qu'une connexion réussie recalcule l'empreinte au nouveau coût BCRYPT_ROUNDS"""
+        import api
+        from mongo import get_db, get_settings
+
+        db = memorydb.InMemoryDatabase()
+        api.app.dependency_overrides[get_db] = lambda: db
+        self.addCleanup(api.app.dependency_overrides.pop, get_db, None)
+        credentials = {"email": "rehash@example.com", "password": "motdepasse"}
+
+        async def post(path):
+            async with _api_client() as client:
+                return await client.post(path, json=credentials)
+
+        self.assertEqual(asyncio.run(post("/auth/signup")).status_code, 200)
+        before = asyncio.run(db.users.find_one({"email": credentials["email"]}))["password_hash"]
+        self.assertEqual(security.hash_rounds(before), 4)
+
+        with mock.patch.dict(os.environ, {"BCRYPT_ROUNDS": "5"}):
+            get_settings.cache_clear()
+            self.assertEqual(asyncio.run(post("/auth/login")).status_code, 200)
+
+        after = asyncio.run(db.users.find_one({"email": credentials["email"]}))["password_hash"]
+        self.assertEqual(security.hash_rounds(after), 5)
+        self.assertTrue(security.verify_password(credentials["password"], after))
+
+
+class _IncompleteUserCache(usercache.UserCache):
+    # Backend sans `delete`
+    def __init__(self, maxsize, ttl):
+        pass
+
+    async def get(self, user_id):
+        return None
+
+    async def set(self, user_id, user):
+        pass
+
+
+def _NotAUserCache(maxsize, ttl):
+    return {}
+
+
+class TestUserCache(_SettingsEnvMixin, unittest.TestCase):
+    """Tests pour le cache des utilisateurs authentifiés (usercache.py)"""
+
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(usercache.configure, None)
+
+    def test_local_cache_returns_copies(self):
+        """Vérifie qu'un document lu puis modifié ne modifie pas l'entrée du cache"""
+        cache = usercache.LocalUserCache(maxsize=2, ttl=None)
+
+        async def scenario():
+            await cache.set("u1", {"profile": {"goals": []}})
+            first = await cache.get("u1")
+            first["profile"]["goals"].append("x")
+            return await cache.get("u1"), await cache.get("absent")
+
+        self.assertEqual(asyncio.run(scenario()), ({"profile": {"goals": []}}, None))
+        self.assertEqual(cache.stats()["hits"], 2)
+
+    def test_configure_backends(self):
+        """Vérifie "off", "memory" et le chargement d'un backend "module:fabrique" """
+        self.assertIsNone(usercache.configure("off"))
+        self.assertIsInstance(usercache.configure("memory"), usercache.LocalUserCache)
+        self.assertIsInstance(usercache.configure("usercache:LocalUserCache", 5, 1.0), usercache.LocalUserCache)
+        with self.assertRaises(ValueError):
+            usercache.configure("sans_fabrique")
+
+    def test_incomplete_backend_fails_at_configure(self):
+        """Vérifie qu'un backend sans toutes les méthodes de UserCache est refusé dès configure"""
+        with self.assertRaises(TypeError):
+            usercache.configure("test_suite:_IncompleteUserCache")
+        with self.assertRaises(TypeError):
+            usercache.configure("test_suite:_NotAUserCache")
+
+    def test_current_user_is_cached_and_refreshed_on_update(self):
+        """Vérifie qu'une seule lecture MongoDB sert plusieurs requêtes, et que le profil modifié est visible"""
+        import api
+        from mongo import get_db
+
+        usercache.configure("memory", 100, 60.0)
+        metrics.reset()
+        db = memorydb.InMemoryDatabase()
+        api.app.dependency_overrides[get_db] = lambda: db
+        self.addCleanup(api.app.dependency_overrides.pop, get_db, None)
+
+        async def scenario():
+            async with _api_client() as client:
+                signup = await client.post("/auth/signup", json={"email": "cache@example.com", "password": "motdepasse"})
+                headers = {"Authorization": f"Bearer {signup.json()['access_token']}"}
+
+                with mock.patch.object(db.users, "find_one", wraps=db.users.find_one) as find_one:
+                    for _ in range(3):
+                        self.assertEqual((await client.get("/users/me", headers=headers)).status_code, 200)
+                    reads = find_one.call_count
+
+                await client.put("/users/me/profile", json={"activity_level": "active"}, headers=headers)
+                return reads, (await client.get("/users/me", headers=headers)).json()
+
+        reads, me = asyncio.run(scenario())
+        self.assertEqual(reads, 1)
+        self.assertEqual(me["profile"]["activity_level"], "active")
+        self.assertNotIn("password_hash", me)
+        self.assertGreaterEqual(usercache.user_cache_stats()["hits"], 3)
+        self.assertIn("user_cache_hits_total", metrics.render())
+
+
+class _UsersRepositoryCases:
+    """Cas communs à la base en mémoire et à un vrai mongod (voir les sous-classes)"""
+
+    async def make_db(self):
+        raise NotImplementedError
+
+    async def drop_db(self, db):
+        pass
+
+    def run_scenario(self, scenario):
+        async def wrapper():
+            db = await self.make_db()
+            try:
+                return await scenario(users.UsersRepository(db))
+            finally:
+                await self.drop_db(db)
+
+        return asyncio.run(wrapper())
+
+    def test_create_translates_duplicate_email(self):
+        """Vérifie l'index unique: la deuxième inscription est refusée, sans lecture préalable"""
+        async def scenario(repo):
+            self.assertTrue(await repo.ensure_indexes())
+            created = await repo.create("dup@example.com", "hash", datetime(2024, 1, 1))
+            with self.assertRaises(users.EmailAlreadyRegistered):
+                await repo.create("dup@example.com", "hash", datetime(2024, 1, 1))
+            return created
+
+        created = self.run_scenario(scenario)
+        self.assertIn("_id", created)
+        self.assertNotIn("password_hash", created)
+
+    def test_projections(self):
+        """Vérifie que seule la lecture de connexion renvoie l'empreinte du mot de passe"""
+        async def scenario(repo):
+            created = await repo.create("proj@example.com", "hash", datetime(2024, 1, 1))
+            return await repo.find_for_login("proj@example.com"), await repo.get(created["_id"])
+
+        for_login, public = self.run_scenario(scenario)
+        self.assertEqual(for_login["password_hash"], "hash")
+        self.assertIn("profile", for_login)
+        self.assertNotIn("password_hash", public)
+        self.assertEqual(public["email"], "proj@example.com")
+
+    def test_update_fields_returns_document_after(self):
+        """Vérifie que la mise à jour renvoie le document modifié, et None pour un utilisateur absent"""
+        async def scenario(repo):
+            created = await repo.create("upd@example.com", "hash", datetime(2024, 1, 1))
+            after = await repo.update_fields(created["_id"], {"profile.activity_level": "active"})
+            missing = await repo.update_fields(ObjectId(), {"profile.activity_level": "active"})
+            return after, missing
+
+        after, missing = self.run_scenario(scenario)
+        self.assertEqual(after["profile"]["activity_level"], "active")
+        self.assertEqual(after["profile"]["goals"], [])
+        self.assertNotIn("password_hash", after)
+        self.assertIsNone(missing)
+
+    def test_replace_password_hash_is_conditional(self):
+        """Vérifie qu'une empreinte modifiée entre-temps n'est pas écrasée"""
+        async def scenario(repo):
+            created = await repo.create("pwd@example.com", "ancien", datetime(2024, 1, 1))
+            first = await repo.replace_password_hash(created["_id"], "ancien", "nouveau")
+            second = await repo.replace_password_hash(created["_id"], "ancien", "autre")
+            return first, second, (await repo.find_for_login("pwd@example.com"))["password_hash"]
+
+        self.assertEqual(self.run_scenario(scenario), (True, False, "nouveau"))
+
+
+class TestUsersRepositoryInMemory(_UsersRepositoryCases, unittest.TestCase):
+    """Tests du dépôt users sur la base en mémoire (memorydb.py)"""
+
+    async def make_db(self):
+        return memorydb.InMemoryDatabase()
+
+    def test_create_checks_email_until_index_is_ready(self):
+        """Vérifie le repli sans index (adresse vérifiée avant l'insertion) puis la nouvelle tentative différée"""
+        async def scenario(repo):
+            failing = mock.patch.object(
+                repo.collection, "create_index", side_effect=users.PyMongoError("injoignable")
+            )
+            with failing as create_index, self.assertLogs("users", level="WARNING"):
+                self.assertFalse(await repo.ensure_indexes())
+                await repo.create("noindex@example.com", "hash", datetime(2024, 1, 1))
+                with self.assertRaises(users.EmailAlreadyRegistered):
+                    await repo.create("noindex@example.com", "hash", datetime(2024, 1, 1))
+                # Pas de nouvelle tentative avant INDEX_RETRY_SECONDS
+                self.assertEqual(create_index.call_count, 1)
+
+            with mock.patch.object(users, "INDEX_RETRY_SECONDS", 0.0):
+                self.assertTrue(await repo.email_index_ready())
+            # L'index est propre à la collection: une autre base repart sans index
+            other = users.UsersRepository(memorydb.InMemoryDatabase())
+            with mock.patch.object(other.collection, "create_index", side_effect=users.PyMongoError("injoignable")):
+                with self.assertLogs("users", level="WARNING"):
+                    self.assertFalse(await other.email_index_ready())
+            # Un nouveau dépôt sur la même collection (une requête suivante) la sait indexée
+            same = users.UsersRepository(mock.Mock(users=repo.collection))
+            with mock.patch.object(repo.collection, "create_index") as create_index:
+                return await same.email_index_ready(), create_index.call_count
+
+        self.assertEqual(self.run_scenario(scenario), (True, 0))
+
+    def test_in_memory_collection(self):
+        """Vérifie l'index unique, $set sur chemin pointé et return_document"""
+        async def scenario():
+            collection = memorydb.InMemoryDatabase().users
+            await collection.create_index("email", unique=True)
+            result = await collection.insert_one({"email": "a@b.c", "profile": {}})
+            with self.assertRaises(memorydb.DuplicateKeyError):
+                await collection.insert_one({"email": "a@b.c"})
+            after = await collection.find_one_and_update(
+                {"_id": result.inserted_id},
+                {"$set": {"profile.activity_level": "light"}},
+                projection={"profile": 1},
+                return_document=memorydb.ReturnDocument.AFTER,
+            )
+            return after, await collection.find_one({"email": "a@b.c"}, {"profile": 0})
+
+        after, without_profile = asyncio.run(scenario())
+        self.assertEqual(after["profile"], {"activity_level": "light"})
+        self.assertNotIn("email", after)
+        self.assertNotIn("profile", without_profile)
+
+
+@unittest.skipUnless(os.environ.get("MONGODB_TEST_URI"), "MONGODB_TEST_URI non défini (mongod local)")
+class TestUsersRepositoryMongo(_UsersRepositoryCases, unittest.TestCase):
+    """Tests du dépôt users sur un mongod réel (base temporaire supprimée après chaque test)"""
+
+    async def make_db(self):
+        from motor.motor_asyncio import AsyncIOMotorClient
+
+        self.client = AsyncIOMotorClient(os.environ["MONGODB_TEST_URI"], serverSelectionTimeoutMS=5000)
+        return self.client[f"aja_test_{os.getpid()}_{time.monotonic_ns()}"]
+
+    async def drop_db(self, db):
+        await self.client.drop_database(db.name)
+        self.client.close()
+
+
+@unittest.skipUnless("forkserver" in multiprocessing.get_all_start_methods(), "forkserver indisponible")
+class TestDecideProcessPool(unittest.TestCase):
+    """Tests pour l'exécution de /decide dans des processus workers (procpool.py)"""
+
+    def setUp(self):
+        service.configure(engine="experta", cache_size=0)
+
+    def tearDown(self):
+        service.configure(engine="experta")
+
+    def make_pool(self, warm=True, **kwargs):
+        pool = procpool.DecideProcessPool(**kwargs)
+        self.addCleanup(pool.shutdown)
+        if warm:
+            pool.warm()
+        return pool
+
+    def test_decide_in_worker_matches_in_process(self):
+        """Vérifie qu'un worker (forkserver) rend la même décision que le processus principal, avec sa configuration"""
+        pool = self.make_pool(workers=1, max_pending=4)
+        self.assertNotEqual(pool.submit(procpool._ping).result(timeout=30), os.getpid())
+
+        args = (["sommeil", "stress"], ["grossesse"])
+        decision, records = pool.submit(procpool.decide_in_worker, True, *args).result(timeout=30)
+        self.assertEqual(decision, service.decide(*args))
+        self.assertIn(("decision", "experta"), [r[:2] for r in records])
+
+        service.configure(engine="index", cache_size=0)
+        pool.replace()
+        _, records = pool.submit(procpool.decide_in_worker, True, *args).result(timeout=30)
+        self.assertIn(("decision", "index"), [r[:2] for r in records])
+
+    def test_not_ready_pool_rejects(self):
+        """Vérifie qu'un pool sans workers prêts refuse au lieu de les démarrer dans submit"""
+        pool = self.make_pool(warm=False, workers=1, max_pending=4)
+        with self.assertRaises(procpool.ProcessPoolBusy):
+            pool.submit(procpool._ping)
+        self.assertEqual(pool.stats()["generations"], 0)
+
+    def test_rejects_when_queue_is_full(self):
+        """Vérifie qu'au-delà de max_pending la requête est refusée (503 côté API)"""
+        pool = self.make_pool(workers=1, max_pending=1)
+        slow = pool.submit(time.sleep, 0.5)
+        with self.assertRaises(procpool.ProcessPoolBusy):
+            pool.submit(procpool._ping)
+        self.assertIsInstance(procpool.ProcessPoolBusy("x"), PoolTimeout)
+        slow.result(timeout=30)
+        self.assertEqual(pool.stats()["rejected"], 1)
+
+    def test_recycles_and_replaces_in_background(self):
+        """Vérifie le recyclage après recycle_after requêtes par worker, et après invalidation, hors de submit"""
+        pool = self.make_pool(workers=1, max_pending=4, recycle_after=2)
+        pids = [pool.submit(procpool._ping).result(timeout=30) for _ in range(3)]
+        # La 3e requête lance le remplacement mais est servie par le pool déjà prêt
+        self.assertEqual(len(set(pids)), 1)
+        self.assertTrue(pool.wait_replaced(60))
+        recycled = pool.submit(procpool._ping).result(timeout=30)
+        self.assertNotEqual(recycled, pids[0])
+        self.assertEqual(pool.stats()["generations"], 2)
+
+        pool.invalidate()
+        self.assertTrue(pool.wait_replaced(60))
+        self.assertNotEqual(pool.submit(procpool._ping).result(timeout=30), recycled)
+        self.assertEqual(pool.stats()["generations"], 3)
+
+    def test_submit_does_not_wait_for_replacement(self):
+        """Vérifie que les requêtes restent servies par l'ancien pool pendant la construction du nouveau"""
+        import threading
+
+        pool = self.make_pool(workers=1, max_pending=4)
+        before = pool.submit(procpool._ping).result(timeout=30)
+        build, release = pool._build, threading.Event()
+
+        def slow_build():
+            release.wait(30)
+            return build()
+
+        with mock.patch.object(pool, "_build", slow_build):
+            pool.invalidate()
+            self.assertEqual(pool.submit(procpool._ping).result(timeout=30), before)
+            release.set()
+            self.assertTrue(pool.wait_replaced(60))
+        self.assertNotEqual(pool.submit(procpool._ping).result(timeout=30), before)
+
+    def test_worker_metrics_reach_parent(self):
+        """Vérifie que les étapes mesurées dans le worker apparaissent dans /metrics du processus principal"""
+        pool = self.make_pool(workers=1, max_pending=4)
+        metrics.reset()
+        metrics.configure(True)
+
+        async def scenario():
+            async with _api_client() as client:
+                decided = await client.post("/decide", json={"symptomes": ["sommeil"], "conditions_medicales": []})
+                return decided, await client.get("/metrics")
+
+        with mock.patch.object(procpool, "_POOL", pool):
+            decided, exposed = asyncio.run(scenario())
+        self.assertEqual(decided.json(), service.decide(["sommeil"], []))
+        self.assertIn('decide_stage_seconds_count{stage="run"} 1', exposed.text)
+        self.assertIn('decide_decisions_total{engine="experta"} 1', exposed.text)
+
+
+class TestDecisionSessions(_SettingsEnvMixin, unittest.TestCase):
+    """Tests pour les sessions de décision incrémentales (sessions.py)"""
+
+    def tearDown(self):
+        service.configure(engine="experta")
+
+    def assert_same_as_decide(self, session):
+        self.assertEqual(session.decision(), service.decide(session.symptomes, session.conditions))
+
+    def test_random_deltas_match_decide(self):
+        """Vérifie qu'après chaque delta aléatoire la décision égale un /decide complet, pour les deux moteurs"""
+        vocabulary = get_vocabulary()
+        symptoms = sorted(vocabulary.known_symptoms)[:25] + ["symptome inexistant"]
+        conditions = sorted(vocabulary.known_conditions)[:10]
+        for engine in ("experta", "index"):
+            service.configure(engine=engine, cache_size=0)
+            rng = random.Random(7)
+            session = sessions.DecisionSession("s", "u")
+            for _ in range(40):
+                decision = session.apply(
+                    add_symptomes=rng.sample(symptoms, rng.randint(0, 2)),
+                    remove_symptomes=rng.sample(session.symptomes, min(len(session.symptomes), rng.randint(0, 1))),
+                    add_conditions=rng.sample(conditions, rng.randint(0, 1)),
+                    remove_conditions=rng.sample(session.conditions, min(len(session.conditions), rng.randint(0, 1))),
+                )
+                self.assertEqual(decision, service.decide(session.symptomes, session.conditions), engine)
+
+    def test_removing_condition_restores_recommendations(self):
+        """Vérifie qu'un produit interdit par une condition retirée est de nouveau recommandé"""
+        service.configure(engine="experta", cache_size=0)
+        session = sessions.DecisionSession("s", "u")
+        before = session.apply(add_symptomes=["Sommeil", "Stress"])
+        session.apply(add_conditions=["Grossesse"])
+        after = session.apply(remove_conditions=["grossesse"])
+        self.assertEqual(after, before)
+        self.assertEqual(session.conditions, [])
+
+    def test_too_many_items(self):
+        """Vérifie qu'un delta au-delà de max_items est refusé sans modifier la session"""
+        session = sessions.DecisionSession("s", "u", max_items=2)
+        session.apply(add_symptomes=["sommeil", "stress"])
+        with self.assertRaises(sessions.TooManyItems):
+            session.apply(add_conditions=["grossesse"])
+        self.assertEqual((session.symptomes, session.conditions), (["sommeil", "stress"], []))
+        self.assert_same_as_decide(session)
+
+    def test_engine_rebuilt_after_reload(self):
+        """Vérifie que le moteur de la session est reconstruit sur le nouveau snapshot"""
+        service.configure(engine="experta", cache_size=0)
+        session = sessions.DecisionSession("s", "u")
+        session.apply(add_symptomes=["sommeil"], add_conditions=["grossesse"])
+        database.reload_catalogue(force=True)
+        self.assert_same_as_decide(session)
+        self.assertIs(session._engine.snapshot, database.current_catalogue())
+
+    def test_store_limits(self):
+        """Vérifie la limite par utilisateur, la limite totale et l'expiration après inactivité"""
+        now = [0.0]
+        store = sessions.SessionStore(max_sessions=3, max_per_user=2, idle_timeout=10.0, clock=lambda: now[0])
+
+        a1, a2 = store.create("a"), store.create("a")
+        a3 = store.create("a")
+        self.assertIsNone(store.get(a1.id, "a"))
+        self.assertIs(store.get(a2.id, "a"), a2)
+        self.assertIsNone(store.get(a2.id, "b"))
+        self.assertFalse(store.delete(a2.id, "b"))
+
+        now[0] = 4.0
+        b1 = store.create("b")
+        now[0] = 6.0
+        store.get(a2.id, "a")
+        store.create("c")
+        self.assertIsNone(store.get(a3.id, "a"))
+
+        now[0] = 14.5
+        self.assertIsNone(store.get(b1.id, "b"))
+        self.assertIs(store.get(a2.id, "a"), a2)
+        stats = store.stats()
+        self.assertEqual((stats["sessions"], stats["created"], stats["evicted"], stats["expired"]), (2, 5, 2, 1))
+        self.assertTrue(store.delete(a2.id, "a"))
+
+    def test_memory_budget_bounds_sessions(self):
+        """Vérifie que le budget mémoire réduit le nombre de sessions, sans dépasser DECISION_SESSION_MAX"""
+        self.addCleanup(sessions.configure)
+        self.assertEqual(sessions.max_sessions_for(64, 50), 93)
+        self.assertEqual(sessions.configure(1000, max_items=50, memory_mb=64).max_sessions, 93)
+        self.assertEqual(sessions.configure(10, max_items=50, memory_mb=64).max_sessions, 10)
+        self.assertEqual(sessions.configure(1000, max_items=50, memory_mb=0.1).max_sessions, 1)
+
+    def test_rejected_initial_delta_keeps_existing_sessions(self):
+        """Vérifie qu'une création refusée (413) n'évince aucune session et n'en laisse pas d'orpheline"""
+        import api
+        from mongo import get_db
+
+        service.configure(engine="experta", cache_size=0)
+        store = sessions.configure(max_per_user=2, max_items=2)
+        self.addCleanup(sessions.configure)
+        db = memorydb.InMemoryDatabase()
+        api.app.dependency_overrides[get_db] = lambda: db
+        self.addCleanup(api.app.dependency_overrides.pop, get_db, None)
+
+        async def scenario():
+            async with _api_client() as client:
+                signup = await client.post("/auth/signup", json={"email": "a@example.com", "password": "motdepasse"})
+                headers = {"Authorization": f"Bearer {signup.json()['access_token']}"}
+                ids = []
+                for _ in range(2):
+                    created = await client.post("/decide/sessions", json={"symptomes": ["sommeil"]}, headers=headers)
+                    ids.append(created.json()["session_id"])
+                rejected = await client.post(
+                    "/decide/sessions", json={"symptomes": ["sommeil", "stress", "fatigue"]}, headers=headers
+                )
+                kept = [(await client.get(f"/decide/sessions/{i}", headers=headers)).status_code for i in ids]
+                return rejected, kept
+
+        rejected, kept = asyncio.run(scenario())
+        self.assertEqual(rejected.status_code, 413)
+        self.assertEqual(kept, [200, 200])
+        stats = store.stats()
+        self.assertEqual((stats["sessions"], stats["created"], stats["evicted"]), (2, 2, 0))
+
+    def test_session_endpoints(self):
+        """Vérifie création, delta, lecture et suppression via l'API, et l'isolation entre utilisateurs"""
+        import api
+        from mongo import get_db
+
+        service.configure(engine="experta", cache_size=0)
+        sessions.configure(max_items=3)
+        self.addCleanup(sessions.configure)
+        db = memorydb.InMemoryDatabase()
+        api.app.dependency_overrides[get_db] = lambda: db
+        self.addCleanup(api.app.dependency_overrides.pop, get_db, None)
+
+        async def scenario():
+            async with _api_client() as client:
+                headers = []
+                for email in ("a@example.com", "b@example.com"):
+                    signup = await client.post("/auth/signup", json={"email": email, "password": "motdepasse"})
+                    headers.append({"Authorization": f"Bearer {signup.json()['access_token']}"})
+
+                created = await client.post("/decide/sessions", json={"symptomes": ["sommeil"]}, headers=headers[0])
+                url = f"/decide/sessions/{created.json()['session_id']}"
+                patched = await client.patch(url, json={"add_symptomes": ["stress"], "add_conditions": ["grossesse"]}, headers=headers[0])
+                too_many = await client.patch(url, json={"add_symptomes": ["fatigue"]}, headers=headers[0])
+                other = await client.get(url, headers=headers[1])
+                current = await client.get(url, headers=headers[0])
+                deleted = await client.delete(url, headers=headers[0])
+                gone = await client.get(url, headers=headers[0])
+                stats = await client.get("/decide/stats")
+                return created, patched, too_many, other, current, deleted, gone, stats
+
+        created, patched, too_many, other, current, deleted, gone, stats = asyncio.run(scenario())
+        self.assertEqual(created.status_code, 200)
+        self.assertEqual(created.json()["decision"], service.decide(["sommeil"], []))
+        self.assertEqual(patched.json()["decision"], service.decide(["sommeil", "stress"], ["grossesse"]))
+        self.assertEqual(too_many.status_code, 413)
+        self.assertEqual(other.status_code, 404)
+        self.assertEqual(current.json(), patched.json())
+        self.assertEqual((deleted.status_code, gone.status_code), (204, 404))
+        self.assertEqual(stats.json()["sessions"]["created"], 1)
+
+
 if __name__ == '__main__':
     # Lance tous les tests et affiche le rapport
     unittest.main()
\ No newline at end of file
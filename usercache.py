@@ -0,0 +1,130 @@
+"""usercache.py
+
+Cache des documents utilisateur lus par `api.get_current_user`, indexé par
+l'id de l'utilisateur (le `sub` du jeton).
+
+- `LocalUserCache`: en mémoire du processus, borné (LRU) avec TTL (`cache.TTLCache`)
+- backend partagé (plusieurs workers): sous-classe de `UserCache` (classe
+  abstraite), désignée par `module:fabrique` dans USER_CACHE_BACKEND et
+  appelée avec `maxsize=` et `ttl=`. Une fabrique incomplète échoue dès
+  `configure` (démarrage), pas à la première requête authentifiée. Le backend
+  se charge de sérialiser les documents (ObjectId, datetime).
+
+Les écritures de l'API sur un utilisateur rafraîchissent ou invalident son
+entrée. Avec un cache local par worker, une écriture faite par un autre
+worker n'est visible qu'à l'expiration de l'entrée: le TTL borne ce délai.
+
+Les documents sont copiés à l'entrée et à la sortie du cache: un appelant
+qui modifie le document reçu ne modifie pas l'entrée.
+"""
+
+from __future__ import annotations
+
+import copy
+import importlib
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Optional
+
+import metrics
+from cache import TTLCache
+
+
+class UserCache(ABC):
+    """Interface d'un backend de cache utilisateur (méthodes asynchrones)."""
+
+    @abstractmethod
+    async def get(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """Document de l'utilisateur, ou None s'il est absent ou expiré."""
+
+    @abstractmethod
+    async def set(self, user_id: str, user: Dict[str, Any]) -> None:
+        """Enregistre (ou remplace) le document de l'utilisateur."""
+
+    @abstractmethod
+    async def delete(self, user_id: str) -> None:
+        """Invalide l'entrée de l'utilisateur (sans erreur si elle est absente)."""
+
+    def stats(self) -> Dict[str, Any]:
+        return {}
+
+
+class LocalUserCache(UserCache):
+    """Cache en mémoire du processus (LRU + TTL)."""
+
+    def __init__(self, maxsize: int = 10_000, ttl: Optional[float] = 30.0):
+        self._cache = TTLCache(maxsize, ttl=ttl)
+
+    async def get(self, user_id: str) -> Optional[Dict[str, Any]]:
+        user = self._cache.get(user_id)
+        return copy.deepcopy(user) if user is not None else None
+
+    async def set(self, user_id: str, user: Dict[str, Any]) -> None:
+        self._cache.set(user_id, copy.deepcopy(user))
+
+    async def delete(self, user_id: str) -> None:
+        self._cache.delete(user_id)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": "memory", **self._cache.stats()}
+
+
+_CACHE: Optional[UserCache] = None
+_CONFIGURED = False
+
+
+def _load_backend(spec: str, maxsize: int, ttl: Optional[float]) -> UserCache:
+    module_name, _, attr = spec.partition(":")
+    if not attr:
+        raise ValueError(f"Backend de cache utilisateur invalide: {spec!r} (attendu: 'memory', 'off' ou 'module:fabrique')")
+    factory = getattr(importlib.import_module(module_name), attr)
+    cache = factory(maxsize=maxsize, ttl=ttl)
+    if not isinstance(cache, UserCache):
+        raise TypeError(f"{spec} doit renvoyer un UserCache, reçu {type(cache).__name__}")
+    return cache
+
+
+def configure(backend: Optional[str] = "memory", maxsize: int = 10_000, ttl: Optional[float] = 30.0) -> Optional[UserCache]:
+    """Installe le cache: "memory", "off"/None (désactivé) ou "module:fabrique" (backend partagé)."""
+    global _CACHE, _CONFIGURED
+    if not backend or backend == "off":
+        cache = None
+    elif backend == "memory":
+        cache = LocalUserCache(maxsize, ttl)
+    else:
+        cache = _load_backend(backend, maxsize, ttl)
+    _CACHE, _CONFIGURED = cache, True
+    return cache
+
+
+def get_user_cache() -> Optional[UserCache]:
+    # Configuré au premier usage depuis les réglages si `configure` n'a pas été appelé
+    if not _CONFIGURED:
+        from mongo import get_settings
+
+        s = get_settings()
+        configure(s.USER_CACHE_BACKEND, s.USER_CACHE_SIZE, s.USER_CACHE_TTL_SECONDS)
+    return _CACHE
+
+
+def user_cache_stats() -> Optional[Dict[str, Any]]:
+    cache = _CACHE
+    return cache.stats() if cache is not None else None
+
+
+def _stat(name: str):
+    def read() -> Optional[float]:
+        stats = user_cache_stats()
+        return stats.get(name) if stats else None
+    return read
+
+
+for _name, _kind, _doc in (
+    ("hits", "counter", "Utilisateurs trouvés dans le cache."),
+    ("misses", "counter", "Utilisateurs lus dans MongoDB (absents ou expirés)."),
+    ("evictions", "counter", "Entrées évincées (taille maximale atteinte)."),
+    ("expirations", "counter", "Entrées expirées (TTL)."),
+    ("hit_ratio", "gauge", "Part des lectures servies par le cache."),
+    ("size", "gauge", "Entrées dans le cache."),
+):
+    suffix = "_total" if _kind == "counter" else ""
+    metrics.REGISTRY.register(metrics.CallbackMetric(f"user_cache_{_name}{suffix}", _doc, _stat(_name), _kind))
@@ -0,0 +1,136 @@
+"""users.py
+
+Accès à la collection `users`: une requête MongoDB par opération.
+
+- index unique sur `email` (`ensure_indexes`, au démarrage): l'inscription
+  insère directement et traduit la `DuplicateKeyError` en `EmailAlreadyRegistered`.
+  Tant que l'index n'est pas confirmé pour la collection, l'inscription vérifie
+  l'adresse avant d'insérer et retente de créer l'index (au plus une fois par
+  `INDEX_RETRY_SECONDS`)
+- `find_one_and_update(..., ReturnDocument.AFTER)`: le document modifié est
+  renvoyé par l'écriture elle-même, sans relecture
+- projections par usage: l'empreinte du mot de passe n'est lue que pour la
+  connexion
+
+Fonctionne avec une base Motor ou `memorydb.InMemoryDatabase`.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional, Set
+
+from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError, PyMongoError
+
+logger = logging.getLogger(__name__)
+
+# Lecture de l'utilisateur authentifié et réponses de l'API: tout sauf l'empreinte
+PUBLIC_PROJECTION: Dict[str, int] = {"password_hash": 0}
+
+# Connexion: l'empreinte en plus de ce que renvoie la réponse
+LOGIN_PROJECTION: Dict[str, int] = {
+    "email": 1,
+    "password_hash": 1,
+    "role": 1,
+    "profile": 1,
+    "created_at": 1,
+    "updated_at": 1,
+}
+
+
+# Délai minimum entre deux tentatives de création de l'index depuis `create`
+INDEX_RETRY_SECONDS = 60.0
+
+# Collections dont l'index unique est confirmé, et dernière tentative pour les
+# autres. Motor renvoie un nouvel objet à chaque `db.users`, mais ces objets sont
+# égaux (même client, base et nom): l'état tient d'une requête à l'autre.
+_email_indexed: Set[Any] = set()
+_index_attempts: Dict[Any, float] = {}
+
+
+class EmailAlreadyRegistered(Exception):
+    """Un compte existe déjà pour cette adresse."""
+
+
+class UsersRepository:
+    """Opérations sur la collection `users` (un objet par base, sans état propre)."""
+
+    def __init__(self, db: Any):
+        self.collection = db.users
+
+    async def ensure_indexes(self, timeout: Optional[float] = 10.0) -> bool:
+        """Crée l'index unique sur `email`. False (et un avertissement) si la base ne l'a pas accepté."""
+        _index_attempts[self.collection] = time.monotonic()
+        try:
+            await asyncio.wait_for(self.collection.create_index("email", unique=True), timeout)
+        except (PyMongoError, asyncio.TimeoutError) as e:
+            # Base injoignable, ou adresses déjà en double dans la collection
+            logger.warning("Index unique users.email non créé: %s", e)
+            return False
+        _email_indexed.add(self.collection)
+        _index_attempts.pop(self.collection, None)
+        return True
+
+    async def email_index_ready(self) -> bool:
+        """True si l'index unique est confirmé; sinon le recrée si la dernière tentative est assez ancienne."""
+        if self.collection in _email_indexed:
+            return True
+        last = _index_attempts.get(self.collection)
+        if last is not None and time.monotonic() - last < INDEX_RETRY_SECONDS:
+            return False
+        return await self.ensure_indexes()
+
+    async def create(self, email: str, password_hash: str, now: datetime) -> Dict[str, Any]:
+        """Insère un utilisateur et renvoie son document public (sans relecture)."""
+        if not await self.email_index_ready() and await self.collection.find_one({"email": email}, {"_id": 1}):
+            raise EmailAlreadyRegistered(email)
+
+        user_doc = {
+            "email": email,
+            "password_hash": password_hash,
+            "role": "user",
+            "profile": {
+                "personal": {},
+                "medical": {},
+                "activity_level": None,
+                "goals": [],
+            },
+            "created_at": now,
+            "updated_at": now,
+        }
+        try:
+            result = await self.collection.insert_one(user_doc)
+        except DuplicateKeyError:
+            raise EmailAlreadyRegistered(email)
+
+        user_doc["_id"] = result.inserted_id
+        user_doc.pop("password_hash")
+        return user_doc
+
+    async def find_for_login(self, email: str) -> Optional[Dict[str, Any]]:
+        return await self.collection.find_one({"email": email}, LOGIN_PROJECTION)
+
+    async def get(self, user_id: ObjectId) -> Optional[Dict[str, Any]]:
+        return await self.collection.find_one({"_id": user_id}, PUBLIC_PROJECTION)
+
+    async def update_fields(self, user_id: ObjectId, set_fields: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Applique `$set` et renvoie le document public après modification (None si l'utilisateur n'existe plus)."""
+        return await self.collection.find_one_and_update(
+            {"_id": user_id},
+            {"$set": set_fields},
+            projection=PUBLIC_PROJECTION,
+            return_document=ReturnDocument.AFTER,
+        )
+
+    async def replace_password_hash(self, user_id: ObjectId, old_hash: str, new_hash: str) -> bool:
+        """Remplace l'empreinte, seulement si elle vaut encore `old_hash` (pas de changement concurrent écrasé)."""
+        result = await self.collection.update_one(
+            {"_id": user_id, "password_hash": old_hash},
+            {"$set": {"password_hash": new_hash}},
+        )
+        return result.modified_count > 0